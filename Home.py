@@ -1,27 +1,68 @@
 import streamlit as st
 import json
-import plotly.graph_objects as go
 from datetime import datetime
-import pandas as pd
 import time
-try:
-    __import__('pysqlite3')
-    import sys
-    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-except ImportError:
-    pass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index.llms.openai import OpenAI
-from llama_index.core.indices.prompt_helper import PromptHelper
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.core import download_loader
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core import StorageContext
-from openai import OpenAI as OpenAIClient
+import importlib
 import os
+import re
 import tempfile
-import chromadb
+import threading
+# llama_index, chromadb, openai and plotly are imported inside the functions that
+# use them, so the first frame (and the API key prompt) renders without loading them.
+# Run `python -m benchmarks.import_profile` to see what module import costs.
+from rate_limiter import get_rate_limiter, estimate_tokens, is_rate_limit_error, query_slot
+from caching import get_response_cache, get_embedding_cache, hash_bytes, make_cache_key
+from document_store import start_background_compaction
+from document_registry import get_document_registry, PREWARM_DOCUMENTS
+from jobs import get_job_store, JobRunner, ACTIVE_STATUSES, RESUMABLE_STATUSES, JOB_POLL_SECONDS
+from ingestion import ContentValidator, iter_document_text, INDEX_BATCH_CHARACTERS
+from token_budget import RETRIEVAL_TOP_K, RETRIEVAL_SIMILARITY_CUTOFF, take_retrieval, get_token_budget_log
+from response_schema import ResponseFormatError, load_json_object, parse_analysis_result, normalize_analysis_result
+from telemetry import (
+    get_telemetry, span, traced, timed_iter, run_context, submit_with_context, start_metrics_server
+)
+from semantic_cache import get_semantic_cache, minhash_signature, should_revalidate
+from portfolio import group_by_evidence, near_duplicate_waves, display_names
+from prescreen import (
+    PRESCREEN_SIMILARITY_THRESHOLD, PRESCREEN_MIN_KEYWORD_HITS,
+    keyword_terms, score_evidence, is_unsupported, prescreened_result
+)
+
+# Upper bound on LLM queries in flight at once, overridable from the sidebar
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+
+# Token allowance for retrieved context and completion on top of the prompt itself,
+# used to reserve tokens-per-minute capacity before each query. Retrieved chunks
+# are trimmed to fit QUERY_CONTEXT_TOKENS.
+QUERY_CONTEXT_TOKENS = int(os.getenv("QUERY_CONTEXT_TOKENS", "2048"))
+QUERY_OUTPUT_TOKENS = 512
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+# Vectors from different embedding models are not comparable, so each model gets
+# its own collection; OpenAI's default model keeps the original name
+CHROMA_COLLECTION = "privacy_docs"
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# "openai" embeds through the API; "local" runs LOCAL_EMBEDDING_MODEL on the CPU
+# with ONNX Runtime (pip install fastembed), with no network calls or rate limits
+EMBEDDING_BACKENDS = {"openai": "OpenAI API", "local": "Local CPU model"}
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+# Optional local cross-encoder: RERANK_CANDIDATES chunks are retrieved, reranked
+# and cut to RETRIEVAL_TOP_K before the context budget. Empty disables it.
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))
+# Registered documents offered for reopening without an upload
+RECENT_DOCUMENTS_SHOWN = 20
+
+LLM_MODEL = "gpt-3.5-turbo"
+LLM_TEMPERATURE = 0.1
+# Bump whenever a prompt template changes so cached responses are not reused
+PROMPT_TEMPLATE_VERSION = "4"
+# Malformed answers are re-requested (reusing the retrieved context) this many times
+FORMAT_RETRIES = 2
 
 # Initialize session state variables
 if 'analysis_complete' not in st.session_state:
@@ -32,16 +73,43 @@ if 'openai_api_key' not in st.session_state:
     st.session_state.openai_api_key = None
 if 'query_engine' not in st.session_state:
     st.session_state.query_engine = None
+if 'query_engine_key' not in st.session_state:
+    st.session_state.query_engine_key = None
+if 'document_sections' not in st.session_state:
+    st.session_state.document_sections = None
 if 'llm' not in st.session_state:
     st.session_state.llm = None
 if 'embed_model' not in st.session_state:
     st.session_state.embed_model = None
 if 'prompt_helper' not in st.session_state:
     st.session_state.prompt_helper = None
+if 'embedding_backend' not in st.session_state:
+    st.session_state.embedding_backend = EMBEDDING_BACKEND if EMBEDDING_BACKEND in EMBEDDING_BACKENDS else "openai"
 if 'selected_apps' not in st.session_state:
     st.session_state.selected_apps = []
 if 'analysis_keywords' not in st.session_state:
     st.session_state.analysis_keywords = ""
+if 'document_hash' not in st.session_state:
+    st.session_state.document_hash = None
+if 'batched_evaluation' not in st.session_state:
+    st.session_state.batched_evaluation = False
+if 'prescreen_enabled' not in st.session_state:
+    st.session_state.prescreen_enabled = False
+if 'prescreen_settings' not in st.session_state:
+    st.session_state.prescreen_settings = {
+        "similarity_threshold": PRESCREEN_SIMILARITY_THRESHOLD,
+        "min_keyword_hits": PRESCREEN_MIN_KEYWORD_HITS
+    }
+if 'analyzed_documents' not in st.session_state:
+    # document_hash -> {"name", "results"} for every analysis run in this session
+    st.session_state.analyzed_documents = {}
+if 'max_concurrent_queries' not in st.session_state:
+    st.session_state.max_concurrent_queries = MAX_CONCURRENT_QUERIES
+if 'portfolio_mode' not in st.session_state:
+    st.session_state.portfolio_mode = False
+if 'portfolio_results' not in st.session_state:
+    # {"key", "names", "results", "stats"} of the last portfolio analysis
+    st.session_state.portfolio_results = None
 
 # Define Australian Privacy Principles structure
 APPS = {
@@ -206,6 +274,7 @@ APPS = {
     }
 }
 
+@traced("generate_pdf_report")
 def generate_pdf_report(results):
     """Generate a PDF compliance report"""
     from reportlab.lib import colors
@@ -270,8 +339,17 @@ def generate_pdf_report(results):
         # Requirements analysis
         for req, results in data['detailed_results'].items():
             status = "✓" if results['compliance_status'] else "✗"
-            story.append(Paragraph(f"{status} {req}", styles['Normal']))
-            story.append(Paragraph(f"Evidence: {results['evidence']}", styles['Normal']))
+            prescreen_note = " (pre-screened, no LLM call)" if results.get('prescreened') else ""
+            reuse_note = reused_verdict_note(results)
+            if reuse_note:
+                prescreen_note = f" ({reuse_note})"
+            story.append(Paragraph(f"{status} {req}{prescreen_note}", styles['Normal']))
+            # A reused quote comes from the other document, not this one
+            evidence_label = (
+                f"Evidence (quoted from document {results['semantic_match']['document_hash'][:8]})"
+                if reuse_note else "Evidence"
+            )
+            story.append(Paragraph(f"{evidence_label}: {results['evidence']}", styles['Normal']))
             
             if results['recommendations']:
                 story.append(Paragraph("Recommendations:", styles['Normal']))
@@ -287,36 +365,63 @@ def generate_pdf_report(results):
     buffer.seek(0)
     return buffer
 
+# Clients and models are cached process-wide so widget reruns reuse them
+@st.cache_resource(show_spinner=False)
 def setup_openai(api_key):
     """Setup OpenAI client with provided API key"""
+    from openai import OpenAI as OpenAIClient
+    
     if not api_key:
         raise ValueError("OpenAI API key is required")
     return OpenAIClient(api_key=api_key)
 
-def initialize_vector_store():
-    """Initialize ChromaDB and create collection if it doesn't exist"""
+def vector_collection_name(embedding_model_name=None):
+    """Chroma collection holding the vectors of one embedding model"""
+    if not embedding_model_name or embedding_model_name == OPENAI_EMBEDDING_MODEL:
+        return CHROMA_COLLECTION
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", embedding_model_name).strip("-")[:40]
+    # Chroma names allow 63 characters; the hash keeps truncated slugs distinct
+    return f"{CHROMA_COLLECTION}-{slug}-{hash_bytes(embedding_model_name.encode('utf-8'))[:8]}"
+
+@st.cache_resource(show_spinner=False)
+def initialize_vector_store(embedding_model_name=None):
+    """Initialize ChromaDB and create the collection for this embedding model if it doesn't exist"""
+    # chromadb needs a newer sqlite3 than some hosts ship, swap in pysqlite3 first
+    try:
+        __import__('pysqlite3')
+        import sys
+        sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    except ImportError:
+        pass
+    import chromadb
+    
     try:
         # Ensure the directory exists
-        os.makedirs("./chroma_db", exist_ok=True)
+        os.makedirs(CHROMA_PATH, exist_ok=True)
         
         # Initialize the persistent client
-        chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
         
         # Create or get collection
+        collection_name = vector_collection_name(embedding_model_name)
+        metadata = {
+            "description": "Privacy documents collection",
+            "embedding_model": embedding_model_name or OPENAI_EMBEDDING_MODEL
+        }
         try:
             chroma_collection = chroma_client.get_or_create_collection(
-                name="privacy_docs",
-                metadata={"description": "Privacy documents collection"}
+                name=collection_name,
+                metadata=metadata
             )
         except Exception as e:
             # If there's an error with existing collection, recreate it
             try:
-                chroma_client.delete_collection("privacy_docs")
+                chroma_client.delete_collection(collection_name)
             except:
                 pass
             chroma_collection = chroma_client.create_collection(
-                name="privacy_docs",
-                metadata={"description": "Privacy documents collection"}
+                name=collection_name,
+                metadata=metadata
             )
             
         return chroma_collection
@@ -325,35 +430,192 @@ def initialize_vector_store():
         st.error(f"Error initializing vector store: {str(e)}")
         raise
 
+def wrap_embed_model(embed_model, rate_limited=True):
+    """Add the shared rate limiter and the chunk embedding cache to an embedding model"""
+    from embeddings import RateLimitedEmbedding, CachedEmbedding
+    
+    if rate_limited:
+        embed_model = RateLimitedEmbedding(embed_model, get_rate_limiter("embedding"))
+    # Chunk embeddings are cached by text hash, so re-submitted templates cost nothing
+    return CachedEmbedding(embed_model, get_embedding_cache())
+
+def build_embed_model(embedding_backend=EMBEDDING_BACKEND):
+    """Wrapped embedding model for a backend in EMBEDDING_BACKENDS"""
+    if embedding_backend == "local":
+        from embeddings import LocalEmbedding
+        from indexing import EMBED_BATCH_SIZE
+        
+        # Nothing to rate limit on a local model
+        return wrap_embed_model(
+            LocalEmbedding(LOCAL_EMBEDDING_MODEL, embed_batch_size=EMBED_BATCH_SIZE),
+            rate_limited=False
+        )
+    if embedding_backend != "openai":
+        raise ValueError(f"Unknown embedding backend: {embedding_backend}")
+    from llama_index.embeddings.openai import OpenAIEmbedding
+    
+    return wrap_embed_model(OpenAIEmbedding(model=OPENAI_EMBEDDING_MODEL, max_retries=0))
+
+@st.cache_resource(show_spinner=False)
+def get_reranker():
+    """Local cross-encoder reranker, or None when RERANKER_MODEL is not set"""
+    if not RERANKER_MODEL:
+        return None
+    from retrieval import CrossEncoderReranker
+    
+    return CrossEncoderReranker(RERANKER_MODEL, top_n=RETRIEVAL_TOP_K)
+
+def build_prompt_helper():
+    """Prompt sizing shared by every index"""
+    from llama_index.core.indices.prompt_helper import PromptHelper
+    
+    return PromptHelper(
+        context_window=4096,
+        num_output=512,
+        chunk_overlap_ratio=0.1,
+        chunk_size_limit=None
+    )
+
 # Modify the setup_llama_components function
-def setup_llama_components(api_key):
-    """Setup LlamaIndex components with provided API key"""
+@st.cache_resource(show_spinner=False)
+def setup_llama_components(api_key, embedding_backend=EMBEDDING_BACKEND):
+    """Setup LlamaIndex components with provided API key and embedding backend"""
     if not api_key:
         raise ValueError("OpenAI API key is required")
     
+    from llama_index.core import Settings
+    from llama_index.core.callbacks import CallbackManager
+    from llama_index.llms.openai import OpenAI
+    from llm_usage import UsageCallbackHandler
+    
     os.environ["OPENAI_API_KEY"] = api_key
+    # Token usage of every completion goes to telemetry; query engines take the
+    # global callback manager, so it is set there as well as on the LLM
+    callback_manager = CallbackManager([UsageCallbackHandler()])
+    Settings.callback_manager = callback_manager
     # Change to gpt-3.5-turbo instead of gpt-4
-    llm = OpenAI(model="gpt-3.5-turbo", temperature=0.1)
-    embed_model = OpenAIEmbedding()
-    prompt_helper = PromptHelper(
-        context_window=4096,
-        num_output=512,
-        chunk_overlap_ratio=0.1,
-        chunk_size_limit=None
+    # Client-side retries are disabled so 429s reach the shared rate limiter.
+    # JSON mode guarantees syntactically valid JSON; the schema is checked on our side
+    llm = OpenAI(
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_retries=0,
+        additional_kwargs={"response_format": {"type": "json_object"}},
+        callback_manager=callback_manager
     )
+    embed_model = build_embed_model(embedding_backend)
+    prompt_helper = build_prompt_helper()
     return llm, embed_model, prompt_helper
 
-def analyze_app_compliance(query_engine, app_number, requirements):
+def rate_limited_query(query_engine, prompt, label=None, document_hash=None, nodes=None, retrieval=None):
     """
-    Analyze compliance for a specific APP and its requirements with improved error handling
+    Run a query engine call (prompt string or QueryBundle) through the shared LLM
+    rate limiter and record its token budget under `label`.
+    
+    With `nodes` (and their `retrieval` record from retrieve_context) only the
+    answer is synthesized, reusing context that was already retrieved.
     """
-    results = {}
-    app_title = APPS[f"APP{app_number}"]["title"]
+    prompt_text = getattr(prompt, "query_str", prompt)
+    instruction_tokens = estimate_tokens(prompt_text)
+    estimated_tokens = instruction_tokens + QUERY_CONTEXT_TOKENS + QUERY_OUTPUT_TOKENS
+    limiter = get_rate_limiter("llm")
+    # Shared by every session and background job in the process
+    with query_slot():
+        if nodes is None:
+            take_retrieval()
+            with span("llm.query", label=label):
+                response = limiter.call(query_engine.query, prompt, estimated_tokens=estimated_tokens)
+            retrieval = take_retrieval()
+        else:
+            with span("llm.completion", label=label):
+                response = limiter.call(query_engine.synthesize, prompt, nodes, estimated_tokens=estimated_tokens)
+    get_token_budget_log().record(
+        label, document_hash, instruction_tokens, retrieval or take_retrieval(), estimate_tokens(str(response))
+    )
+    return response
+
+def retrieve_context(query_engine, query_bundle):
+    """Retrieve (and trim) context once, returning the nodes and their token budget record"""
+    take_retrieval()
+    with span("retrieval"):
+        nodes = query_engine.retrieve(query_bundle)
+    return nodes, take_retrieval()
+
+def retrieve_candidates(query_engine, query_bundle):
+    """
+    One retrieval returning both the retriever's raw top-k and the context left
+    after reranking and trimming: (candidates, (nodes, token budget record))
+    """
+    take_retrieval()
+    with span("retrieval"):
+        candidates = query_engine.retriever.retrieve(query_bundle)
+        nodes = query_engine._apply_node_postprocessors(list(candidates), query_bundle=query_bundle)
+    return candidates, (nodes, take_retrieval())
+
+def evidence_chunk_hashes(nodes):
+    """Sorted chunk hashes of retrieved nodes; equal lists mean the LLM saw the same evidence"""
+    return sorted({node.node.metadata.get("chunk_hash", node.node.node_id) for node in nodes})
+
+def structured_query(query_engine, query_bundle, parse, label=None, document_hash=None, retrieved=None):
+    """
+    Retrieve once, then ask for an answer until `parse` accepts it.
     
-    for requirement in requirements:
+    Only the completion is re-requested when an answer is malformed, with the
+    validation error appended to the instructions. Raises ResponseFormatError
+    after FORMAT_RETRIES failed re-requests. Returns (answer, retrieved nodes).
+    `retrieved` is a (nodes, retrieval record) pair from retrieve_context to use
+    instead of retrieving again.
+    """
+    from llama_index.core import QueryBundle
+    
+    nodes, retrieval = retrieved or retrieve_context(query_engine, query_bundle)
+    prompt = query_bundle
+    for attempt in range(FORMAT_RETRIES + 1):
+        response = rate_limited_query(query_engine, prompt, label, document_hash, nodes, retrieval)
         try:
-            # Create analysis prompt with more specific guidance
-            prompt = f"""
+            with span("parse"):
+                return parse(response.response), nodes
+        except ResponseFormatError as e:
+            if attempt == FORMAT_RETRIES:
+                raise
+            get_telemetry().count("retries", reason="format")
+            prompt = QueryBundle(
+                query_str=f"{query_bundle.query_str}\n\n"
+                          f"Your previous answer was rejected ({str(e)}). "
+                          "Reply with only the JSON object, in exactly the format above."
+            )
+
+def response_cache_key(document_hash, app_number, requirement):
+    """Cache key for an LLM result on a given document, APP and requirement"""
+    return make_cache_key(
+        document_hash, str(app_number), requirement,
+        PROMPT_TEMPLATE_VERSION, LLM_MODEL, LLM_TEMPERATURE
+    )
+
+def is_cacheable_result(result):
+    """Only cache real answers, not placeholders produced by failures"""
+    return not str(result.get("evidence", "")).startswith(("Error", "Analysis incomplete", "Analysis error"))
+
+def cached_query(query_engine, prompt, document_hash, app_number, requirement, label=None):
+    """Run a single parsed query, serving it from the response cache when possible"""
+    cache_key = response_cache_key(document_hash, app_number, requirement) if document_hash else None
+    if cache_key:
+        cached_result = get_response_cache().get(cache_key)
+        if cached_result is not None:
+            return cached_result
+    
+    label = label or f"APP{app_number} {requirement}"
+    response = rate_limited_query(query_engine, prompt, label, document_hash)
+    with span("parse"):
+        result = parse_analysis_response(response.response)
+    if cache_key and is_cacheable_result(result):
+        get_response_cache().set(cache_key, result)
+    return result
+
+def build_requirement_prompt(app_number, requirement):
+    """Build the compliance analysis prompt for a single APP requirement"""
+    app_title = APPS[f"APP{app_number}"]["title"]
+    return f"""
             Analyze the provided privacy document for compliance with Australian Privacy Principle (APP) {app_number}: {app_title}
             Specifically evaluate the requirement: {requirement}
             
@@ -367,46 +629,582 @@ def analyze_app_compliance(query_engine, app_number, requirements):
                 "compliance_status": true/false,
                 "evidence": "Quote specific relevant sections from the document. If none found, state 'No relevant sections found.'",
                 "recommendations": ["List specific, actionable recommendations"],
-                "confidence_score": "A number between 0-100"
+                "confidence_score": <a number between 0 and 100>
             }}
             
             Base your assessment strictly on the document content.
             """
+
+def requirement_retrieval_text(app_number, requirement):
+    """Text a requirement is retrieved by: its APP title and description, without the instructions"""
+    app = APPS[f"APP{app_number}"]
+    return f"{app['title']}: {app['details'][requirement]}"
+
+@st.cache_resource(show_spinner=False)
+def get_requirement_embeddings(model_name, _embed_model):
+    """
+    Retrieval vectors for every APP requirement, keyed by (app_number, requirement).
+    
+    Encoded as queries (not passages) once per embedding model; the embedding
+    cache persists them, so restarts do not call the embedding API again.
+    """
+    keys = [(app.replace("APP", ""), requirement) for app in APPS for requirement in APPS[app]["requirements"]]
+    vectors = _embed_model.get_query_embedding_batch([requirement_retrieval_text(*key) for key in keys])
+    return dict(zip(keys, vectors))
+
+def load_requirement_embeddings(embed_model):
+    """Requirement vectors for embed_model, or None to fall back to embedding the retrieval text per query"""
+    if embed_model is None:
+        return None
+    try:
+        return get_requirement_embeddings(embed_model.model_name, embed_model)
+    except Exception:
+        return None
+
+def requirement_query(prompt, app_number, requirements, requirement_embeddings=None):
+    """
+    QueryBundle that sends the prompt to the LLM but retrieves by the requirements
+    alone, using their precomputed vectors when available
+    """
+    from llama_index.core import QueryBundle
+    
+    retrieval_text = "; ".join(requirement_retrieval_text(app_number, req) for req in requirements)
+    if requirement_embeddings:
+        vectors = [requirement_embeddings[(str(app_number), req)] for req in requirements]
+        # Several requirements retrieve around the centroid of their vectors
+        embedding = [sum(values) / len(vectors) for values in zip(*vectors)]
+        # The retrieval text is still what a reranker scores chunks against
+        return QueryBundle(query_str=prompt, custom_embedding_strs=[retrieval_text], embedding=embedding)
+    return QueryBundle(query_str=prompt, custom_embedding_strs=[retrieval_text])
+
+def semantic_scope(app_number, requirement):
+    """Verdicts are only shared between identical prompts: same requirement, template, model and temperature"""
+    return make_cache_key(str(app_number), requirement, PROMPT_TEMPLATE_VERSION, LLM_MODEL, LLM_TEMPERATURE)
+
+def evidence_signature(nodes):
+    """MinHash signature of the retrieved evidence text, or None when nothing was retrieved"""
+    return minhash_signature("\n".join(node.node.get_content() for node in nodes))
+
+def find_semantic_verdict(app_number, requirement, document_hash, nodes):
+    """
+    A verdict given for near-identical evidence in another document, as
+    (match or None, scope, signature); the signature is kept to store this
+    requirement's own verdict later
+    """
+    scope = semantic_scope(app_number, requirement)
+    signature = evidence_signature(nodes)
+    if signature is None:
+        return None, scope, signature
+    match = get_semantic_cache().find(scope, signature, exclude_document=document_hash)
+    get_telemetry().count("cache_lookups", cache="semantic", outcome="hit" if match else "miss")
+    return match, scope, signature
+
+def semantic_result(match):
+    """Reused verdict with its provenance: source document and estimated evidence similarity"""
+    return dict(match["result"], semantic_match={
+        "document_hash": match["document_hash"],
+        "similarity": round(match["similarity"], 3),
+        "verdict_id": match["verdict_id"]
+    })
+
+def reused_verdict_note(result):
+    """Report label for a verdict (and evidence quote) reused from another document, or "" """
+    match = result.get("semantic_match")
+    if not match:
+        return ""
+    return (f"verdict and evidence reused from document {match['document_hash'][:8]} "
+            f"({match['similarity']:.0%} similar evidence), no LLM call")
+
+def remember_semantic_verdict(scope, signature, document_hash, result, match=None):
+    """Store a fresh verdict; when it re-checked a reused one, record whether they agreed"""
+    if signature is None:
+        return
+    cache = get_semantic_cache()
+    if match:
+        agreed = match["result"]["compliance_status"] == result["compliance_status"]
+        get_telemetry().count("semantic_revalidations", outcome="agreed" if agreed else "disagreed")
+        if not agreed:
+            # Stop handing out a verdict the model no longer gives for this evidence
+            cache.discard(match["verdict_id"])
+    cache.add(scope, signature, document_hash, result)
+
+@traced("evaluate_requirement")
+def evaluate_requirement(query_engine, app_number, requirement, document_hash=None, requirement_embeddings=None,
+                         retrieved=None):
+    """
+    Evaluate a single APP requirement against the document with retry logic.
+    
+    Evidence is retrieved first; if another document retrieved near-identical
+    evidence for the requirement (see semantic_cache.py), its verdict is reused
+    with a `semantic_match` provenance record instead of asking the LLM, except
+    for the sample that is re-validated.
+    """
+    cache_key = None
+    if document_hash:
+        # A cache hit skips the network entirely
+        cache_key = response_cache_key(document_hash, app_number, requirement)
+        cached_result = get_response_cache().get(cache_key)
+        if cached_result is not None:
+            return cached_result
+    
+    try:
+        prompt = requirement_query(
+            build_requirement_prompt(app_number, requirement), app_number, [requirement], requirement_embeddings
+        )
+        
+        # Query the document with retry logic. Rate limit errors are already
+        # retried with backoff by the limiter, and malformed answers are
+        # re-requested inside structured_query, so only other failures retry here
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                if retrieved is None:
+                    retrieved = retrieve_context(query_engine, prompt)
+                match, scope, signature = find_semantic_verdict(app_number, requirement, document_hash, retrieved[0])
+                if match and not should_revalidate(document_hash, scope):
+                    result = semantic_result(match)
+                else:
+                    result, _ = structured_query(
+                        query_engine, prompt, parse_analysis_result,
+                        f"APP{app_number} {requirement}", document_hash, retrieved
+                    )
+                    remember_semantic_verdict(scope, signature, document_hash, result, match)
+                # Lets a later version of the document reuse this answer when its evidence is unchanged
+                result["evidence_chunks"] = evidence_chunk_hashes(retrieved[0])
+                if cache_key:
+                    get_response_cache().set(cache_key, result)
+                return result
+            except Exception as e:
+                if attempt == max_retries - 1 or is_rate_limit_error(e) or isinstance(e, ResponseFormatError):
+                    get_telemetry().count("analysis_errors", error=type(e).__name__)
+                    return {
+                        "compliance_status": False,
+                        "evidence": f"Analysis incomplete: {str(e)}",
+                        "recommendations": ["Manual review required - automated analysis failed"],
+                        "confidence_score": 0,
+                        "analysis_error": str(e)
+                    }
+                get_telemetry().count("retries", reason="error")
+    except Exception as e:
+        return {
+            "compliance_status": False,
+            "evidence": f"Analysis error: {str(e)}",
+            "recommendations": ["Manual review required - system error occurred"],
+            "confidence_score": 0,
+            "analysis_error": str(e)
+        }
+
+def build_batched_prompt(app_number, requirements):
+    """Build one prompt that scores every listed requirement of an APP"""
+    app = APPS[f"APP{app_number}"]
+    requirement_lines = "\n".join(
+        f"            - {req}: {app['details'][req]}" for req in requirements
+    )
+    return f"""
+            Analyze the provided privacy document for compliance with Australian Privacy Principle (APP) {app_number}: {app['title']}
+            Evaluate each of these requirements separately:
+{requirement_lines}
             
-            # Query the document with timeout and retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = query_engine.query(prompt)
-                    requirement_result = parse_analysis_response(response.response)
-                    break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        requirement_result = {
-                            "compliance_status": False,
-                            "evidence": f"Analysis incomplete: {str(e)}",
-                            "recommendations": ["Manual review required - automated analysis failed"],
-                            "confidence_score": 0
-                        }
-                    continue
+            For each requirement consider:
+            1. Does the document explicitly address this requirement?
+            2. Are there specific procedures or practices described?
+            3. Is the implementation clear and adequate?
             
-            results[requirement] = requirement_result
+            Provide your analysis as a single JSON object keyed by requirement name, where each value has this exact format:
+            {{
+                "compliance_status": true/false,
+                "evidence": "Quote specific relevant sections from the document. If none found, state 'No relevant sections found.'",
+                "recommendations": ["List specific, actionable recommendations"],
+                "confidence_score": <a number between 0 and 100>
+            }}
             
-        except Exception as e:
-            results[requirement] = {
-                "compliance_status": False,
-                "evidence": f"Analysis error: {str(e)}",
-                "recommendations": ["Manual review required - system error occurred"],
-                "confidence_score": 0
+            Include every requirement listed above. Base your assessment strictly on the document content.
+            """
+
+def parse_batched_response(response_text, requirements):
+    """Split a batched JSON answer into per-requirement results, skipping missing or malformed keys"""
+    try:
+        answer = load_json_object(response_text)
+    except ResponseFormatError:
+        return {}
+    if not isinstance(answer, dict):
+        return {}
+    
+    results = {}
+    for requirement in requirements:
+        try:
+            results[requirement] = normalize_analysis_result(answer.get(requirement))
+        except ResponseFormatError:
+            continue
+    return results
+
+@traced("analyze_app_compliance_batched")
+def analyze_app_compliance_batched(query_engine, app_number, requirements, document_hash=None,
+                                   requirement_embeddings=None):
+    """
+    Score all requirements of an APP with a single retrieval and completion.
+    
+    Context is retrieved once for all of the requirements together. Any
+    requirement missing or malformed in the answer falls back to its own query.
+    """
+    results = {}
+    cache = get_response_cache()
+    if document_hash:
+        for requirement in requirements:
+            cached_result = cache.get(response_cache_key(document_hash, app_number, requirement))
+            if cached_result is not None:
+                results[requirement] = cached_result
+    pending = [req for req in requirements if req not in results]
+    
+    if pending:
+        query_bundle = requirement_query(
+            build_batched_prompt(app_number, pending), app_number, pending, requirement_embeddings
+        )
+        try:
+            response = rate_limited_query(query_engine, query_bundle, f"APP{app_number} (batched)", document_hash)
+            with span("parse"):
+                batched_results = parse_batched_response(response.response, pending)
+        except Exception:
+            batched_results = {}
+        
+        for requirement, result in batched_results.items():
+            try:
+                # Per-requirement evidence, so a later version can carry this answer over
+                result["evidence_chunks"], _ = retrieve_requirement_evidence(
+                    query_engine, app_number, requirement, requirement_embeddings
+                )
+            except Exception:
+                pass
+            results[requirement] = result
+            if document_hash:
+                cache.set(response_cache_key(document_hash, app_number, requirement), result)
+        
+        # Fall back to individual calls only for what the batch did not answer
+        for requirement in pending:
+            if requirement not in results:
+                results[requirement] = evaluate_requirement(
+                    query_engine, app_number, requirement, document_hash, requirement_embeddings
+                )
+    
+    return {requirement: results[requirement] for requirement in requirements}
+
+def prescreen_requirement(query_engine, app_number, requirement, settings, document_hash=None,
+                          requirement_embeddings=None, retrieval=None):
+    """
+    Retrieval-only check run before the LLM. Returns (result, retrieval): a
+    non-compliant result when the document clearly has no evidence for the
+    requirement, otherwise None with the (candidates, retrieved) pair from
+    retrieve_candidates, which evaluate_requirement takes instead of retrieving
+    again. `retrieval` is such a pair from an earlier step to reuse.
+    """
+    cache = get_response_cache()
+    cache_key = response_cache_key(document_hash, app_number, requirement) if document_hash else None
+    # Cached verdicts are cheaper than retrieval, leave them to evaluate_requirement
+    if cache_key and cache.contains(cache_key):
+        return None, None
+    
+    details = APPS[f"APP{app_number}"]["details"][requirement]
+    query_bundle = requirement_query(
+        build_requirement_prompt(app_number, requirement), app_number, [requirement], requirement_embeddings
+    )
+    # Similarity and keywords are scored on the raw top-k, before the similarity
+    # cutoff drops the weaker chunks
+    candidates, retrieved = retrieval or retrieve_candidates(query_engine, query_bundle)
+    max_similarity, keyword_hits = score_evidence(candidates, keyword_terms(details, requirement))
+    if is_unsupported(max_similarity, keyword_hits, settings["similarity_threshold"], settings["min_keyword_hits"]):
+        result = prescreened_result(max_similarity, keyword_hits, settings["similarity_threshold"])
+        result["evidence_chunks"] = evidence_chunk_hashes(retrieved[0])
+        if cache_key:
+            # Reruns skip the pre-screen as well as the LLM
+            cache.set(cache_key, result)
+        return result, None
+    return None, (candidates, retrieved)
+
+def carry_over_result(query_engine, app_number, requirement, document_hash, previous_document_hash,
+                      requirement_embeddings=None):
+    """
+    Reuse a previous version's answer when this version retrieves exactly the same
+    evidence for the requirement. Retrieval only, no LLM call. Returns
+    (reused, retrieval), where retrieval is the (candidates, retrieved) pair from
+    retrieve_candidates when evidence was retrieved but differed, for the later
+    steps to reuse.
+    """
+    cache = get_response_cache()
+    cache_key = response_cache_key(document_hash, app_number, requirement)
+    if cache.contains(cache_key):
+        return False, None
+    previous = cache.get(response_cache_key(previous_document_hash, app_number, requirement))
+    if not previous or not previous.get("evidence_chunks"):
+        return False, None
+    
+    query_bundle = requirement_query(
+        build_requirement_prompt(app_number, requirement), app_number, [requirement], requirement_embeddings
+    )
+    candidates, retrieved = retrieve_candidates(query_engine, query_bundle)
+    if evidence_chunk_hashes(retrieved[0]) != previous["evidence_chunks"]:
+        return False, (candidates, retrieved)
+    cache.set(cache_key, dict(previous, carried_over_from=previous_document_hash))
+    return True, None
+
+def build_app_results(app, app_results):
+    """Results entry for one APP, with requirements in APPS order (answered ones only)"""
+    ordered = {req: app_results[req] for req in APPS[app]["requirements"] if req in app_results}
+    return {
+        "title": APPS[app]["title"],
+        "compliance_score": calculate_app_score(ordered),
+        "detailed_results": ordered,
+        "recommendations": []
+    }
+
+# The engine that replaced the per-APP analyze_app_compliance loop keeps its span name
+@traced("analyze_app_compliance")
+def run_compliance_analysis(query_engine, selected_apps, keywords="", max_workers=None,
+                            progress_callback=None, document_hash=None, batched=False, prescreen=None,
+                            embed_model=None, previous_document_hash=None, result_callback=None,
+                            initial_results=None):
+    """
+    Evaluate every (APP, requirement) pair at once on a bounded thread pool.
+    
+    Returns results in the same shape the UI and report functions expect:
+    results[app] = {"title", "compliance_score", "detailed_results", "recommendations"}.
+    progress_callback(completed, total, label) is called from the calling thread
+    as each query finishes, so it is safe to update Streamlit widgets from it.
+    result_callback(app, app_results) is likewise called from the calling thread
+    whenever requirements of an APP are settled, with that APP's results so far.
+    With batched=True each APP is scored in one structured call instead.
+    prescreen ({"similarity_threshold", "min_keyword_hits"}) enables the
+    retrieval-only pre-screen, which settles unsupported requirements without an LLM call.
+    Requirements are retrieved by precomputed vectors from embed_model (session
+    state by default), so analysis makes no per-requirement embedding calls.
+    With previous_document_hash, answers for requirements whose evidence did not
+    change between the versions are reused instead of asking the LLM again.
+    initial_results ({app: {requirement: result}}) are taken as already settled,
+    which is how an interrupted job resumes.
+    """
+    max_workers = max_workers or MAX_CONCURRENT_QUERIES
+    requirement_embeddings = load_requirement_embeddings(embed_model or st.session_state.embed_model)
+    detailed = {app: dict((initial_results or {}).get(app, {})) for app in selected_apps}
+    targeted = {}
+    
+    # (candidates, retrieved) per (app, requirement), so each requirement is retrieved once
+    retrievals = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if previous_document_hash and document_hash:
+            carry_over_futures = {
+                submit_with_context(
+                    executor, carry_over_result, query_engine, app.replace("APP", ""), requirement,
+                    document_hash, previous_document_hash, requirement_embeddings
+                ): (app, requirement)
+                for app in selected_apps
+                for requirement in APPS[app]["requirements"]
+                if requirement not in detailed[app]
+            }
+            for future in as_completed(carry_over_futures):
+                try:
+                    _, retrieval = future.result()
+                except Exception:
+                    # Anything not carried over is simply evaluated again
+                    continue
+                if retrieval:
+                    retrievals[carry_over_futures[future]] = retrieval
+        
+        if prescreen:
+            screen_futures = {
+                submit_with_context(
+                    executor, prescreen_requirement, query_engine, app.replace("APP", ""), requirement,
+                    prescreen, document_hash, requirement_embeddings, retrievals.get((app, requirement))
+                ): (app, requirement)
+                for app in selected_apps
+                for requirement in APPS[app]["requirements"]
+                if requirement not in detailed[app]
             }
+            for future in as_completed(screen_futures):
+                app, requirement = screen_futures[future]
+                try:
+                    screened_result, retrieval = future.result()
+                except Exception:
+                    # A failed pre-screen just means the requirement goes to the LLM
+                    screened_result, retrieval = None, None
+                if retrieval:
+                    retrievals[(app, requirement)] = retrieval
+                if screened_result:
+                    detailed[app][requirement] = screened_result
+                    if result_callback:
+                        result_callback(app, detailed[app])
+        
+        futures = {}
+        for app in selected_apps:
+            app_number = app.replace("APP", "")
+            pending = [req for req in APPS[app]["requirements"] if req not in detailed[app]]
+            if batched and pending:
+                future = submit_with_context(
+                    executor, analyze_app_compliance_batched, query_engine, app_number,
+                    pending, document_hash, requirement_embeddings
+                )
+                futures[future] = (app, "*")
+            elif not batched:
+                for requirement in pending:
+                    future = submit_with_context(
+                        executor, evaluate_requirement, query_engine, app_number, requirement,
+                        document_hash, requirement_embeddings, retrievals.get((app, requirement), (None, None))[1]
+                    )
+                    futures[future] = (app, requirement)
             
-        # Add small delay between requests to avoid rate limiting
-        time.sleep(1)
+            # Additional targeted analysis if keywords provided
+            if keywords:
+                future = submit_with_context(
+                    executor, analyze_targeted_compliance, query_engine, app_number, keywords, document_hash
+                )
+                futures[future] = (app, None)
+        
+        total = len(futures)
+        for completed, future in enumerate(as_completed(futures), start=1):
+            app, requirement = futures[future]
+            if requirement is None:
+                try:
+                    targeted[app] = future.result()
+                except Exception:
+                    targeted[app] = {}
+                label = f"{app} targeted analysis"
+            elif requirement == "*":
+                detailed[app].update(future.result())
+                label = app
+            else:
+                detailed[app][requirement] = future.result()
+                label = f"{app} {requirement}"
+            if progress_callback:
+                progress_callback(completed, total, label)
+            if result_callback and requirement is not None:
+                result_callback(app, detailed[app])
+    
+    results = {}
+    for app in selected_apps:
+        # Merge targeted analysis with standard results
+        for req in detailed[app]:
+            if req in targeted.get(app, {}):
+                detailed[app][req]["targeted_findings"] = targeted[app][req]
+        
+        # Restore the APPS requirement order, completion order is arbitrary
+        results[app] = build_app_results(app, detailed[app])
     
     return results
 
+def retrieve_requirement_evidence(query_engine, app_number, requirement, requirement_embeddings=None):
+    """Retrieval for a requirement exactly as evaluate_requirement would do it, plus the evidence chunk hashes"""
+    query_bundle = requirement_query(
+        build_requirement_prompt(app_number, requirement), app_number, [requirement], requirement_embeddings
+    )
+    nodes, retrieval = retrieve_context(query_engine, query_bundle)
+    return evidence_chunk_hashes(nodes), (nodes, retrieval)
+
+@traced("run_portfolio_analysis")
+def run_portfolio_analysis(query_engines, selected_apps, max_workers=None, progress_callback=None,
+                           embed_model=None):
+    """
+    Analyze several indexed documents ({document_hash: query_engine}) together.
+    
+    Every (document, requirement) pair is retrieved first; pairs that retrieve
+    identical evidence text are asked of the LLM once, from the first document
+    of the group, and the verdict is cached for every other document in it
+    with a `shared_evidence_with` marker. Groups with near-identical evidence
+    are evaluated after the group they resemble, so they reuse its verdict. Verdicts already cached for a document
+    are reused as usual. progress_callback(completed, total, label) is called
+    from the calling thread.
+    
+    Returns ({document_hash: results}, stats) where results has the usual
+    results[app] shape and stats counts requirement checks, LLM evaluations,
+    cached, near-duplicate (semantic) and shared verdicts.
+    """
+    max_workers = max_workers or MAX_CONCURRENT_QUERIES
+    requirement_embeddings = load_requirement_embeddings(embed_model or st.session_state.embed_model)
+    cache = get_response_cache()
+    detailed = {document_hash: {app: {} for app in selected_apps} for document_hash in query_engines}
+    pairs = [
+        (document_hash, app, requirement)
+        for document_hash in query_engines
+        for app in selected_apps
+        for requirement in APPS[app]["requirements"]
+    ]
+    stats = {"documents": len(query_engines), "requirement_checks": len(pairs),
+             "cached": 0, "evaluations": 0, "semantic": 0, "shared": 0}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        retrieval_futures = {}
+        for document_hash, app, requirement in pairs:
+            cached_result = cache.get(response_cache_key(document_hash, app.replace("APP", ""), requirement))
+            if cached_result is not None:
+                detailed[document_hash][app][requirement] = cached_result
+                stats["cached"] += 1
+                continue
+            future = submit_with_context(
+                executor, retrieve_requirement_evidence, query_engines[document_hash],
+                app.replace("APP", ""), requirement, requirement_embeddings
+            )
+            retrieval_futures[future] = (document_hash, app, requirement)
+        
+        retrievals = {}
+        for future in as_completed(retrieval_futures):
+            document_hash, app, requirement = retrieval_futures[future]
+            try:
+                retrievals[(document_hash, app, requirement)] = future.result()
+            except Exception:
+                # Evaluated on its own, retrieving again inside evaluate_requirement
+                retrievals[(document_hash, app, requirement)] = ((document_hash,), None)
+        
+        groups = group_by_evidence(retrievals)
+        signatures = {
+            key: evidence_signature(members[0][1][0]) if members[0][1] else None
+            for key, members in groups.items()
+        }
+        # Groups whose evidence nearly matches another group's wait for it, so
+        # they can reuse its verdict from the semantic cache
+        waves = near_duplicate_waves(groups, signatures, get_semantic_cache().threshold)
+        stats["evaluations"] = len(groups)
+        completed = 0
+        for wave in waves:
+            futures = {}
+            for key in wave:
+                app, requirement, _ = key
+                document_hash, retrieved = groups[key][0]
+                future = submit_with_context(
+                    executor, evaluate_requirement, query_engines[document_hash], app.replace("APP", ""),
+                    requirement, document_hash, requirement_embeddings, retrieved
+                )
+                futures[future] = key
+            
+            for future in as_completed(futures):
+                app, requirement, _ = key = futures[future]
+                members = groups[key]
+                result = future.result()
+                if result.get("semantic_match"):
+                    stats["semantic"] += 1
+                source_hash = members[0][0]
+                detailed[source_hash][app][requirement] = result
+                for document_hash, _ in members[1:]:
+                    shared_result = dict(result, shared_evidence_with=source_hash)
+                    detailed[document_hash][app][requirement] = shared_result
+                    if not result.get("analysis_error"):
+                        cache.set(response_cache_key(document_hash, app.replace("APP", ""), requirement), shared_result)
+                    stats["shared"] += 1
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, len(groups), f"{app} {requirement} ({len(members)} documents)")
+    
+    # Groups settled by a near-duplicate verdict made no LLM call either
+    stats["evaluations"] -= stats["semantic"]
+    get_telemetry().count("portfolio_verdicts", stats["evaluations"], source="llm")
+    get_telemetry().count("portfolio_verdicts", stats["semantic"], source="semantic")
+    get_telemetry().count("portfolio_verdicts", stats["shared"], source="shared")
+    document_results = {
+        document_hash: {app: build_app_results(app, detailed[document_hash][app]) for app in selected_apps}
+        for document_hash in query_engines
+    }
+    return document_results, stats
+
 #First call extracts and categorizes contract sections
-def extract_document_sections(query_engine):
+@traced("extract_document_sections")
+def extract_document_sections(query_engine, document_hash=None):
     """Initial AI call to extract and categorize contract sections"""
     prompt = """
     Analyze the privacy contract document and extract key sections related to:
@@ -418,67 +1216,32 @@ def extract_document_sections(query_engine):
     
     Return the analysis in JSON format with sections and relevant text excerpts.
     """
-    response = query_engine.query(prompt)
-    return parse_analysis_response(response.response)
-
-def validate_document_content(documents):
-    """Validate that the document contains analyzable content"""
-    if not documents:
-        raise ValueError("No content found in the document")
-    
-    total_content = " ".join(doc.text for doc in documents)
-    if len(total_content.strip()) < 50:  # Arbitrary minimum length
-        raise ValueError("Document contains insufficient content for analysis")
-    
-    return True
-
-def process_document(uploaded_file, temp_file_path):
-    """Process the uploaded document with validation"""
-    try:
-        # Initialize vector store
-        chroma_collection = initialize_vector_store()
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        # Load document based on type
-        if uploaded_file.type == "application/pdf":
-            PDFReader = download_loader("PDFReader")
-            loader = PDFReader()
-            documents = loader.load_data(file=temp_file_path)
-        else:
-            documents = SimpleDirectoryReader(input_files=[temp_file_path]).load_data()
-
-        # Validate document content
-        if validate_document_content(documents):
-            index = VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context,
-                embed_model=st.session_state.embed_model,  # Use session state
-                prompt_helper=st.session_state.prompt_helper  # Use session state
-            )
-            return index.as_query_engine(llm=st.session_state.llm)  # Use session state
-        
-    except Exception as e:
-        st.error(f"Error processing document: {str(e)}")
-        return None
+    return cached_query(query_engine, prompt, document_hash, "sections", "document_sections",
+                        label="Document sections")
 
 def calculate_app_score(results):
     """Calculate overall compliance score for an APP"""
-    if not results:
-        return 0
-    
-    total_requirements = len(results)
-    compliant_requirements = sum(1 for r in results.values() if r['compliance_status'])
-    confidence_sum = sum(r.get('confidence_score', 0) for r in results.values())
+    from results_table import score_requirements
     
-    # Weight the score by both compliance and confidence
-    compliance_score = (compliant_requirements / total_requirements) * 100
-    confidence_factor = (confidence_sum / (total_requirements * 100))
+    # Requirements the model could not answer are reported, not scored as zero.
+    # The score weights the share of compliant requirements by mean confidence
+    return score_requirements(results.values())
+
+def results_summary(results):
+    """One document's results as a table plus its per-APP score/confidence summary, computed once"""
+    import pandas as pd
+    from results_table import results_frame, app_summary
     
-    return compliance_score * confidence_factor
+    frame = results_frame({"document": results})
+    if not len(frame):
+        # Same columns as app_summary, so callers can render an empty summary
+        empty = pd.DataFrame(columns=["score", "confidence", "requirements", "unscored"], dtype=float)
+        return frame, empty.rename_axis("app")
+    return frame, app_summary(frame).droplevel("document")
 
 #Second call performs keyword-specific analysis
-def analyze_targeted_compliance(query_engine, app_number, keywords):
+@traced("analyze_targeted_compliance")
+def analyze_targeted_compliance(query_engine, app_number, keywords, document_hash=None):
     """Additional AI call for keyword-specific compliance analysis"""
     prompt = f"""
     Analyze the privacy contract specifically for compliance with APP {app_number}
@@ -491,10 +1254,10 @@ def analyze_targeted_compliance(query_engine, app_number, keywords):
     
     Return the analysis in JSON format with detailed findings and recommendations.
     """
-    response = query_engine.query(prompt)
-    return parse_analysis_response(response.response)
+    return cached_query(query_engine, prompt, document_hash, app_number, f"targeted:{keywords}")
 
 #Third call generates improvements for each APP
+@traced("generate_improvement_suggestions")
 def generate_improvement_suggestions(query_engine, results):
     """AI call to generate specific improvement suggestions"""
     non_compliant_areas = []
@@ -515,32 +1278,30 @@ def generate_improvement_suggestions(query_engine, results):
         
         Return recommendations in JSON format with structured suggestions.
         """
-        response = query_engine.query(prompt)
-        return parse_analysis_response(response.response)
+        response = rate_limited_query(query_engine, prompt, "Improvement suggestions")
+        with span("parse"):
+            return parse_analysis_response(response.response)
     return {}
 
 #Fourth call generates visualization data
 def create_enhanced_visualization(results):
     """Create an enhanced visualization dashboard"""
-    # Create main compliance score chart
-    compliance_fig = create_compliance_visualization(results)
+    import plotly.graph_objects as go
     
-    # Create risk heatmap
-    risk_data = []
-    x_labels = []
-    y_labels = []
-    for app, data in results.items():
-        x_labels.append(app)
-        for req, req_data in data['detailed_results'].items():
-            if req not in y_labels:
-                y_labels.append(req)
-            risk_score = 100 - req_data.get('confidence_score', 0)
-            risk_data.append([x_labels.index(app), y_labels.index(req), risk_score])
+    from results_table import risk_matrix
+    
+    # Results are flattened once; both charts read the same table
+    frame, summary = results_summary(results)
+    
+    # Create main compliance score chart
+    compliance_fig = create_compliance_visualization(results, summary)
     
+    # Create risk heatmap: APP x requirement, blank where an APP lacks the requirement
+    risk = risk_matrix(frame)
     heatmap = go.Figure(data=go.Heatmap(
-        z=[[d[2] for d in risk_data if d[0] == i] for i in range(len(x_labels))],
-        x=y_labels,
-        y=x_labels,
+        z=risk.to_numpy(),
+        x=[str(requirement) for requirement in risk.columns],
+        y=[str(app) for app in risk.index],
         colorscale='Reds',
         hoverongaps=False
     ))
@@ -592,51 +1353,530 @@ def parse_analysis_response(response_text):
             "confidence_score": 0
         }
 
-# Add a new function to validate document content
-def validate_document_content(documents):
-    """Validate that the document contains analyzable content"""
-    if not documents:
-        raise ValueError("No content found in the document")
+def document_is_indexed(chroma_collection, document_hash):
+    """Check whether chunks for this document fingerprint are already in the store"""
+    existing = chroma_collection.get(where={"document_hash": document_hash}, limit=1)
+    return bool(existing["ids"])
+
+def tag_documents(documents, document_hash, file_name):
+    """Attach the document fingerprint and keep volatile metadata out of the chunk text"""
+    for doc in documents:
+        # The temp file path changes on every upload, so record the original name instead
+        doc.metadata.pop("file_path", None)
+        doc.metadata["file_name"] = file_name
+        doc.metadata["document_hash"] = document_hash
+        doc.metadata["indexed_at"] = time.time()
+        # Embed only the chunk text so identical chunks hash (and cache) identically
+        doc.excluded_embed_metadata_keys = list(doc.metadata.keys()) + ["chunk_hash"]
+        doc.excluded_llm_metadata_keys = ["document_hash", "indexed_at", "chunk_hash"]
+    return documents
+
+def index_document_batch(pipeline, documents, node_parser, document_hash, file_name):
+    """Chunk one batch of pages and hand the chunks to the embedding pipeline"""
+    if document_hash:
+        tag_documents(documents, document_hash, file_name)
+    with span("chunking", pages=len(documents)):
+        nodes = node_parser.get_nodes_from_documents(documents)
+    for node in nodes:
+        # Identifies the chunk's text across versions of a contract
+        node.metadata["chunk_hash"] = hash_bytes(node.text.encode("utf-8"))
+    pipeline.add(nodes)
+
+def build_query_engine(index, document_hash=None, llm=None):
+    """Create a query engine that only retrieves chunks from the given document"""
+    from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
+    from retrieval import ContextBudgetPostprocessor
     
-    total_content = " ".join(doc.text for doc in documents)
-    if len(total_content.strip()) < 50:  # Arbitrary minimum length
-        raise ValueError("Document contains insufficient content for analysis")
+    llm = llm or st.session_state.llm
+    reranker = get_reranker()
+    # Explicit top-k, similarity cutoff and context budget instead of the library defaults
+    node_postprocessors = [ContextBudgetPostprocessor(
+        similarity_cutoff=RETRIEVAL_SIMILARITY_CUTOFF,
+        context_tokens=QUERY_CONTEXT_TOKENS,
+        rank_by_score=reranker is None
+    )]
+    if reranker:
+        # Over-retrieve, then let the cross-encoder pick the chunks that fill the budget
+        node_postprocessors.insert(0, reranker)
+    retrieval_options = {
+        "similarity_top_k": max(RERANK_CANDIDATES, RETRIEVAL_TOP_K) if reranker else RETRIEVAL_TOP_K,
+        "node_postprocessors": node_postprocessors
+    }
+    if not document_hash:
+        return index.as_query_engine(llm=llm, **retrieval_options)
+    filters = MetadataFilters(filters=[MetadataFilter(key="document_hash", value=document_hash)])
+    return index.as_query_engine(llm=llm, filters=filters, **retrieval_options)
+
+def load_query_engine(document_hash, llm=None, embed_model=None):
+    """
+    Query engine over an already indexed document, or None if it is not in the store.
+    
+    Only documents in the registry count as indexed: it is written once indexing
+    has finished, so chunks left by an interrupted upload are never served.
+    """
+    from llama_index.core import VectorStoreIndex
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+    
+    embed_model = embed_model or st.session_state.embed_model
+    chroma_collection = initialize_vector_store(embed_model.model_name)
+    registry = get_document_registry()
+    if not registry.get(document_hash, chroma_collection.name):
+        return None
+    # The store may have been wiped or recreated since the entry was written
+    if not document_is_indexed(chroma_collection, document_hash):
+        registry.forget([document_hash], chroma_collection.name)
+        return None
+    registry.touch(document_hash, chroma_collection.name)
+    # Only wraps the existing collection; nothing is read or embedded
+    with span("index.load"):
+        index = VectorStoreIndex.from_vector_store(
+            ChromaVectorStore(chroma_collection=chroma_collection),
+            embed_model=embed_model
+        )
+    return build_query_engine(index, document_hash, llm)
+
+def prewarm_documents(embedding_model_name, limit=PREWARM_DOCUMENTS):
+    """
+    Open the collection and load its vector index from disk with one query per
+    recently used document, so the first document opened after a restart does
+    not pay for it. Registry entries whose chunks are gone are dropped.
+    """
+    # Importing llama_index is a good part of the cold start, do it here as well
+    for module in ("llama_index.core", "llama_index.vector_stores.chroma"):
+        importlib.import_module(module)
     
-    return True
+    chroma_collection = initialize_vector_store(embedding_model_name)
+    registry = get_document_registry()
+    warmed = []
+    for entry in registry.recent(chroma_collection.name, limit):
+        where = {"document_hash": entry["document_hash"]}
+        stored = chroma_collection.get(where=where, limit=1, include=["embeddings"])
+        if not stored["ids"]:
+            registry.forget([entry["document_hash"]], chroma_collection.name)
+            continue
+        chroma_collection.query(query_embeddings=[list(stored["embeddings"][0])], n_results=1, where=where)
+        warmed.append(entry["document_hash"])
+    return warmed
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm(embedding_model_name):
+    """Pre-warm recently used documents of a collection on a daemon thread, once per server process"""
+    def prewarm():
+        try:
+            with span("prewarm"):
+                prewarm_documents(embedding_model_name)
+        except Exception as e:
+            # The span records the failure; documents then just open cold
+            get_telemetry().count("prewarm_failures", error=type(e).__name__)
+    
+    thread = threading.Thread(target=prewarm, name="document-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def select_recent_document(embedding_model_name):
+    """Registry entry of a recently opened document picked for reopening, or None"""
+    entries = [
+        entry for entry in get_document_registry().recent(
+            vector_collection_name(embedding_model_name), RECENT_DOCUMENTS_SHOWN
+        )
+        if entry["file_name"]
+    ]
+    if not entries:
+        return None
+    return st.selectbox(
+        "Or reopen a recent document:",
+        options=[None, *entries],
+        format_func=lambda entry: (
+            "-" if entry is None
+            else f"{entry['file_name']} ({entry['document_hash'][:8]}, "
+                 f"{datetime.fromtimestamp(entry['last_used_at']).strftime('%Y-%m-%d %H:%M')})"
+        )
+    )
 
 # Update the main function's document processing section
-def process_document(uploaded_file, temp_file_path):
-    """Process the uploaded document with validation"""
+@traced("process_document")
+def process_document(uploaded_file, temp_file_path, document_hash=None,
+                     llm=None, embed_model=None, prompt_helper=None):
+    """
+    Process the uploaded document with validation.
+    
+    Models default to the ones in session state; pass them explicitly to run
+    outside Streamlit. Chunks whose text was embedded before (e.g. unchanged
+    clauses of an earlier version) come from the embedding cache.
+    """
+    from llama_index.core import VectorStoreIndex, Document
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+    from chunking import build_node_parser
+    from indexing import IndexingPipeline
+    
+    llm = llm or st.session_state.llm
+    embed_model = embed_model or st.session_state.embed_model
+    prompt_helper = prompt_helper or st.session_state.prompt_helper
+    pipeline = None
     try:
         # Initialize vector store
-        chroma_collection = initialize_vector_store()
+        chroma_collection = initialize_vector_store(embed_model.model_name)
         vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        # Load document based on type
-        if uploaded_file.type == "application/pdf":
-            PDFReader = download_loader("PDFReader")
-            loader = PDFReader()
-            documents = loader.load_data(file=temp_file_path)
-        else:
-            documents = SimpleDirectoryReader(input_files=[temp_file_path]).load_data()
+        
+        # Documents that were indexed before are rebuilt from their stored vectors
+        # without any embedding calls
+        if document_hash:
+            query_engine = load_query_engine(document_hash, llm, embed_model)
+            if query_engine:
+                return query_engine
 
+        if document_hash:
+            # Chunks of an upload that was killed before it could clean up
+            chroma_collection.delete(where={"document_hash": document_hash})
+        
+        # Clause- and heading-aware chunks sized by tokens rather than characters
+        node_parser = build_node_parser()
+        # Chunks are embedded in concurrent batches and upserted into Chroma in
+        # the background while later pages are still being parsed
+        pipeline = IndexingPipeline(embed_model, chroma_collection)
+        
+        # Stream pages (extracted in parallel for PDFs) into the index in batches
+        # instead of loading the whole document into memory first
+        validator = ContentValidator()
+        batch = []
+        batch_characters = 0
+        pages = iter_document_text(temp_file_path, uploaded_file.type == "application/pdf")
+        for page_number, text in timed_iter("document.load", pages):
+            validator.feed(text)
+            if not text.strip():
+                continue
+            batch.append(Document(
+                text=text,
+                metadata={"page_label": str(page_number), "file_name": uploaded_file.name}
+            ))
+            batch_characters += len(text)
+            # Nothing is indexed until the document is known to have enough content
+            if batch_characters >= INDEX_BATCH_CHARACTERS and validator.sufficient:
+                index_document_batch(pipeline, batch, node_parser, document_hash, uploaded_file.name)
+                batch = []
+                batch_characters = 0
+        
         # Validate document content
-        if validate_document_content(documents):
-            index = VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context,
-                embed_model=st.session_state.embed_model,  # Use session state
-                prompt_helper=st.session_state.prompt_helper  # Use session state
+        validator.validate()
+        if batch:
+            index_document_batch(pipeline, batch, node_parser, document_hash, uploaded_file.name)
+        # Time spent waiting for the embedding and upsert backlog after the last page
+        with span("indexing.finish"):
+            pipeline.finish()
+        
+        index = VectorStoreIndex.from_vector_store(
+            vector_store,
+            embed_model=embed_model,
+            prompt_helper=prompt_helper
+        )
+        query_engine = build_query_engine(index, document_hash, llm)
+        if document_hash:
+            # The registry entry marks the document as completely indexed
+            get_document_registry().register(
+                document_hash, chroma_collection.name, embed_model.model_name,
+                uploaded_file.name, pipeline.nodes_written
             )
-            return index.as_query_engine(llm=st.session_state.llm)  # Use session state
+            # Drop documents outside the retention policy without blocking the upload
+            start_background_compaction(chroma_collection, keep={document_hash})
+        return query_engine
         
-    except Exception as e:
+    except BaseException as e:
+        # Also reached when Streamlit stops the script for a rerun
+        if pipeline is not None:
+            pipeline.abort(document_hash)
+        if not isinstance(e, Exception):
+            raise
         st.error(f"Error processing document: {str(e)}")
         return None
 
+def run_analysis_job(job_id, components):
+    """Body of a background analysis job; each settled requirement is saved as it completes"""
+    # Spans and counters recorded by the job (and its worker threads) are tagged with its id
+    with run_context(job_id):
+        store = get_job_store()
+        job = store.get_job(job_id)
+        options = job["options"]
+        llm, embed_model, prompt_helper = components
+        query_engine = load_query_engine(job["document_hash"], llm, embed_model)
+        if query_engine is None:
+            raise RuntimeError("The document is no longer indexed, please upload it again")
+        
+        # Requirements saved before an interruption are not evaluated again
+        initial_results = store.load_results(job_id)
+        saved = {app: set(app_results) for app, app_results in initial_results.items()}
+        
+        def save_results(app, app_results):
+            for requirement, result in app_results.items():
+                if requirement not in saved.setdefault(app, set()):
+                    saved[app].add(requirement)
+                    store.save_result(job_id, app, requirement, result)
+        
+        results = run_compliance_analysis(
+            query_engine,
+            options["selected_apps"],
+            keywords=options["keywords"],
+            max_workers=options["max_workers"],
+            result_callback=save_results,
+            document_hash=job["document_hash"],
+            batched=options["batched"],
+            prescreen=options["prescreen"],
+            embed_model=embed_model,
+            previous_document_hash=options["previous_document_hash"],
+            initial_results=initial_results
+        )
+        suggestions = generate_improvement_suggestions(query_engine, results)
+        store.complete(job_id, results, suggestions)
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner():
+    """One job runner per server process; jobs a previous process left unfinished become resumable"""
+    store = get_job_store()
+    store.mark_interrupted()
+    return JobRunner(store, run_analysis_job)
+
+def start_analysis_job(document_hash, document_name, previous_document_hash, components):
+    """Queue an analysis of an indexed document with the current sidebar options"""
+    # Created first, so its startup pass cannot mark the new job as interrupted
+    runner = get_job_runner()
+    selected_apps = list(st.session_state.selected_apps)
+    if not selected_apps:
+        raise ValueError("Select at least one APP to analyze")
+    options = {
+        "selected_apps": selected_apps,
+        "keywords": st.session_state.analysis_keywords,
+        "max_workers": st.session_state.max_concurrent_queries,
+        "batched": st.session_state.batched_evaluation,
+        "prescreen": st.session_state.prescreen_settings if st.session_state.prescreen_enabled else None,
+        "previous_document_hash": previous_document_hash
+    }
+    total = sum(len(APPS[app]["requirements"]) for app in selected_apps)
+    job_id = get_job_store().create_job(document_hash, document_name, options, total)
+    runner.submit(job_id, components)
+    return job_id
+
+def show_analysis_job(job_id, components):
+    """Render a job's results, polling while it runs; the page can be closed and reopened at any time"""
+    runner = get_job_runner()
+    store = get_job_store()
+    job = store.get_job(job_id)
+    if job is None:
+        st.warning("This analysis job no longer exists.")
+        return
+    # Requirements already saved are not analyzed again, whichever way the job stopped
+    resume_offered = job["status"] in RESUMABLE_STATUSES and not runner.is_active(job_id)
+    if resume_offered:
+        if job["status"] == "failed":
+            st.error(
+                f"The analysis of {job['document_name']} failed after "
+                f"{job['completed']}/{job['total']} requirements: {job['error']}"
+            )
+        else:
+            st.warning(
+                f"The analysis of {job['document_name']} was interrupted after "
+                f"{job['completed']}/{job['total']} requirements."
+            )
+        if st.button("Resume Analysis"):
+            runner.submit(job_id, components)
+            resume_offered = False
+    
+    selected_apps = job["options"]["selected_apps"]
+    progress_bar = st.progress(0)
+    progress_text = st.empty()
+    charts_placeholder = st.empty()
+    st.markdown("## Detailed Compliance Analysis")
+    app_placeholders = {app: st.empty() for app in selected_apps}
+    chart_updates = 0
+    shown_completed = -1
+    while True:
+        job = store.get_job(job_id)
+        if job["completed"] != shown_completed:
+            shown_completed = job["completed"]
+            saved_results = store.load_results(job_id)
+            partial = {
+                app: build_app_results(app, saved_results[app])
+                for app in selected_apps if saved_results.get(app)
+            }
+            for app, data in partial.items():
+                render_app_results(app_placeholders[app], app, data)
+            if partial:
+                chart_updates += 1
+                render_charts(charts_placeholder, partial, chart_updates)
+        progress_text.text(f"{job['status'].capitalize()}: {job['completed']}/{job['total']} requirements analyzed")
+        progress_bar.progress(min(1.0, job["completed"] / job["total"]) if job["total"] else 1.0)
+        if job["status"] not in ACTIVE_STATUSES:
+            break
+        time.sleep(JOB_POLL_SECONDS)
+    
+    if job["status"] in RESUMABLE_STATUSES and not resume_offered:
+        # Stopped while this page was polling; rerun to offer resuming it
+        st.rerun()
+    if job["status"] != "completed":
+        return
+    
+    results = job["results"]
+    st.session_state.compliance_results = results
+    st.session_state.analysis_complete = True
+    st.session_state.analyzed_documents[job["document_hash"]] = {
+        "name": job["document_name"],
+        "results": results
+    }
+    
+    # Final charts and expanders, now including targeted findings
+    render_charts(charts_placeholder, results, chart_updates + 1)
+    for app in selected_apps:
+        render_app_results(app_placeholders[app], app, results[app])
+    
+    version_delta = None
+    previous_job = None
+    if job["options"]["previous_document_hash"]:
+        previous_job = store.latest_completed_job(job["options"]["previous_document_hash"])
+    if previous_job:
+        version_delta = compliance_delta(previous_job["results"], results)
+        render_compliance_delta(version_delta, previous_job["document_name"])
+    
+    render_token_budget(job["document_hash"], job["created_at"])
+    
+    # Generate and offer reports
+    if st.button("Generate Reports"):
+        col1, col2 = st.columns(2)
+        with col1:
+            pdf_buffer = generate_pdf_report(results)
+            st.download_button(
+                "Download PDF Report",
+                data=pdf_buffer,
+                file_name="privacy_compliance_report.pdf",
+                mime="application/pdf"
+            )
+        
+        with col2:
+            json_report = generate_report(results)
+            if version_delta:
+                json_report["version_delta"] = version_delta
+            st.download_button(
+                "Download JSON Report",
+                data=json.dumps(json_report, indent=2),
+                file_name="privacy_compliance_report.json",
+                mime="application/json"
+            )
+
+def show_portfolio():
+    """Upload several contracts, index them, analyze them together and show the combined matrix"""
+    uploaded_files = st.file_uploader(
+        "Upload Privacy Documents", type=["txt", "pdf"], accept_multiple_files=True
+    )
+    if not uploaded_files:
+        return
+    # Identical uploads are one document
+    uploads = {hash_bytes(uploaded_file.getvalue()): uploaded_file for uploaded_file in uploaded_files}
+    portfolio_key = make_cache_key(*sorted(uploads), *st.session_state.selected_apps)
+    
+    if not st.session_state.selected_apps:
+        st.info("Select at least one APP in the sidebar to run an analysis.")
+    if st.button("Run Portfolio Analysis", disabled=not st.session_state.selected_apps):
+        progress_bar = st.progress(0)
+        progress_text = st.empty()
+        query_engines = {}
+        with run_context(f"portfolio:{portfolio_key[:12]}"):
+            for number, (document_hash, uploaded_file) in enumerate(uploads.items(), start=1):
+                progress_text.text(f"Indexing {uploaded_file.name} ({number}/{len(uploads)})")
+                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as temp_file:
+                    temp_file.write(uploaded_file.getvalue())
+                    temp_file_path = temp_file.name
+                # Chunks repeated across the portfolio are embedded once, via the embedding cache
+                query_engine = process_document(uploaded_file, temp_file_path, document_hash)
+                try:
+                    os.unlink(temp_file_path)
+                except OSError:
+                    pass
+                if query_engine:
+                    query_engines[document_hash] = query_engine
+            if not query_engines:
+                progress_bar.empty()
+                progress_text.empty()
+                st.error("None of the uploaded documents could be indexed.")
+                return
+            
+            def update_progress(completed, total, label):
+                progress_bar.progress(completed / total)
+                progress_text.text(f"Evaluated {completed}/{total} distinct clause checks: {label}")
+            
+            results, stats = run_portfolio_analysis(
+                query_engines,
+                st.session_state.selected_apps,
+                max_workers=st.session_state.max_concurrent_queries,
+                progress_callback=update_progress
+            )
+        progress_bar.progress(1.0)
+        progress_text.empty()
+        st.session_state.portfolio_results = {
+            "key": portfolio_key,
+            "names": {document_hash: uploads[document_hash].name for document_hash in results},
+            "results": results,
+            "stats": stats
+        }
+    
+    portfolio = st.session_state.portfolio_results
+    if not portfolio or portfolio["key"] != portfolio_key:
+        return
+    stats = portfolio["stats"]
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Documents", stats["documents"])
+    col2.metric("Requirement checks", stats["requirement_checks"])
+    col3.metric("LLM evaluations", stats["evaluations"])
+    col4.metric("Shared verdicts", stats["shared"])
+    col5.metric("Near-duplicate verdicts", stats["semantic"])
+    
+    import plotly.graph_objects as go
+    from results_table import results_frame, app_summary, compliance_matrix
+    
+    # The whole portfolio is flattened once; the heatmap and matrix are pivots of it
+    labels = display_names(portfolio["names"])
+    frame = results_frame(portfolio["results"])
+    if frame.empty:
+        st.info("No requirement results to show; select at least one APP.")
+        return
+    scores = app_summary(frame)["score"].unstack("app")
+    
+    st.markdown("## Portfolio Compliance Matrix")
+    heatmap = go.Figure(data=go.Heatmap(
+        z=scores.to_numpy(),
+        x=[str(app) for app in scores.columns],
+        y=[labels[document_hash] for document_hash in scores.index],
+        colorscale="RdYlGn",
+        zmin=0,
+        zmax=100,
+        hoverongaps=False
+    ))
+    heatmap.update_layout(
+        title="Compliance Score by Document",
+        xaxis_title="Australian Privacy Principles",
+        yaxis_title="Documents"
+    )
+    st.plotly_chart(heatmap, key="portfolio_heatmap")
+    matrix = compliance_matrix(frame, labels)
+    st.dataframe(matrix, use_container_width=True, hide_index=True)
+    
+    # Per-document reports are only built on request, not on every rerun
+    if st.button("Generate Portfolio Report"):
+        report = {
+            "documents": {
+                labels[document_hash]: dict(generate_report(results), document_hash=document_hash)
+                for document_hash, results in portfolio["results"].items()
+            },
+            "compliance_matrix": matrix.to_dict("records"),
+            "deduplication": stats
+        }
+        st.download_button(
+            "Download Portfolio Report (JSON)",
+            data=json.dumps(report, indent=2),
+            file_name="privacy_portfolio_report.json",
+            mime="application/json"
+        )
+
 def main():
     st.set_page_config(page_title="PrivacyLens: APPs Compliance Contract Analyzer", layout="wide")
+    # /metrics for Prometheus when TELEMETRY_PROMETHEUS_PORT is set
+    start_metrics_server()
     st.title("PrivacyLens: APPs Compliance Contract Analyzer")
 
     # Enhanced sidebar configuration
@@ -659,162 +1899,328 @@ def main():
             help="Enter specific terms or areas you want to focus on in the analysis"
         )
         
+        st.session_state.embedding_backend = st.selectbox(
+            "Embedding backend:",
+            options=list(EMBEDDING_BACKENDS),
+            index=list(EMBEDDING_BACKENDS).index(st.session_state.embedding_backend),
+            format_func=EMBEDDING_BACKENDS.get,
+            help="The local model needs no API calls; documents are re-indexed once per backend"
+        )
+        
+        st.session_state.portfolio_mode = st.checkbox(
+            "Portfolio mode (several contracts)",
+            value=st.session_state.portfolio_mode,
+            help="Analyze a family of contracts together; clauses they share are evaluated once"
+        )
+        
+        st.session_state.batched_evaluation = st.checkbox(
+            "Batched evaluation (one call per APP)",
+            value=st.session_state.batched_evaluation,
+            help="Score all requirements of an APP in a single structured prompt"
+        )
+        
+        st.session_state.prescreen_enabled = st.checkbox(
+            "Pre-screen requirements by retrieval",
+            value=st.session_state.prescreen_enabled,
+            help="Skip the LLM call for requirements with no supporting evidence in the document"
+        )
+        if st.session_state.prescreen_enabled:
+            st.session_state.prescreen_settings = {
+                "similarity_threshold": st.slider(
+                    "Pre-screen similarity threshold:",
+                    min_value=0.0,
+                    max_value=1.0,
+                    value=st.session_state.prescreen_settings["similarity_threshold"],
+                    step=0.01
+                ),
+                "min_keyword_hits": st.number_input(
+                    "Pre-screen minimum keyword matches:",
+                    min_value=0,
+                    max_value=10,
+                    value=st.session_state.prescreen_settings["min_keyword_hits"]
+                )
+            }
+        
+        st.session_state.max_concurrent_queries = st.slider(
+            "Max concurrent queries:",
+            min_value=1,
+            max_value=32,
+            value=st.session_state.max_concurrent_queries,
+            help="Number of requirement queries sent to the model at the same time"
+        )
+        
         if not st.session_state.openai_api_key:
             st.error("Please enter your OpenAI API key to continue.")
             st.stop()
+        
+        st.markdown("### Response Cache")
+        cache_stats_placeholder = st.empty()
+        
+        st.markdown("### Run Telemetry")
+        telemetry_placeholder = st.empty()
 
     try:
         if st.session_state.openai_api_key:
             openai_client = setup_openai(st.session_state.openai_api_key)
-            chroma_collection = initialize_vector_store()
-            llm, embed_model, prompt_helper = setup_llama_components(st.session_state.openai_api_key)
+            llm, embed_model, prompt_helper = setup_llama_components(
+                st.session_state.openai_api_key, st.session_state.embedding_backend
+            )
+            chroma_collection = initialize_vector_store(embed_model.model_name)
+            # Recently used documents of the selected backend reopen without a cold vector store
+            start_prewarm(embed_model.model_name)
+            # process_document reads these, so the cached/rate-limited models are actually used
+            st.session_state.llm = llm
+            st.session_state.embed_model = embed_model
+            st.session_state.prompt_helper = prompt_helper
             
             # File upload section
-            uploaded_file = st.file_uploader("Upload Privacy Document", type=["txt", "pdf"])
+            uploaded_file = None
+            reopened = None
+            if st.session_state.portfolio_mode:
+                show_portfolio()
+            else:
+                uploaded_file = st.file_uploader("Upload Privacy Document", type=["txt", "pdf"])
+                if not uploaded_file:
+                    reopened = select_recent_document(embed_model.model_name)
             
-            if uploaded_file:
-                with st.spinner("Processing document..."):
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as temp_file:
-                        temp_file.write(uploaded_file.getvalue())
-                        temp_file_path = temp_file.name
-
-                    query_engine = process_document(uploaded_file, temp_file_path)
-                    if query_engine:
-                        st.success("Document processed successfully!")
-                        
-                        # Initial document section extraction
-                        with st.spinner("Extracting document sections..."):
-                            document_sections = extract_document_sections(query_engine)
-                            st.session_state.query_engine = query_engine
-                    
-                    try:
-                        os.unlink(temp_file_path)
-                    except:
-                        pass
-
-                if st.button("Run Comprehensive Analysis"):
-                    results = {}
-                    progress_bar = st.progress(0)
-                    progress_text = st.empty()
-                    
-                    total_steps = len(st.session_state.selected_apps)
-                    for i, app in enumerate(st.session_state.selected_apps):
-                        progress_text.text(f"Analyzing {app}...")
-                        
-                        # Standard compliance analysis
-                        app_results = analyze_app_compliance(
-                            query_engine,
-                            app.replace("APP", ""),
-                            APPS[app]["requirements"]
+            if uploaded_file or reopened:
+                # Fingerprint the upload so unchanged documents reuse cached responses
+                if uploaded_file:
+                    st.session_state.document_hash = hash_bytes(uploaded_file.getvalue())
+                    document_name = uploaded_file.name
+                else:
+                    st.session_state.document_hash = reopened["document_hash"]
+                    document_name = reopened["file_name"]
+                
+                # Revised contracts only re-embed changed chunks and re-run affected requirements
+                # Candidates come from the persistent registry, so they survive a restart
+                registry = get_document_registry()
+                collection_name = vector_collection_name(embed_model.model_name)
+                previous_versions = {
+                    entry["document_hash"]: entry["file_name"]
+                    for entry in registry.recent(collection_name, RECENT_DOCUMENTS_SHOWN)
+                    if entry["file_name"]
+                }
+                previous_versions.update(
+                    (document_hash, entry["name"])
+                    for document_hash, entry in st.session_state.analyzed_documents.items()
+                )
+                previous_versions.pop(st.session_state.document_hash, None)
+                previous_document_hash = None
+                if previous_versions:
+                    # Preselect the latest document indexed under the same file name
+                    same_name = registry.previous_version(
+                        collection_name, document_name, st.session_state.document_hash
+                    )
+                    options = [None, *previous_versions]
+                    previous_document_hash = st.selectbox(
+                        "New version of a previously analyzed contract?",
+                        options=options,
+                        index=options.index(same_name["document_hash"])
+                        if same_name and same_name["document_hash"] in previous_versions else 0,
+                        format_func=lambda document_hash: (
+                            "No, analyze from scratch" if document_hash is None
+                            else f"{previous_versions[document_hash]} ({document_hash[:8]})"
                         )
-                        
-                        # Additional targeted analysis if keywords provided
-                        if st.session_state.analysis_keywords:
-                            targeted_results = analyze_targeted_compliance(
-                                query_engine,
-                                app.replace("APP", ""),
-                                st.session_state.analysis_keywords
-                            )
-                            # Merge targeted analysis with standard results
-                            for req in app_results:
-                                if req in targeted_results:
-                                    app_results[req]["targeted_findings"] = targeted_results[req]
-                        
-                        # Calculate scores and store results
-                        compliance_score = calculate_app_score(app_results)
-                        results[app] = {
-                            "title": APPS[app]["title"],
-                            "compliance_score": compliance_score,
-                            "detailed_results": app_results,
-                            "recommendations": []
-                        }
-                        
-                        progress_bar.progress((i + 1) / total_steps)
-                    
-                    # Generate improvement suggestions
-                    improvement_suggestions = generate_improvement_suggestions(query_engine, results)
-                    
-                    st.session_state.compliance_results = results
-                    st.session_state.analysis_complete = True
-                    
-                    # Create and display visualizations
-                    compliance_fig, risk_heatmap = create_enhanced_visualization(results)
-                    
-                    st.plotly_chart(compliance_fig)
-                    st.plotly_chart(risk_heatmap)
-                    
-                    # Display detailed results
-                    st.markdown("## Detailed Compliance Analysis")
-                    for app in st.session_state.selected_apps:
-                        data = results[app]
-                        with st.expander(f"{app}: {data['title']} - {data['compliance_score']:.1f}%"):
-                            st.markdown("### Requirements Analysis")
-                            for req, req_results in data["detailed_results"].items():
-                                status_icon = "✅" if req_results["compliance_status"] else "❌"
-                                st.markdown(f"**{req}** {status_icon}")
-                                st.markdown(f"Evidence: {req_results['evidence']}")
-                                
-                                if "targeted_findings" in req_results:
-                                    st.markdown("Targeted Analysis Findings:")
-                                    st.markdown(req_results["targeted_findings"])
-                                
-                                if req_results["recommendations"]:
-                                    st.markdown("Recommendations:")
-                                    for rec in req_results["recommendations"]:
-                                        st.markdown(f"- {rec}")
+                    )
+                
+                # Only index and extract sections when the document or API key changes,
+                # not on every widget interaction
+                query_engine_key = (
+                    st.session_state.openai_api_key, st.session_state.embedding_backend, st.session_state.document_hash
+                )
+                if st.session_state.query_engine_key != query_engine_key:
+                    st.session_state.query_engine = None
+                    st.session_state.document_sections = None
+                    # A job for another document no longer belongs on the page
+                    shown_job = get_job_store().get_job(st.query_params.get("job", ""))
+                    if shown_job and shown_job["document_hash"] != st.session_state.document_hash:
+                        del st.query_params["job"]
                     
-                    # Generate and offer reports
-                    if st.button("Generate Reports"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            pdf_buffer = generate_pdf_report(results)
-                            st.download_button(
-                                "Download PDF Report",
-                                data=pdf_buffer,
-                                file_name="privacy_compliance_report.pdf",
-                                mime="application/pdf"
-                            )
+                    with st.spinner("Processing document..."):
+                        temp_file_path = None
+                        with run_context(f"index:{st.session_state.document_hash[:12]}"):
+                            # Indexed documents are rebuilt from their stored vectors
+                            # without writing the upload to disk
+                            query_engine = load_query_engine(st.session_state.document_hash, llm, embed_model)
+                            if query_engine is None and uploaded_file:
+                                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as temp_file:
+                                    temp_file.write(uploaded_file.getvalue())
+                                    temp_file_path = temp_file.name
+                                query_engine = process_document(
+                                    uploaded_file, temp_file_path, st.session_state.document_hash
+                                )
+                            elif query_engine is None:
+                                st.error("This document is no longer in the vector store, please upload it again.")
+                            if query_engine:
+                                # Initial document section extraction
+                                with st.spinner("Extracting document sections..."):
+                                    st.session_state.document_sections = extract_document_sections(
+                                        query_engine, st.session_state.document_hash
+                                    )
+                                st.session_state.query_engine = query_engine
+                                st.session_state.query_engine_key = query_engine_key
                         
-                        with col2:
-                            json_report = generate_report(results)
-                            st.download_button(
-                                "Download JSON Report",
-                                data=json.dumps(json_report, indent=2),
-                                file_name="privacy_compliance_report.json",
-                                mime="application/json"
-                            )
+                        try:
+                            if temp_file_path:
+                                os.unlink(temp_file_path)
+                        except:
+                            pass
+                
+                query_engine = st.session_state.query_engine
+                if query_engine:
+                    st.success("Document processed successfully!")
+
+                if query_engine and not st.session_state.selected_apps:
+                    st.info("Select at least one APP in the sidebar to run an analysis.")
+                if query_engine and st.button(
+                    "Run Comprehensive Analysis", disabled=not st.session_state.selected_apps
+                ):
+                    # The analysis runs as a background job; ?job= lets a refreshed
+                    # or reconnected page pick it back up
+                    st.query_params["job"] = start_analysis_job(
+                        st.session_state.document_hash, document_name, previous_document_hash,
+                        (llm, embed_model, prompt_helper)
+                    )
+            
+            if st.query_params.get("job") and not st.session_state.portfolio_mode:
+                # Rendering and report generation count towards the job's run
+                with run_context(st.query_params["job"]):
+                    show_analysis_job(st.query_params["job"], (llm, embed_model, prompt_helper))
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
-
-#Fifth call calculates compliance scores
-def calculate_app_score(results):
-    """Calculate overall compliance score for an APP"""
-    if not results:
-        return 0
     
-    total_requirements = len(results)
-    compliant_requirements = sum(1 for r in results.values() if r['compliance_status'])
-    confidence_sum = sum(r.get('confidence_score', 0) for r in results.values())
-    
-    # Weight the score by both compliance and confidence
-    compliance_score = (compliant_requirements / total_requirements) * 100
-    confidence_factor = (confidence_sum / (total_requirements * 100))
-    
-    return compliance_score * confidence_factor
+    render_cache_stats(cache_stats_placeholder)
+    render_telemetry(telemetry_placeholder, st.query_params.get("job"))
 
-def create_compliance_visualization(results):
-    """Create a Plotly visualization of compliance results"""
-    apps = list(results.keys())
-    compliance_scores = []
-    confidence_scores = []
-    
-    for app in apps:
-        app_results = results[app]['detailed_results']
-        compliance_scores.append(calculate_app_score(app_results))
-        confidence_scores.append(
-            sum(r.get('confidence_score', 0) for r in app_results.values()) / len(app_results)
+def render_cache_stats(placeholder):
+    """Show response cache hit and miss counts in the sidebar"""
+    stats = get_response_cache().stats()
+    with placeholder.container():
+        col1, col2 = st.columns(2)
+        col1.metric("Cache hits", stats["hits"])
+        col2.metric("Cache misses", stats["misses"])
+        st.caption(f"{stats['entries']} cached responses ({stats['bytes'] / 1024:.0f} KB)")
+
+def render_telemetry(placeholder, current_run_id=None):
+    """Per-stage time, tokens, cost, retries and cache lookups of a recent run, with exports"""
+    telemetry = get_telemetry()
+    runs = telemetry.recent_runs()
+    with placeholder.container():
+        if not runs:
+            st.caption("No runs recorded yet")
+            return
+        run_id = st.selectbox(
+            "Run:",
+            options=runs,
+            index=runs.index(current_run_id) if current_run_id in runs else 0,
+            format_func=lambda run_id: run_id if run_id.startswith("index:") else f"analysis:{run_id[:8]}"
         )
+        summary = telemetry.run_summary(run_id)
+        stages = sorted(summary["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+        st.table([
+            {
+                "stage": name,
+                "calls": stage["count"],
+                "total s": round(stage["seconds"], 2),
+                "max s": round(stage["max"], 2),
+                "errors": stage["errors"]
+            }
+            for name, stage in stages
+        ])
+        counters = summary["counters"]
+        tokens = sum(value for name, value in counters.items() if name.startswith("tokens{"))
+        cost = sum(value for name, value in counters.items() if name.startswith("cost_usd{"))
+        retries = sum(value for name, value in counters.items() if name.startswith("retries{"))
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Tokens", f"{tokens:,}")
+        col2.metric("Est. cost", f"${cost:.4f}")
+        col3.metric("Retries", retries)
+        with st.expander("All counters"):
+            st.json(counters)
+        st.download_button(
+            "Download run events (JSONL)",
+            data=telemetry.export_jsonl(run_id),
+            file_name=f"telemetry_{run_id.replace(':', '_')}.jsonl",
+            mime="application/x-ndjson"
+        )
+        st.download_button(
+            "Download metrics (Prometheus)",
+            data=telemetry.prometheus_text(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+
+@traced("render")
+def render_charts(placeholder, results, update_number):
+    """Draw (or redraw) the compliance overview and risk heatmap into a placeholder"""
+    compliance_fig, risk_heatmap = create_enhanced_visualization(results)
+    with placeholder.container():
+        # Each redraw needs its own keys within one script run
+        st.plotly_chart(compliance_fig, key=f"compliance_chart_{update_number}")
+        st.plotly_chart(risk_heatmap, key=f"risk_heatmap_{update_number}")
+
+def render_app_results(placeholder, app, data):
+    """Draw (or redraw) one APP's expander with the requirements answered so far"""
+    answered = len(data["detailed_results"])
+    total = len(APPS[app]["requirements"])
+    progress = "" if answered == total else f" ({answered}/{total} requirements)"
+    with placeholder.container():
+        with st.expander(f"{app}: {data['title']} - {data['compliance_score']:.1f}%{progress}"):
+            st.markdown("### Requirements Analysis")
+            for req, req_results in data["detailed_results"].items():
+                status_icon = "✅" if req_results["compliance_status"] else "❌"
+                if req_results.get("analysis_error"):
+                    status_icon = "⚠️ not scored"
+                st.markdown(f"**{req}** {status_icon}")
+                if req_results.get("prescreened"):
+                    st.caption("Pre-screened by retrieval, no LLM call made")
+                if req_results.get("semantic_match"):
+                    st.caption(reused_verdict_note(req_results).capitalize())
+                st.markdown(f"Evidence: {req_results['evidence']}")
+                
+                if "targeted_findings" in req_results:
+                    st.markdown("Targeted Analysis Findings:")
+                    st.markdown(req_results["targeted_findings"])
+                
+                if req_results["recommendations"]:
+                    st.markdown("Recommendations:")
+                    for rec in req_results["recommendations"]:
+                        st.markdown(f"- {rec}")
+
+def render_token_budget(document_hash, since):
+    """Show the prompt size of every LLM query made for this document since `since`"""
+    records = [
+        record for record in get_token_budget_log().records(document_hash)
+        if record["recorded_at"] >= since
+    ]
+    with st.expander(f"Token Budget per Query ({len(records)} LLM queries)"):
+        if not records:
+            st.caption("Every result was served from the cache or the pre-screen")
+            return
+        prompt_tokens = [record["prompt_tokens"] for record in records]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Mean prompt tokens", f"{sum(prompt_tokens) / len(records):.0f}")
+        col2.metric("Largest prompt", max(prompt_tokens))
+        col3.metric("Context budget", QUERY_CONTEXT_TOKENS)
+        st.dataframe([
+            {key: record[key] for key in (
+                "label", "instruction_tokens", "context_tokens", "output_tokens",
+                "prompt_tokens", "chunks_retrieved", "chunks_kept"
+            )}
+            for record in records
+        ])
+
+def create_compliance_visualization(results, summary=None):
+    """Create a Plotly visualization of compliance results"""
+    import plotly.graph_objects as go
+    
+    if summary is None:
+        _, summary = results_summary(results)
+    apps = [str(app) for app in summary.index]
+    compliance_scores = summary["score"].tolist()
+    confidence_scores = summary["confidence"].tolist()
     
     # Create compliance score bar chart
     fig = go.Figure(data=[
@@ -857,8 +2263,57 @@ def create_compliance_visualization(results):
     
     return fig
 
+def compliance_delta(previous_results, results):
+    """Score changes per APP and answer changes per requirement between two versions of a contract"""
+    delta = {"apps": {}, "changed_requirements": [], "reused_requirements": 0, "reevaluated_requirements": 0}
+    for app, data in results.items():
+        previous = previous_results.get(app, {"compliance_score": 0, "detailed_results": {}})
+        delta["apps"][app] = {
+            "previous_score": previous["compliance_score"],
+            "score": data["compliance_score"],
+            "change": data["compliance_score"] - previous["compliance_score"]
+        }
+        for requirement, result in data["detailed_results"].items():
+            if result.get("carried_over_from"):
+                delta["reused_requirements"] += 1
+                continue
+            delta["reevaluated_requirements"] += 1
+            previous_result = previous["detailed_results"].get(requirement)
+            if (previous_result is None
+                    or previous_result["compliance_status"] != result["compliance_status"]
+                    or previous_result.get("confidence_score") != result.get("confidence_score")):
+                delta["changed_requirements"].append({
+                    "app": app,
+                    "requirement": requirement,
+                    "previous_status": previous_result["compliance_status"] if previous_result else None,
+                    "status": result["compliance_status"],
+                    "previous_confidence": previous_result.get("confidence_score") if previous_result else None,
+                    "confidence": result.get("confidence_score"),
+                    "evidence": result["evidence"]
+                })
+    return delta
+
+def render_compliance_delta(delta, previous_name):
+    """Show what changed since the previous version of the contract"""
+    st.markdown(f"## Changes Since {previous_name}")
+    st.caption(
+        f"{delta['reevaluated_requirements']} requirements re-evaluated, "
+        f"{delta['reused_requirements']} reused because their evidence did not change"
+    )
+    cols = st.columns(min(4, len(delta["apps"])) or 1)
+    for i, (app, change) in enumerate(delta["apps"].items()):
+        cols[i % len(cols)].metric(app, f"{change['score']:.1f}%", f"{change['change']:+.1f}")
+    for change in delta["changed_requirements"]:
+        previous_icon = {True: "✅", False: "❌", None: "–"}[change["previous_status"]]
+        icon = "✅" if change["status"] else "❌"
+        st.markdown(f"**{change['app']} {change['requirement']}**: {previous_icon} → {icon}")
+        st.caption(change["evidence"])
+
+@traced("generate_report")
 def generate_report(results):
     """Generate a comprehensive compliance report"""
+    from results_table import unscored_requirements
+    
     timestamp = datetime.now().isoformat()
     
     report = {
@@ -867,36 +2322,43 @@ def generate_report(results):
             "overall_compliance_score": 0,
             "average_confidence_score": 0,
             "high_priority_recommendations": [],
-            "compliance_by_app": {}
+            "compliance_by_app": {},
+            "reused_verdicts": []
         },
         "detailed_results": results
     }
     
-    # Calculate overall scores
-    total_score = 0
-    total_confidence = 0
-    num_apps = len(results)
+    # Calculate overall scores from the columnar summary
+    frame, summary = results_summary(results)
+    unscored = unscored_requirements(frame)
     
-    for app, data in results.items():
-        app_results = data['detailed_results']
-        app_score = calculate_app_score(app_results)
-        app_confidence = sum(r.get('confidence_score', 0) for r in app_results.values()) / len(app_results)
-        
+    for app, app_score, app_confidence in zip(summary.index, summary["score"], summary["confidence"]):
         report["summary"]["compliance_by_app"][app] = {
-            "score": app_score,
-            "confidence": app_confidence
+            "score": float(app_score),
+            "confidence": float(app_confidence),
+            "unscored_requirements": unscored.get(("document", app), [])
         }
         
-        total_score += app_score
-        total_confidence += app_confidence
-        
         # Collect high-priority recommendations for low-scoring areas
         if app_score < 75:
-            for rec in data['recommendations']:
+            for rec in results[app]['recommendations']:
                 report["summary"]["high_priority_recommendations"].append(f"{app}: {rec}")
     
-    report["summary"]["overall_compliance_score"] = total_score / num_apps
-    report["summary"]["average_confidence_score"] = total_confidence / num_apps
+    # Verdicts whose evidence quote belongs to a near-duplicate document
+    for app, data in results.items():
+        for requirement, result in data["detailed_results"].items():
+            if result.get("semantic_match"):
+                report["summary"]["reused_verdicts"].append({
+                    "app": app,
+                    "requirement": requirement,
+                    "source_document": result["semantic_match"]["document_hash"],
+                    "similarity": result["semantic_match"]["similarity"],
+                    "note": reused_verdict_note(result)
+                })
+    
+    if len(summary):
+        report["summary"]["overall_compliance_score"] = float(summary["score"].mean())
+        report["summary"]["average_confidence_score"] = float(summary["confidence"].mean())
     
     return report
 
@@ -0,0 +1,292 @@
+"""Headless batch analysis of a directory of contracts.
+
+Runs the same pipeline as the Streamlit app (process_document,
+run_compliance_analysis, calculate_app_score, generate_report) over many
+PDF/TXT files with bounded parallelism. Writes one JSON report per document
+and an aggregate CSV, plus telemetry.jsonl and metrics.prom for the batch.
+With --portfolio the documents are analyzed together: clauses they share are
+evaluated once and a combined portfolio_matrix.csv is written.
+
+    python batch_analyze.py contracts/ --output reports/
+    python batch_analyze.py "vendors/**/*.pdf" --workers 4 --apps APP1 APP8 --skip-existing
+    python batch_analyze.py vendors/ --portfolio --output reports/
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+SUPPORTED_EXTENSIONS = {".pdf": "application/pdf", ".txt": "text/plain"}
+
+
+def find_documents(inputs):
+    """Expand directories and glob patterns into a sorted list of supported files"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+        else:
+            candidates = glob.glob(item, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def report_path(output_dir, path):
+    """JSON report location for a document, keeping names unique across folders"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output_dir, f"{stem}-{path_hash}.json")
+
+
+def analyze_document(Home, path, components, args):
+    """Index and analyze one contract, returning its report"""
+    embed_model = components[1]
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        document_hash = Home.hash_bytes(f.read())
+
+    # Telemetry for each document is recorded as its own run
+    # A revised contract reuses the answers of the last version indexed under its name
+    previous = Home.get_document_registry().previous_version(
+        Home.vector_collection_name(embed_model.model_name), os.path.basename(path), document_hash
+    )
+    previous_document_hash = previous["document_hash"] if previous else None
+
+    with Home.run_context(f"batch:{document_hash[:12]}"):
+        _, query_engine = index_document(Home, path, components, document_hash)
+        results = Home.run_compliance_analysis(
+            query_engine,
+            args.apps,
+            keywords=args.keywords,
+            max_workers=args.max_concurrent_queries,
+            document_hash=document_hash,
+            batched=args.batched,
+            prescreen={
+                "similarity_threshold": Home.PRESCREEN_SIMILARITY_THRESHOLD,
+                "min_keyword_hits": Home.PRESCREEN_MIN_KEYWORD_HITS
+            } if args.prescreen else None,
+            embed_model=embed_model,
+            previous_document_hash=previous_document_hash
+        )
+        report = Home.generate_report(results)
+    report["document"] = {
+        "path": path,
+        "name": os.path.basename(path),
+        "document_hash": document_hash,
+        "previous_document_hash": previous_document_hash,
+        "seconds": time.perf_counter() - start
+    }
+    return report
+
+
+def index_document(Home, path, components, document_hash=None):
+    """Index one contract, returning (document_hash, query_engine)"""
+    llm, embed_model, prompt_helper = components
+    if document_hash is None:
+        with open(path, "rb") as f:
+            document_hash = Home.hash_bytes(f.read())
+    uploaded_file = SimpleNamespace(
+        name=os.path.basename(path),
+        type=SUPPORTED_EXTENSIONS[os.path.splitext(path)[1].lower()]
+    )
+    query_engine = Home.process_document(
+        uploaded_file, path, document_hash,
+        llm=llm, embed_model=embed_model, prompt_helper=prompt_helper
+    )
+    if query_engine is None:
+        raise RuntimeError("document could not be processed")
+    return document_hash, query_engine
+
+
+def analyze_portfolio(Home, paths, components, args):
+    """
+    Index every contract, then analyze them together so clauses they share are
+    evaluated once. Returns ({path: report}, {path: error}, compliance matrix, stats).
+    """
+    start = time.perf_counter()
+    engines = {}
+    errors = {}
+    with Home.run_context("batch:portfolio"):
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                Home.submit_with_context(executor, index_document, Home, path, components): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    engines[path] = future.result()
+                except Exception as e:
+                    errors[path] = str(e)
+
+        query_engines = {document_hash: query_engine for document_hash, query_engine in engines.values()}
+        results, stats = Home.run_portfolio_analysis(
+            query_engines,
+            args.apps,
+            max_workers=args.max_concurrent_queries,
+            embed_model=components[1]
+        )
+
+    seconds = time.perf_counter() - start
+    reports = {}
+    names = {}
+    for path, (document_hash, _) in engines.items():
+        report = Home.generate_report(results[document_hash])
+        report["document"] = {
+            "path": path,
+            "name": os.path.basename(path),
+            "document_hash": document_hash,
+            # Documents share the work, so each reports the wall time of the whole portfolio
+            "seconds": seconds
+        }
+        reports[path] = report
+        names[document_hash] = os.path.basename(path)
+    from portfolio import display_names
+    from results_table import results_frame, compliance_matrix
+    matrix = compliance_matrix(results_frame(results), display_names(names)) if results else None
+    return reports, errors, matrix, stats
+
+
+def summary_row(path, report, apps, error=None):
+    """One aggregate CSV row: overall scores plus one score column per APP"""
+    row = {"document": path, "status": "error" if error else "ok", "error": error or ""}
+    if report:
+        summary = report["summary"]
+        row["seconds"] = f"{report['document']['seconds']:.1f}"
+        row["document_hash"] = report["document"]["document_hash"]
+        row["overall_compliance_score"] = f"{summary['overall_compliance_score']:.1f}"
+        row["average_confidence_score"] = f"{summary['average_confidence_score']:.1f}"
+        for app in apps:
+            row[app] = f"{summary['compliance_by_app'][app]['score']:.1f}"
+    return row
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a batch of privacy contracts against the APPs")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of PDF/TXT contracts")
+    parser.add_argument("--output", default="./batch_reports", help="Directory for JSON reports and summary.csv")
+    parser.add_argument("--workers", type=int, default=4, help="Documents analyzed in parallel")
+    parser.add_argument("--max-concurrent-queries", type=int, default=None,
+                        help="Requirement queries in flight per document (default MAX_CONCURRENT_QUERIES)")
+    parser.add_argument("--apps", nargs="+", default=None, help="APPs to analyze (default all)")
+    parser.add_argument("--keywords", default="", help="Optional keywords for targeted analysis")
+    parser.add_argument("--batched", action="store_true", help="Score each APP in one structured call")
+    parser.add_argument("--prescreen", action="store_true", help="Skip LLM calls for unsupported requirements")
+    parser.add_argument("--portfolio", action="store_true",
+                        help="Analyze the documents together, evaluating shared clauses once")
+    parser.add_argument("--embedding-backend", choices=["openai", "local"], default=None,
+                        help="Embed through the OpenAI API or a local CPU model (default EMBEDDING_BACKEND)")
+    parser.add_argument("--skip-existing", action="store_true", help="Reuse reports already in the output directory")
+    parser.add_argument("--api-key", default=None, help="OpenAI API key (default OPENAI_API_KEY)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    api_key = args.api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("An OpenAI API key is required (--api-key or OPENAI_API_KEY)", file=sys.stderr)
+        return 2
+
+    import Home
+
+    args.apps = args.apps or list(Home.APPS.keys())
+    unknown_apps = [app for app in args.apps if app not in Home.APPS]
+    if unknown_apps:
+        print(f"Unknown APPs: {', '.join(unknown_apps)}", file=sys.stderr)
+        return 2
+
+    paths = find_documents(args.inputs)
+    if not paths:
+        print("No PDF or TXT documents found", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    components = Home.setup_llama_components(api_key, args.embedding_backend or Home.EMBEDDING_BACKEND)
+
+    rows = {}
+    pending = []
+    for path in paths:
+        existing = report_path(args.output, path)
+        if args.skip_existing and os.path.exists(existing):
+            try:
+                with open(existing, encoding="utf-8") as f:
+                    report = json.load(f)
+                # Reports from a run with other --apps are analyzed again
+                if all(app in report["summary"]["compliance_by_app"] for app in args.apps):
+                    rows[path] = summary_row(path, report, args.apps)
+                    continue
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                # Truncated or outdated reports are simply analyzed again
+                print(f"{path}: existing report unreadable ({e!r}), analyzing again")
+        pending.append(path)
+
+    if args.portfolio and pending:
+        print(f"Analyzing {len(pending)} of {len(paths)} documents as a portfolio")
+        reports, errors, matrix, stats = analyze_portfolio(Home, pending, components, args)
+        for path, error in errors.items():
+            rows[path] = summary_row(path, None, args.apps, error=error)
+            print(f"{path}: failed ({error})")
+        for path, report in reports.items():
+            with open(report_path(args.output, path), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            rows[path] = summary_row(path, report, args.apps)
+        if matrix is not None:
+            matrix.to_csv(os.path.join(args.output, "portfolio_matrix.csv"), index=False)
+        print(f"{stats['requirement_checks']} requirement checks: {stats['evaluations']} LLM evaluations, "
+              f"{stats['shared']} shared, {stats['semantic']} near-duplicate, {stats['cached']} cached")
+        pending = []
+
+    if pending:
+        print(f"Analyzing {len(pending)} of {len(paths)} documents with {args.workers} workers")
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(analyze_document, Home, path, components, args): path
+            for path in pending
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                rows[path] = summary_row(path, None, args.apps, error=str(e))
+                print(f"[{completed}/{len(pending)}] {path}: failed ({str(e)})")
+                continue
+            with open(report_path(args.output, path), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            rows[path] = summary_row(path, report, args.apps)
+            print(f"[{completed}/{len(pending)}] {path}: "
+                  f"{report['summary']['overall_compliance_score']:.1f}% in {report['document']['seconds']:.1f}s")
+
+    fieldnames = ["document", "document_hash", "status", "error", "seconds",
+                  "overall_compliance_score", "average_confidence_score", *args.apps]
+    with open(os.path.join(args.output, "summary.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for path in paths:
+            writer.writerow(rows[path])
+
+    # Per-stage timings, tokens and cost for the whole batch
+    telemetry = Home.get_telemetry()
+    with open(os.path.join(args.output, "telemetry.jsonl"), "w", encoding="utf-8") as f:
+        f.write(telemetry.export_jsonl())
+    with open(os.path.join(args.output, "metrics.prom"), "w", encoding="utf-8") as f:
+        f.write(telemetry.prometheus_text())
+
+    failures = sum(1 for row in rows.values() if row["status"] == "error")
+    print(f"Wrote {len(paths) - failures} reports to {args.output} ({failures} failed)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Synthetic privacy contracts of different sizes for the offline benchmark"""
+import random
+
+PARTIES = ["Acme Cloud Pty Ltd", "Northwind Analytics", "Harbour Health Services", "Blue Gum Retail"]
+
+# Clause templates grouped by the APP area they speak to
+CLAUSES = {
+    "governance": [
+        "{party} maintains a privacy management framework covering the full information lifecycle.",
+        "A privacy impact assessment is completed before any new project that handles personal information.",
+        "Staff receive regular privacy training and quarterly compliance bulletins.",
+        "The privacy policy is reviewed annually and published on the {party} website.",
+    ],
+    "anonymity": [
+        "Individuals may deal with {party} anonymously or by using a pseudonym where practicable.",
+    ],
+    "collection": [
+        "{party} only collects personal information that is reasonably necessary for its functions.",
+        "Sensitive information is collected only with the express consent of the individual.",
+        "Personal information is collected by lawful and fair means and directly from the individual.",
+    ],
+    "unsolicited": [
+        "Unsolicited personal information is assessed and destroyed or de-identified if it could not have been collected.",
+    ],
+    "notification": [
+        "At the time of collection, individuals are notified of the purposes and of any overseas recipients.",
+    ],
+    "use": [
+        "Personal information is used only for the primary purpose of collection unless the individual consents.",
+    ],
+    "marketing": [
+        "Direct marketing messages include a simple opt-out mechanism and the source of the information on request.",
+    ],
+    "cross_border": [
+        "Before disclosing personal information overseas, {party} takes reasonable steps to ensure the recipient complies with the APPs.",
+        "Cloud storage providers are contractually required to store data in jurisdictions with adequate privacy protection.",
+    ],
+    "identifiers": [
+        "Government related identifiers such as Medicare numbers are not adopted as {party} identifiers.",
+    ],
+    "quality": [
+        "{party} takes reasonable steps to keep personal information accurate, up to date and complete.",
+    ],
+    "security": [
+        "Personal information is protected against misuse, interference, loss and unauthorised access using encryption.",
+        "Third-party contractors must certify the destruction of personal information at the end of the engagement.",
+    ],
+    "access": [
+        "Individuals may request access to their personal information without giving a reason.",
+        "Requests to correct personal information are handled within 30 days.",
+    ],
+    "boilerplate": [
+        "This agreement is governed by the laws of New South Wales.",
+        "Each party must pay its own costs in relation to this agreement.",
+        "Notices must be given in writing to the address of the receiving party.",
+        "This agreement may be executed in any number of counterparts.",
+        "Neither party may assign its rights without the prior written consent of the other party.",
+    ],
+}
+
+HEADINGS = ["DEFINITIONS", "DATA HANDLING", "OBLIGATIONS OF THE PROVIDER", "SECURITY", "GENERAL TERMS"]
+
+# Number of clauses per document for each size class
+DOCUMENT_SIZES = {
+    "small": 20,
+    "medium": 120,
+    "large": 600,
+}
+
+
+def generate_document(num_clauses, seed=0, coverage=0.7):
+    """
+    Build a contract of `num_clauses` numbered clauses.
+
+    `coverage` is the share of APP areas the contract addresses at all; the rest
+    is filled with boilerplate so some requirements have no supporting evidence.
+    """
+    rng = random.Random(seed)
+    party = rng.choice(PARTIES)
+    areas = [area for area in CLAUSES if area != "boilerplate"]
+    covered = rng.sample(areas, max(1, round(len(areas) * coverage)))
+
+    lines = [f"DATA PROCESSING AGREEMENT BETWEEN {party.upper()} AND THE CUSTOMER", ""]
+    for number in range(1, num_clauses + 1):
+        area = rng.choice(covered) if rng.random() < 0.6 else "boilerplate"
+        clause = rng.choice(CLAUSES[area]).format(party=party)
+        section, subsection = divmod(number - 1, 10)
+        if subsection == 0:
+            lines.append(f"{section + 1}. {rng.choice(HEADINGS)}")
+        lines.append(f"{section + 1}.{subsection + 1}. {clause}")
+    return "\n".join(lines)
+
+
+def generate_corpus(sizes=("small", "medium", "large"), documents_per_size=2, seed=0):
+    """Return [(name, text)] with `documents_per_size` distinct documents per size class"""
+    corpus = []
+    for size in sizes:
+        for index in range(documents_per_size):
+            document_seed = seed * 1000 + index + DOCUMENT_SIZES[size]
+            corpus.append((f"{size}_{index}.txt", generate_document(DOCUMENT_SIZES[size], document_seed)))
+    return corpus
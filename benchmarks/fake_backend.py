@@ -0,0 +1,214 @@
+"""Deterministic offline stand-ins for the OpenAI LLM and embedding model.
+
+Both fakes sleep for a configurable latency, fail with simulated 429s at a
+configurable rate and record every call, so the benchmark can measure the
+pipeline without network access or API cost.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from rate_limiter import estimate_tokens
+
+
+class FakeRateLimitError(Exception):
+    """Looks like an openai.RateLimitError to the shared rate limiter"""
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Simulated rate limit (429)")
+        self.response = type("FakeResponse", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+class CallStats:
+    """Thread-safe record of calls made to a fake backend"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.tokens = 0
+            self.latencies = []
+
+    def record(self, latency, tokens, error=False):
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+            self.latencies.append(latency)
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "tokens": self.tokens,
+                "latencies": list(self.latencies)
+            }
+
+
+class FakeBackendMixin:
+    """Shared latency and error injection for the fake LLM and embedding model"""
+
+    def _simulate_call(self, tokens):
+        start = time.perf_counter()
+        with self._lock:
+            jitter = self._random.uniform(1 - self.latency_jitter, 1 + self.latency_jitter)
+            fail = self._random.random() < self.error_rate
+        time.sleep(max(0.0, self.latency * jitter))
+        self._stats.record(time.perf_counter() - start, tokens, error=fail)
+        if fail:
+            raise FakeRateLimitError(self.retry_after)
+
+    @property
+    def stats(self):
+        return self._stats
+
+
+def stable_hash(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+
+
+def fake_verdict(requirement, context):
+    """Deterministic verdict for a requirement given the text the model was shown"""
+    terms = [t for t in requirement.split("_") if len(t) > 3]
+    mentioned = any(term in context.lower() for term in terms)
+    seed = stable_hash(requirement + context[:2000])
+    return {
+        "compliance_status": mentioned and seed % 4 != 0,
+        "evidence": f"Simulated evidence for {requirement}." if mentioned else "No relevant sections found.",
+        "recommendations": [f"Review the clauses covering {requirement.replace('_', ' ')}"],
+        "confidence_score": 55 + seed % 41
+    }
+
+
+def canned_response(prompt, responses=None):
+    """Pick the JSON answer for a prompt, mirroring the prompts Home.py sends"""
+    for marker, response in (responses or {}).items():
+        if marker in prompt:
+            return response
+
+    batched = re.findall(r"^\s*- ([a-z_]+): ", prompt, flags=re.MULTILINE)
+    if "keyed by requirement name" in prompt and batched:
+        return json.dumps({req: fake_verdict(req, prompt) for req in batched})
+
+    match = re.search(r"Specifically evaluate the requirement: ([a-z_]+)", prompt)
+    if match:
+        return json.dumps(fake_verdict(match.group(1), prompt))
+
+    return json.dumps({
+        "compliance_status": True,
+        "evidence": "Simulated summary of the document.",
+        "recommendations": ["Simulated recommendation"],
+        "confidence_score": 70
+    })
+
+
+class FakeLLM(FakeBackendMixin, CustomLLM):
+    """Offline LLM returning canned JSON answers with simulated latency and 429s"""
+
+    latency: float = 0.2
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    retry_after: float = 0.1
+    # Share of answers cut off mid-JSON, to exercise the format re-requests
+    malformed_rate: float = 0.0
+    seed: int = 0
+    responses: dict = {}
+
+    _stats = PrivateAttr()
+    _random = PrivateAttr()
+    _lock = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = CallStats()
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls):
+        return "FakeLLM"
+
+    @property
+    def metadata(self):
+        return LLMMetadata(context_window=4096, num_output=512, model_name="fake-llm")
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        self._simulate_call(estimate_tokens(prompt))
+        text = canned_response(prompt, self.responses)
+        with self._lock:
+            malformed = self._random.random() < self.malformed_rate
+        return CompletionResponse(text=text[:len(text) // 2] if malformed else text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        response = self.complete(prompt, formatted=formatted, **kwargs)
+        yield CompletionResponse(text=response.text, delta=response.text)
+
+
+class FakeEmbedding(FakeBackendMixin, BaseEmbedding):
+    """Offline embedding model: hashed bag-of-words vectors, so similar text scores as similar"""
+
+    dimensions: int = 256
+    latency: float = 0.05
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    retry_after: float = 0.1
+    seed: int = 0
+
+    _stats = PrivateAttr()
+    _random = PrivateAttr()
+    _lock = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("model_name", "fake-embedding")
+        super().__init__(**kwargs)
+        self._stats = CallStats()
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls):
+        return "FakeEmbedding"
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"[a-z]{3,}", text.lower()):
+            vector[stable_hash(word) % self.dimensions] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _get_query_embedding(self, query):
+        self._simulate_call(estimate_tokens(query))
+        return self._vector(query)
+
+    def _get_text_embedding(self, text):
+        self._simulate_call(estimate_tokens(text))
+        return self._vector(text)
+
+    def _get_text_embeddings(self, texts):
+        # One simulated request per batch, like the real embeddings endpoint
+        self._simulate_call(sum(estimate_tokens(text) for text in texts))
+        return [self._vector(text) for text in texts]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text):
+        return self._get_text_embedding(text)
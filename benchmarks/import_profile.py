@@ -0,0 +1,77 @@
+"""Import-time profile of Home.py.
+
+Imports the module in a fresh interpreter with `python -X importtime` and
+reports the total import time and the slowest top-level packages, so eager
+heavy imports show up before they slow down cold starts.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --module Home --top 15 --include llama_index chromadb
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_imports(module, extra_imports=()):
+    """Return [(package, self_us, cumulative_us)] for every module imported by `module`"""
+    statements = [f"import {name}" for name in (*extra_imports, module)]
+    return run_importtime("; ".join(statements) or "pass")
+
+
+def run_importtime(code):
+    """Run `code` under -X importtime and parse the per-module timings"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def top_level_costs(entries):
+    """Cumulative import time per top-level package (only entries at the outermost nesting level)"""
+    costs = {}
+    for name, _, cumulative_us in entries:
+        # Nested imports are indented by two spaces per level under their importer
+        if name.startswith("  "):
+            continue
+        package = name.strip().split(".")[0]
+        costs[package] = costs.get(package, 0) + cumulative_us
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile module import time")
+    parser.add_argument("--module", default="Home")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--include", nargs="*", default=[],
+                        help="Also import these modules, e.g. to compare against eager loading")
+    args = parser.parse_args(argv)
+
+    # Modules the interpreter loads at startup are not part of the module's cost
+    startup = {name for name, _, _ in run_importtime("pass")}
+    entries = [entry for entry in profile_imports(args.module, args.include) if entry[0] not in startup]
+    costs = top_level_costs(entries)
+    total_us = sum(cost for _, cost in costs)
+
+    print(f"Importing {args.module} loaded {len(entries)} modules in {total_us / 1000:.1f} ms")
+    print(f"{'package':<32}{'cumulative ms':>14}{'share':>8}")
+    for package, cost in costs[:args.top]:
+        print(f"{package:<32}{cost / 1000:>14.1f}{cost / total_us:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Offline throughput benchmark for the compliance analysis pipeline.
+
+Drives process_document, run_compliance_analysis and report generation from
+Home.py over a synthetic corpus, with FakeLLM/FakeEmbedding standing in for
+OpenAI. Every run uses a fresh Chroma directory and cache so numbers are
+comparable between commits.
+
+    python -m benchmarks.run_benchmark --sizes small medium --docs-per-size 2
+    python -m benchmarks.run_benchmark --llm-latency 0.5 --error-rate 0.05 --output bench.json
+
+Compare prompt tokens per requirement against the library's default chunking
+and retrieval with:
+
+    python -m benchmarks.run_benchmark --chunking sentence --top-k 2 --similarity-cutoff 0
+
+Real retrieval quality without any network access (needs fastembed; models are
+downloaded once into its cache) with a local embedding model and reranker:
+
+    python -m benchmarks.run_benchmark --embedding-backend local --reranker Xenova/ms-marco-MiniLM-L-6-v2
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile, 0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the PrivacyLens pipeline")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"],
+                        choices=["small", "medium", "large"])
+    parser.add_argument("--docs-per-size", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=1,
+                        help="Repeat the corpus; runs after the first hit warm caches")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Mean fake LLM latency (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Mean fake embedding latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of LLM answers cut off mid-JSON")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--batched", action="store_true")
+    parser.add_argument("--prescreen", action="store_true")
+    parser.add_argument("--keywords", default="")
+    parser.add_argument("--rpm", type=int, default=100000, help="Rate limiter requests per minute")
+    parser.add_argument("--tpm", type=int, default=100000000, help="Rate limiter tokens per minute")
+    parser.add_argument("--chunking", choices=["clause", "sentence"], default="clause",
+                        help="Chunking strategy for new documents")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=4, help="Chunks retrieved per query")
+    parser.add_argument("--similarity-cutoff", type=float, default=0.72,
+                        help="Drop retrieved chunks below this similarity")
+    parser.add_argument("--semantic-threshold", type=float, default=0.85,
+                        help="Evidence similarity for reusing verdicts across documents (above 1 disables)")
+    parser.add_argument("--embedding-backend", choices=["fake", "local"], default="fake",
+                        help="FakeEmbedding, or LOCAL_EMBEDDING_MODEL run on the CPU")
+    parser.add_argument("--reranker", default="", help="Local cross-encoder model for reranking (default off)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    """Point every on-disk store at a scratch directory before Home.py is imported"""
+    workdir = tempfile.mkdtemp(prefix="privacylens-bench-")
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "chroma_db")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.sqlite3")
+    os.environ["DOCUMENT_REGISTRY_PATH"] = os.path.join(workdir, "document_registry.sqlite3")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "analysis_jobs.sqlite3")
+    for name in ("LLM", "EMBEDDING"):
+        os.environ[f"OPENAI_{name}_RPM"] = str(args.rpm)
+        os.environ[f"OPENAI_{name}_TPM"] = str(args.tpm)
+    os.environ["CHUNKING_STRATEGY"] = args.chunking
+    os.environ["CHUNK_TOKENS"] = str(args.chunk_tokens)
+    os.environ["RETRIEVAL_TOP_K"] = str(args.top_k)
+    os.environ["RETRIEVAL_SIMILARITY_CUTOFF"] = str(args.similarity_cutoff)
+    os.environ["SEMANTIC_CACHE_THRESHOLD"] = str(args.semantic_threshold)
+    os.environ["RERANKER_MODEL"] = args.reranker
+    return workdir
+
+
+def run_document(Home, name, text, workdir, llm, base_embed_model, embed_model, prompt_helper, args):
+    """Run one document end to end and return its timings and call counts"""
+    llm.stats.reset()
+    # The local model is not instrumented; only fake embeddings count calls
+    embed_stats = getattr(base_embed_model, "stats", None)
+    if embed_stats is not None:
+        embed_stats.reset()
+    stages = {}
+
+    path = os.path.join(workdir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    uploaded_file = SimpleNamespace(name=name, type="text/plain")
+    document_hash = Home.hash_bytes(text.encode("utf-8"))
+    document_started_at = time.time()
+
+    start = time.perf_counter()
+    query_engine = Home.process_document(
+        uploaded_file, path, document_hash,
+        llm=llm, embed_model=embed_model, prompt_helper=prompt_helper
+    )
+    if query_engine is None:
+        raise RuntimeError(f"process_document failed for {name}")
+    stages["process_document"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Home.extract_document_sections(query_engine, document_hash)
+    stages["extract_document_sections"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = Home.run_compliance_analysis(
+        query_engine,
+        list(Home.APPS.keys()),
+        keywords=args.keywords,
+        max_workers=args.max_workers,
+        document_hash=document_hash,
+        batched=args.batched,
+        prescreen={
+            "similarity_threshold": Home.PRESCREEN_SIMILARITY_THRESHOLD,
+            "min_keyword_hits": Home.PRESCREEN_MIN_KEYWORD_HITS
+        } if args.prescreen else None,
+        embed_model=embed_model
+    )
+    stages["analysis"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Home.generate_improvement_suggestions(query_engine, results)
+    stages["improvement_suggestions"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Home.generate_report(results)
+    Home.create_enhanced_visualization(results)
+    try:
+        Home.generate_pdf_report(results)
+    except ImportError:
+        # reportlab is optional
+        pass
+    stages["reports"] = time.perf_counter() - start
+
+    llm_stats = llm.stats.snapshot()
+    embed_stats = embed_stats.snapshot() if embed_stats is not None else {"calls": 0, "errors": 0}
+    requirements = sum(len(data["detailed_results"]) for data in results.values())
+    budgets = [
+        record for record in Home.get_token_budget_log().records(document_hash)
+        if record["recorded_at"] >= document_started_at
+    ]
+    return {
+        "document": name,
+        "characters": len(text),
+        "wall_time": sum(stages.values()),
+        "stages": stages,
+        "llm_calls": llm_stats["calls"],
+        "llm_errors": llm_stats["errors"],
+        "llm_tokens": llm_stats["tokens"],
+        "llm_latencies": llm_stats["latencies"],
+        "embedding_calls": embed_stats["calls"],
+        "embedding_errors": embed_stats["errors"],
+        "requirements": requirements,
+        "llm_tokens_per_requirement": llm_stats["tokens"] / requirements if requirements else 0.0,
+        "context_tokens_per_query": (
+            sum(record["context_tokens"] for record in budgets) / len(budgets) if budgets else 0.0
+        ),
+        "unscored": sum(
+            1 for data in results.values()
+            for result in data["detailed_results"].values() if result.get("analysis_error")
+        ),
+        "prescreened": sum(
+            1 for data in results.values()
+            for result in data["detailed_results"].values() if result.get("prescreened")
+        )
+    }
+
+
+def summarize(documents, total_wall_time):
+    """Aggregate per-document records into the headline numbers"""
+    wall_times = [doc["wall_time"] for doc in documents]
+    llm_latencies = [latency for doc in documents for latency in doc["llm_latencies"]]
+    count = len(documents) or 1
+    return {
+        "documents": len(documents),
+        "total_wall_time": total_wall_time,
+        "documents_per_minute": 60 * len(documents) / total_wall_time if total_wall_time else 0.0,
+        "document_p50": percentile(wall_times, 50),
+        "document_p95": percentile(wall_times, 95),
+        "llm_calls_per_document": sum(doc["llm_calls"] for doc in documents) / count,
+        "embedding_calls_per_document": sum(doc["embedding_calls"] for doc in documents) / count,
+        "llm_tokens_per_document": sum(doc["llm_tokens"] for doc in documents) / count,
+        "llm_tokens_per_requirement": (
+            sum(doc["llm_tokens"] for doc in documents) / max(1, sum(doc["requirements"] for doc in documents))
+        ),
+        "context_tokens_per_query": sum(doc["context_tokens_per_query"] for doc in documents) / count,
+        "llm_call_p50": percentile(llm_latencies, 50),
+        "llm_call_p95": percentile(llm_latencies, 95),
+        "llm_errors": sum(doc["llm_errors"] for doc in documents),
+        "stage_means": {
+            stage: statistics.mean(doc["stages"][stage] for doc in documents)
+            for stage in (documents[0]["stages"] if documents else {})
+        },
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def print_summary(summary, documents):
+    print(f"{'document':<16}{'chars':>9}{'wall s':>9}{'llm':>6}{'embed':>7}{'screened':>10}{'unscored':>10}")
+    for doc in documents:
+        print(f"{doc['document']:<16}{doc['characters']:>9}{doc['wall_time']:>9.2f}"
+              f"{doc['llm_calls']:>6}{doc['embedding_calls']:>7}{doc['prescreened']:>10}{doc['unscored']:>10}")
+    print()
+    print(f"Documents:                {summary['documents']}")
+    print(f"Total wall time:          {summary['total_wall_time']:.2f} s")
+    print(f"Throughput:               {summary['documents_per_minute']:.1f} documents/min")
+    print(f"Document latency p50/p95: {summary['document_p50']:.2f} / {summary['document_p95']:.2f} s")
+    print(f"LLM call latency p50/p95: {summary['llm_call_p50']:.3f} / {summary['llm_call_p95']:.3f} s")
+    print(f"LLM calls per document:   {summary['llm_calls_per_document']:.1f}")
+    print(f"LLM tokens per document:  {summary['llm_tokens_per_document']:.0f}")
+    print(f"LLM tokens per requirement: {summary['llm_tokens_per_requirement']:.0f}")
+    print(f"Context tokens per query: {summary['context_tokens_per_query']:.0f}")
+    print(f"Embedding calls per doc:  {summary['embedding_calls_per_document']:.1f}")
+    print(f"Simulated 429s:           {summary['llm_errors']}")
+    print(f"Peak RSS:                 {summary['peak_rss_mb']:.1f} MB")
+    for stage, seconds in summary["stage_means"].items():
+        print(f"  mean {stage:<26}{seconds:.3f} s")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = configure_environment(args)
+
+    # Imported late so the environment above is picked up at import time
+    import Home
+    from benchmarks.corpus import generate_corpus
+    from benchmarks.fake_backend import FakeLLM, FakeEmbedding
+
+    llm = FakeLLM(
+        latency=args.llm_latency, error_rate=args.error_rate, malformed_rate=args.malformed_rate, seed=args.seed
+    )
+    if args.embedding_backend == "local":
+        from embeddings import LocalEmbedding
+        from indexing import EMBED_BATCH_SIZE
+
+        base_embed_model = LocalEmbedding(Home.LOCAL_EMBEDDING_MODEL, embed_batch_size=EMBED_BATCH_SIZE)
+        embed_model = Home.wrap_embed_model(base_embed_model, rate_limited=False)
+    else:
+        base_embed_model = FakeEmbedding(latency=args.embed_latency, error_rate=args.error_rate, seed=args.seed)
+        embed_model = Home.wrap_embed_model(base_embed_model)
+    prompt_helper = Home.build_prompt_helper()
+
+    corpus = generate_corpus(args.sizes, args.docs_per_size, args.seed)
+    documents = []
+    start = time.perf_counter()
+    for run in range(args.runs):
+        for name, text in corpus:
+            record = run_document(
+                Home, name, text, workdir, llm, base_embed_model, embed_model, prompt_helper, args
+            )
+            record["run"] = run
+            documents.append(record)
+    total_wall_time = time.perf_counter() - start
+
+    summary = summarize(documents, total_wall_time)
+    print_summary(summary, documents)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "summary": summary, "documents": documents}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Persistent SQLite caches for LLM responses and chunk embeddings"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from telemetry import get_telemetry
+
+# Stored next to ./chroma_db so cached analyses survive restarts
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of raw bytes, used to fingerprint uploaded documents"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(*parts):
+    """Build a content-addressed cache key from arbitrary JSON-serializable parts"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk LLM response cache with TTL expiry and size-based LRU eviction"""
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                get_telemetry().count("cache_lookups", cache="response", outcome="miss")
+                return None
+            self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        get_telemetry().count("cache_lookups", cache="response", outcome="hit")
+        return json.loads(row[0])
+
+    def contains(self, key):
+        """Check for a live entry without touching hit/miss counters or LRU order"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl_seconds
+
+    def set(self, key, value):
+        """Store a JSON-serializable value and evict old entries if over budget"""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the cache fits its budget again
+        freed = 0
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_accessed"):
+            evicted.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self):
+        """Hit/miss counters and current on-disk footprint"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_response_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache"""
+    global _response_cache
+    with _cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings keyed by embedding model and chunk text hash.
+    Vectors are stored as float32 blobs (6 KB for 1536 dimensions) and expire
+    like responses, by TTL and least recent use beyond max_bytes.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Vectors used to be stored as JSON text without eviction; they are only a cache
+        self._conn.execute("DROP TABLE IF EXISTS embeddings")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_vectors (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_vectors_lru ON embedding_vectors (last_accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model, text_hashes):
+        """Return {text_hash: embedding} for every hash that is cached"""
+        found = {}
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embedding_vectors "
+                    f"WHERE model = ? AND text_hash IN ({placeholders}) AND created_at >= ?",
+                    [model, *batch, now - self.ttl_seconds]
+                ).fetchall()
+                found.update((text_hash, array("f", embedding).tolist()) for text_hash, embedding in rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embedding_vectors SET last_accessed = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique_hashes) - len(found)
+        get_telemetry().count("cache_lookups", len(found), cache="embedding", outcome="hit")
+        get_telemetry().count("cache_lookups", len(unique_hashes) - len(found), cache="embedding", outcome="miss")
+        return found
+
+    def set_many(self, model, items):
+        """Store (text_hash, embedding) pairs and evict old entries if over budget"""
+        now = time.time()
+        rows = []
+        for text_hash, embedding in items:
+            blob = array("f", embedding).tobytes()
+            rows.append((model, text_hash, blob, len(blob), now, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_vectors "
+                "(model, text_hash, embedding, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM embedding_vectors WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embedding_vectors").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used vectors until the cache fits its budget again
+        freed = 0
+        evicted = []
+        for model, text_hash, size in self._conn.execute(
+            "SELECT model, text_hash, size FROM embedding_vectors ORDER BY last_accessed"
+        ):
+            evicted.append((model, text_hash))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM embedding_vectors WHERE model = ? AND text_hash = ?", evicted)
+
+
+_embedding_cache = None
+
+
+def get_embedding_cache():
+    """Return the process-wide embedding cache"""
+    global _embedding_cache
+    with _cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
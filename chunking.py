@@ -0,0 +1,127 @@
+"""Clause- and heading-aware chunking for privacy contracts.
+
+Contracts are made of numbered clauses grouped under section headings. The
+splitter keeps each clause whole, starts a new chunk at each section heading,
+and packs clauses into chunks up to a tiktoken budget. Chunks that continue a
+section repeat its heading so retrieved evidence keeps its context. Only
+clauses longer than the budget are split, at sentence boundaries.
+"""
+import os
+import re
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.interface import TextSplitter
+
+from rate_limiter import estimate_tokens
+
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "clause")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+
+# "4. SECURITY", "Schedule 2 - DATA HANDLING", "# Definitions" or a bare ALL CAPS line
+HEADING_PATTERN = re.compile(
+    r"^(?:(?:section|clause|part|schedule|article)\s+\d+[\w.]*|\d+\.?)?\s*[-:–]?\s*([A-Z][A-Z0-9 ,&/'()\-]{2,})$",
+    re.IGNORECASE
+)
+# "4.2.", "12.", "(a)", "b)", "Clause 7"
+CLAUSE_PATTERN = re.compile(
+    r"^(?:\d+(?:\.\d+)*\.?|\([a-z0-9]{1,4}\)|[a-z]\)|(?:section|clause)\s+\d+[\w.]*)\s",
+    re.IGNORECASE
+)
+
+
+def is_heading(line):
+    """Markdown headings, or short numbered/unnumbered lines in capitals"""
+    if line.startswith("#"):
+        return True
+    match = HEADING_PATTERN.match(line) if len(line) <= 120 else None
+    return bool(match) and match.group(1).isupper()
+
+
+def iter_segments(text):
+    """Yield ("heading" | "clause", text) pieces; blank lines and clause numbers start a new clause"""
+    lines = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or is_heading(line) or CLAUSE_PATTERN.match(line):
+            if lines:
+                yield "clause", "\n".join(lines)
+                lines = []
+            if line and is_heading(line):
+                yield "heading", line
+                continue
+        if line:
+            lines.append(line)
+    if lines:
+        yield "clause", "\n".join(lines)
+
+
+class ClauseAwareSplitter(TextSplitter):
+    """Split contract text into chunks of whole clauses within a token budget"""
+
+    chunk_tokens: int = Field(default=CHUNK_TOKENS, gt=0, description="Token budget per chunk")
+
+    _sentence_splitter = PrivateAttr()
+
+    def __init__(self, chunk_tokens=CHUNK_TOKENS, **kwargs):
+        super().__init__(chunk_tokens=chunk_tokens, **kwargs)
+        self._sentence_splitter = SentenceSplitter(chunk_size=chunk_tokens, chunk_overlap=chunk_tokens // 10)
+
+    @classmethod
+    def class_name(cls):
+        return "ClauseAwareSplitter"
+
+    def split_text(self, text):
+        chunks = []
+        current = []
+        current_tokens = 0
+        heading = ""
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+
+        for kind, segment in iter_segments(text):
+            tokens = estimate_tokens(segment)
+            if kind == "heading":
+                # A new section starts a new chunk unless the current one is nearly empty
+                if current_tokens >= self.chunk_tokens // 4:
+                    flush()
+                heading = segment
+                current.append(segment)
+                current_tokens += tokens
+                continue
+
+            if tokens > self.chunk_tokens:
+                # Only clauses that cannot fit on their own are cut, at sentence boundaries.
+                # Every piece repeats the heading, so a chunk of just the heading is dropped
+                if current == [heading]:
+                    current = []
+                    current_tokens = 0
+                flush()
+                for piece in self._sentence_splitter.split_text(segment):
+                    chunks.append(f"{heading}\n{piece}" if heading else piece)
+                continue
+
+            if current_tokens + tokens > self.chunk_tokens:
+                flush()
+                if heading:
+                    current.append(heading)
+                    current_tokens = estimate_tokens(heading)
+            current.append(segment)
+            current_tokens += tokens
+
+        # A trailing heading with no clauses is not worth a chunk of its own
+        if current and current != [heading]:
+            flush()
+        return chunks
+
+
+def build_node_parser(strategy=CHUNKING_STRATEGY, chunk_tokens=CHUNK_TOKENS):
+    """Node parser for new documents; "sentence" restores the library's default splitter"""
+    if strategy == "sentence":
+        return SentenceSplitter()
+    return ClauseAwareSplitter(chunk_tokens=chunk_tokens)
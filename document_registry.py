@@ -0,0 +1,130 @@
+"""Persisted registry of indexed documents.
+
+Maps a document hash to the Chroma collection (one per embedding model) that
+holds its chunks, with the file name, chunk count and when it was indexed and
+last opened. A document found here is rebuilt from its stored vectors instead
+of reading and re-embedding the file, so it reopens in any session and after a
+restart; the collection is still checked for its chunks first, and entries
+whose chunks are gone are forgotten. The most recently opened documents of
+each collection are pre-warmed the first time it is used in a server process.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+REGISTRY_PATH = os.getenv("DOCUMENT_REGISTRY_PATH", "./document_registry.sqlite3")
+PREWARM_DOCUMENTS = int(os.getenv("PREWARM_DOCUMENTS", "5"))
+
+FIELDS = ("document_hash", "collection", "embedding_model", "file_name", "chunks", "indexed_at", "last_used_at")
+
+
+class DocumentRegistry:
+    """SQLite record of which documents are indexed in which collection"""
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                document_hash TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                embedding_model TEXT NOT NULL,
+                file_name TEXT,
+                chunks INTEGER,
+                indexed_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (document_hash, collection)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_recent ON documents (collection, last_used_at)")
+        self._conn.commit()
+
+    def register(self, document_hash, collection, embedding_model, file_name=None, chunks=None):
+        """Record a document as indexed; an existing entry keeps any name or count it already had"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO documents
+                    (document_hash, collection, embedding_model, file_name, chunks, indexed_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (document_hash, collection) DO UPDATE SET
+                    file_name = COALESCE(excluded.file_name, file_name),
+                    chunks = COALESCE(excluded.chunks, chunks),
+                    last_used_at = excluded.last_used_at
+                """,
+                (document_hash, collection, embedding_model, file_name, chunks, now, now)
+            )
+            self._conn.commit()
+
+    def get(self, document_hash, collection):
+        """Registry entry as a dict, or None if the document is not known to be indexed"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents WHERE document_hash = ? AND collection = ?",
+                (document_hash, collection)
+            ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def touch(self, document_hash, collection):
+        """Mark a document as just opened"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET last_used_at = ? WHERE document_hash = ? AND collection = ?",
+                (time.time(), document_hash, collection)
+            )
+            self._conn.commit()
+
+    def recent(self, collection, limit=PREWARM_DOCUMENTS):
+        """Most recently opened documents in a collection, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents WHERE collection = ? "
+                "ORDER BY last_used_at DESC LIMIT ?",
+                (collection, limit)
+            ).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def entries(self, collection):
+        """Every document registered in a collection"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def previous_version(self, collection, file_name, document_hash):
+        """Most recently opened other document indexed under the same file name, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents "
+                "WHERE collection = ? AND file_name = ? AND document_hash != ? "
+                "ORDER BY last_used_at DESC LIMIT 1",
+                (collection, file_name, document_hash)
+            ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def forget(self, document_hashes, collection):
+        """Drop documents whose chunks were deleted from a collection"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE document_hash = ? AND collection = ?",
+                [(document_hash, collection) for document_hash in document_hashes]
+            )
+            self._conn.commit()
+
+
+_document_registry = None
+_document_registry_lock = threading.Lock()
+
+
+def get_document_registry():
+    """Return the process-wide document registry"""
+    global _document_registry
+    with _document_registry_lock:
+        if _document_registry is None:
+            _document_registry = DocumentRegistry()
+        return _document_registry
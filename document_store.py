@@ -0,0 +1,168 @@
+"""Retention and garbage collection for the privacy_docs Chroma collections.
+
+Documents are tracked in the document registry with their chunk count and
+when they were last opened. Compaction deletes whole documents, least
+recently used first, until the collection is back within the configured
+number of documents, age since last use and size. Sizes are estimated from
+a sample of stored chunks at the collection's vector dimension, so an upload
+does not read the whole collection; only when the collection holds chunks no
+registry entry accounts for is it scanned to find and delete them.
+"""
+import json
+import os
+import threading
+import time
+
+from document_registry import get_document_registry
+from telemetry import get_telemetry, span
+
+RETENTION_MAX_DOCUMENTS = int(os.getenv("CHROMA_MAX_DOCUMENTS", "50"))
+RETENTION_MAX_AGE_DAYS = float(os.getenv("CHROMA_MAX_AGE_DAYS", "30"))
+RETENTION_MAX_BYTES = int(os.getenv("CHROMA_MAX_BYTES", str(500 * 1024 * 1024)))
+# Unregistered chunks younger than this may belong to an upload still being indexed
+ORPHAN_GRACE_SECONDS = int(os.getenv("CHROMA_ORPHAN_GRACE_SECONDS", "3600"))
+
+# Chroma stores vectors as float32
+VECTOR_VALUE_BYTES = 4
+
+# Chunks indexed before documents were tagged are grouped under this key
+UNTAGGED_DOCUMENT = "__untagged__"
+
+_compaction_lock = threading.Lock()
+
+
+def chunk_bytes(text, metadata, vector_bytes):
+    """Estimated stored size of one chunk; Chroma does not report stored sizes"""
+    return len((text or "").encode("utf-8")) + len(json.dumps(metadata or {}, default=str)) + vector_bytes
+
+
+def sample_chunk_bytes(chroma_collection, sample_size=100):
+    """(vector bytes, average chunk bytes) from a sample of the collection's chunks"""
+    sample = chroma_collection.get(include=["metadatas", "documents", "embeddings"], limit=sample_size)
+    if not len(sample["ids"]):
+        return 0, 0
+    # The active embedding model's dimension, whatever model filled this collection
+    vector_bytes = len(sample["embeddings"][0]) * VECTOR_VALUE_BYTES
+    total = sum(
+        chunk_bytes(text, metadata, vector_bytes)
+        for text, metadata in zip(sample["documents"], sample["metadatas"])
+    )
+    return vector_bytes, total / len(sample["ids"])
+
+
+def collect_document_stats(chroma_collection, vector_bytes, page_size=1000):
+    """Group every chunk in the collection by document: ids, estimated bytes and last indexed time"""
+    documents = {}
+    offset = 0
+    while True:
+        page = chroma_collection.get(
+            include=["metadatas", "documents"],
+            limit=page_size,
+            offset=offset
+        )
+        if not page["ids"]:
+            break
+        for chunk_id, metadata, text in zip(page["ids"], page["metadatas"], page["documents"]):
+            metadata = metadata or {}
+            document_hash = metadata.get("document_hash", UNTAGGED_DOCUMENT)
+            stats = documents.setdefault(
+                document_hash, {"ids": [], "bytes": 0, "indexed_at": 0.0}
+            )
+            stats["ids"].append(chunk_id)
+            stats["bytes"] += chunk_bytes(text, metadata, vector_bytes)
+            stats["indexed_at"] = max(stats["indexed_at"], float(metadata.get("indexed_at", 0)))
+        offset += len(page["ids"])
+    return documents
+
+
+def registered_document_stats(chroma_collection, entries, average_chunk_bytes):
+    """Chunk count, estimated bytes and last use of each registered document"""
+    documents = {}
+    for entry in entries:
+        chunks = entry["chunks"]
+        if chunks is None:
+            chunks = len(chroma_collection.get(where={"document_hash": entry["document_hash"]}, include=[])["ids"])
+        documents[entry["document_hash"]] = {
+            "chunks": chunks,
+            "bytes": chunks * average_chunk_bytes,
+            "last_used_at": entry["last_used_at"]
+        }
+    return documents
+
+
+def select_expired_documents(documents, max_documents, max_age_days, max_bytes, keep=(), now=None):
+    """Pick which documents to delete so the rest fit the retention policy"""
+    now = now or time.time()
+    # Most recently used first; documents being worked on right now are never evicted
+    ordered = sorted(
+        documents.items(),
+        key=lambda item: (item[0] in keep, item[1]["last_used_at"]),
+        reverse=True
+    )
+    expired = []
+    live_count = 0
+    live_bytes = 0
+    for document_hash, stats in ordered:
+        if document_hash not in keep:
+            too_old = now - stats["last_used_at"] > max_age_days * 86400
+            too_many = live_count >= max_documents
+            too_big = live_bytes + stats["bytes"] > max_bytes
+            if too_old or too_many or too_big:
+                expired.append(document_hash)
+                continue
+        live_count += 1
+        live_bytes += stats["bytes"]
+    return expired
+
+
+def select_orphaned_chunks(documents, registered, keep=(), now=None, grace_seconds=ORPHAN_GRACE_SECONDS):
+    """Ids of chunks from documents missing from the registry, which can never be reopened"""
+    now = now or time.time()
+    orphaned = []
+    for document_hash, stats in documents.items():
+        if document_hash in registered or document_hash in keep:
+            continue
+        if document_hash == UNTAGGED_DOCUMENT or now - stats["indexed_at"] > grace_seconds:
+            orphaned.extend(stats["ids"])
+    return orphaned
+
+
+def enforce_retention(chroma_collection, max_documents=RETENTION_MAX_DOCUMENTS,
+                      max_age_days=RETENTION_MAX_AGE_DAYS, max_bytes=RETENTION_MAX_BYTES, keep=()):
+    """Delete documents that fall outside the retention policy, returning their hashes"""
+    with _compaction_lock:
+        registry = get_document_registry()
+        vector_bytes, average_chunk_bytes = sample_chunk_bytes(chroma_collection)
+        documents = registered_document_stats(
+            chroma_collection, registry.entries(chroma_collection.name), average_chunk_bytes
+        )
+        
+        if chroma_collection.count() > sum(stats["chunks"] for stats in documents.values()):
+            # Some chunks belong to no registered document: untagged, or left by a crash
+            orphaned = select_orphaned_chunks(
+                collect_document_stats(chroma_collection, vector_bytes), documents, keep
+            )
+            for start in range(0, len(orphaned), 1000):
+                chroma_collection.delete(ids=orphaned[start:start + 1000])
+        
+        expired = select_expired_documents(documents, max_documents, max_age_days, max_bytes, keep)
+        for document_hash in expired:
+            chroma_collection.delete(where={"document_hash": document_hash})
+        # Evicted documents must go through indexing again
+        registry.forget(expired, chroma_collection.name)
+        return expired
+
+
+def start_background_compaction(chroma_collection, keep=()):
+    """Run enforce_retention on a daemon thread so uploads are not slowed down"""
+    def compact():
+        try:
+            with span("compaction"):
+                enforce_retention(chroma_collection, keep=set(keep))
+        except Exception as e:
+            # The span records the failure; the next upload tries again
+            get_telemetry().count("compaction_failures", error=type(e).__name__)
+
+    thread = threading.Thread(target=compact, name="chroma-compaction", daemon=True)
+    thread.start()
+    return thread
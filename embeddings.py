@@ -0,0 +1,180 @@
+"""Embedding model wrappers used by the compliance analyzer"""
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from rate_limiter import estimate_tokens
+from telemetry import get_telemetry, span
+
+
+class RateLimitedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that routes every call through a shared rate limiter"""
+
+    _embed_model = PrivateAttr()
+    _rate_limiter = PrivateAttr()
+
+    def __init__(self, embed_model, rate_limiter, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        self._rate_limiter = rate_limiter
+
+    @classmethod
+    def class_name(cls):
+        return "RateLimitedEmbedding"
+
+    def _call(self, func, payload, texts):
+        tokens = sum(estimate_tokens(text) for text in texts)
+        with span("embedding", texts=len(texts)):
+            result = self._rate_limiter.call(func, payload, estimated_tokens=tokens)
+        get_telemetry().record_tokens("embedding", self.model_name, tokens)
+        return result
+
+    def _get_query_embedding(self, query):
+        return self._call(self._embed_model.get_query_embedding, query, [query])
+
+    def _get_text_embedding(self, text):
+        return self._call(self._embed_model.get_text_embedding, text, [text])
+
+    def _get_text_embeddings(self, texts):
+        return self._call(self._embed_model.get_text_embedding_batch, texts, texts)
+
+    def get_query_embedding_batch(self, queries):
+        """Query-encoded vectors for several queries, batched when the wrapped model supports it"""
+        batch = getattr(self._embed_model, "get_query_embedding_batch", None)
+        if batch is None:
+            return [self._get_query_embedding(query) for query in queries]
+        return self._call(batch, queries, queries)
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text):
+        return self._get_text_embedding(text)
+
+
+class LocalEmbedding(BaseEmbedding):
+    """
+    Embedding model run in-process on the CPU with ONNX Runtime (through
+    fastembed, whose default models are quantized). No network calls, no rate
+    limits and no per-token cost; texts are encoded in batches of embed_batch_size.
+    """
+
+    _model = PrivateAttr()
+
+    def __init__(self, model_name, embed_batch_size=100, threads=None, **kwargs):
+        try:
+            from fastembed import TextEmbedding
+        except ImportError as e:
+            raise ImportError("The local embedding backend needs fastembed: pip install fastembed") from e
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        # Downloaded once into fastembed's cache (FASTEMBED_CACHE_PATH); offline hosts
+        # only need that directory copied over
+        self._model = TextEmbedding(model_name=model_name, threads=threads)
+
+    @classmethod
+    def class_name(cls):
+        return "LocalEmbedding"
+
+    def _get_query_embedding(self, query):
+        # Query and passage encodings differ for asymmetric models such as bge
+        with span("embedding", texts=1, backend="local"):
+            return next(iter(self._model.query_embed(query))).tolist()
+
+    def _get_text_embedding(self, text):
+        return self._get_text_embeddings([text])[0]
+
+    def get_query_embedding_batch(self, queries):
+        """Query-encoded vectors for several queries in batches"""
+        with span("embedding", texts=len(queries), backend="local"):
+            return [
+                vector.tolist()
+                for vector in self._model.query_embed(queries, batch_size=self.embed_batch_size)
+            ]
+
+    def _get_text_embeddings(self, texts):
+        with span("embedding", texts=len(texts), backend="local"):
+            return [
+                vector.tolist()
+                for vector in self._model.passage_embed(texts, batch_size=self.embed_batch_size)
+            ]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text):
+        return self._get_text_embedding(text)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that reuses cached chunk embeddings by text hash"""
+
+    _embed_model = PrivateAttr()
+    _cache = PrivateAttr()
+
+    def __init__(self, embed_model, cache, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls):
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query):
+        return self._embed_model.get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts):
+        text_hashes = [self._cache.text_hash(text) for text in texts]
+        cached = self._cache.get_many(self.model_name, text_hashes)
+
+        # Only embed chunks that have never been seen with this model
+        missing = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        if missing:
+            new_embeddings = self._embed_model.get_text_embedding_batch(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_embeddings))
+            self._cache.set_many(self.model_name, new_items)
+            cached.update(new_items)
+
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    def get_query_embedding_batch(self, queries):
+        """
+        Query-encoded vectors for several queries. Asymmetric models encode queries
+        differently from passages, so they are cached under their own key.
+        """
+        cache_model = f"{self.model_name}#query"
+        query_hashes = [self._cache.text_hash(query) for query in queries]
+        cached = self._cache.get_many(cache_model, query_hashes)
+        missing = {}
+        for query, query_hash in zip(queries, query_hashes):
+            if query_hash not in cached and query_hash not in missing:
+                missing[query_hash] = query
+        if missing:
+            batch = getattr(self._embed_model, "get_query_embedding_batch", None)
+            if batch is None:
+                new_embeddings = [self._embed_model.get_query_embedding(query) for query in missing.values()]
+            else:
+                new_embeddings = batch(list(missing.values()))
+            new_items = list(zip(missing.keys(), new_embeddings))
+            self._cache.set_many(cache_model, new_items)
+            cached.update(new_items)
+        return [cached[query_hash] for query_hash in query_hashes]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text):
+        return self._get_text_embedding(text)
@@ -0,0 +1,104 @@
+"""Pipelined embedding and Chroma upserts for document chunks.
+
+Chunks are grouped into embedding batches that run on several threads at
+once. As each batch finishes, a single writer thread bulk-upserts it into
+Chroma while later batches are still being embedded and the caller is still
+parsing pages. A semaphore bounds the number of batches held in memory.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+from telemetry import span, submit_with_context
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+
+
+class IndexingPipeline:
+    """Embed node batches concurrently and upsert them into a Chroma collection as they complete"""
+
+    def __init__(self, embed_model, chroma_collection, batch_size=EMBED_BATCH_SIZE,
+                 max_in_flight=EMBED_MAX_IN_FLIGHT):
+        self.embed_model = embed_model
+        self.chroma_collection = chroma_collection
+        self.batch_size = batch_size
+        self.nodes_written = 0
+        self._pending = []
+        self._futures = []
+        self._errors = []
+        # Batches being embedded or waiting to be written; add() blocks beyond this
+        self._slots = threading.BoundedSemaphore(max_in_flight * 2)
+        self._embed_executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-upsert")
+
+    def add(self, nodes):
+        """Queue nodes; full batches start embedding immediately"""
+        self._pending.extend(nodes)
+        while len(self._pending) >= self.batch_size:
+            batch = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            self._submit(batch)
+
+    def _submit(self, batch):
+        if self._errors:
+            raise self._errors[0]
+        self._slots.acquire()
+        self._futures.append(submit_with_context(self._embed_executor, self._embed, batch))
+
+    def _embed(self, batch):
+        try:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            embeddings = self.embed_model.get_text_embedding_batch(texts)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+        except Exception as e:
+            self._errors.append(e)
+            self._slots.release()
+            raise
+        return submit_with_context(self._write_executor, self._write, batch)
+
+    def _write(self, batch):
+        try:
+            with span("chroma.upsert", nodes=len(batch)):
+                self.chroma_collection.upsert(
+                    ids=[node.node_id for node in batch],
+                    embeddings=[node.embedding for node in batch],
+                    metadatas=[node_to_metadata_dict(node, remove_text=True, flat_metadata=True) for node in batch],
+                    documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in batch]
+                )
+            # Counters are only updated from the single writer thread
+            self.nodes_written += len(batch)
+        except Exception as e:
+            self._errors.append(e)
+            raise
+        finally:
+            self._slots.release()
+
+    def finish(self):
+        """Flush the last partial batch and wait until every node is stored"""
+        try:
+            if self._pending:
+                self._submit(self._pending)
+                self._pending = []
+            for future in self._futures:
+                future.result().result()
+        finally:
+            self._embed_executor.shutdown(wait=True)
+            self._write_executor.shutdown(wait=True)
+        return self.nodes_written
+
+    def abort(self, document_hash=None):
+        """
+        Stop queued batches after a failure and wait for the ones already running.
+        With document_hash the chunks they stored are deleted, so no partial index is left.
+        """
+        self._pending = []
+        # Running embed batches still hand off to the writer, so it is shut down second
+        self._embed_executor.shutdown(wait=True, cancel_futures=True)
+        self._write_executor.shutdown(wait=True, cancel_futures=True)
+        if document_hash:
+            self.chroma_collection.delete(where={"document_hash": document_hash})
@@ -0,0 +1,130 @@
+"""Streaming, page-parallel text extraction for uploaded contracts.
+
+PDF pages are extracted in a process pool, a few pages per task, and yielded
+in page order as soon as each range is ready. Only a bounded window of page
+ranges is in flight at once, so memory stays flat regardless of document size
+and indexing can start while later pages are still being extracted.
+"""
+import hashlib
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+TEXT_BLOCK_CHARACTERS = 16384
+# A text block may end early after a line whose hash is divisible by this, see iter_text_blocks
+TEXT_BLOCK_BOUNDARY_MODULUS = 8
+# Pages are chunked, embedded and stored once this much text has accumulated
+INDEX_BATCH_CHARACTERS = int(os.getenv("INDEX_BATCH_CHARACTERS", "32000"))
+MIN_DOCUMENT_CHARACTERS = 50
+
+
+def count_pdf_pages(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_page_range(path, start, end):
+    """Extract [(page_number, text)] for pages start..end-1 (runs in a worker process)"""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(page_number + 1, reader.pages[page_number].extract_text() or "") for page_number in range(start, end)]
+
+
+def iter_pdf_pages(path, workers=INGESTION_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """Yield (page_number, text) in page order, extracting page ranges in parallel"""
+    page_count = count_pdf_pages(path)
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    # Short documents are not worth the cost of starting worker processes
+    if len(ranges) <= 1 or workers <= 1:
+        for start, end in ranges:
+            yield from extract_page_range(path, start, end)
+        return
+
+    # spawn, not fork: the Streamlit server process is multi-threaded
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending_ranges = iter(ranges)
+        in_flight = deque()
+        # Keep at most two ranges per worker queued so unread pages don't pile up
+        for start, end in pending_ranges:
+            in_flight.append(executor.submit(extract_page_range, path, start, end))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(pending_ranges, None)
+            if next_range:
+                in_flight.append(executor.submit(extract_page_range, path, *next_range))
+            yield from pages
+
+
+def is_block_boundary(line):
+    """Content-defined boundary: depends only on the line itself, never on its position"""
+    stripped = line.strip()
+    if not stripped:
+        return False
+    digest = hashlib.blake2b(stripped.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % TEXT_BLOCK_BOUNDARY_MODULUS == 0
+
+
+def iter_text_blocks(path, block_characters=TEXT_BLOCK_CHARACTERS):
+    """
+    Yield (block_number, text) for a plain text file, breaking blocks at line ends.
+    
+    Past a quarter of block_characters a block ends at the next boundary line, so
+    an edit only changes the blocks around it and a revised contract still
+    produces the same chunks for its unchanged text.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        block_number = 0
+        lines = []
+        size = 0
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            if size >= block_characters or (size >= block_characters // 4 and is_block_boundary(line)):
+                block_number += 1
+                yield block_number, "".join(lines)
+                lines = []
+                size = 0
+        if lines:
+            yield block_number + 1, "".join(lines)
+
+
+def iter_document_text(path, is_pdf):
+    """Yield (page_or_block_number, text) for a PDF or text file"""
+    if is_pdf:
+        return iter_pdf_pages(path)
+    return iter_text_blocks(path)
+
+
+class ContentValidator:
+    """Checks a document has analyzable content while its pages stream past"""
+
+    def __init__(self, min_characters=MIN_DOCUMENT_CHARACTERS):
+        self.min_characters = min_characters
+        self.pages = 0
+        self.characters = 0
+
+    def feed(self, text):
+        self.pages += 1
+        # Approximates len(" ".join(texts).strip()) without building the joined string
+        stripped = text.strip()
+        if stripped:
+            self.characters += len(stripped) + 1
+
+    @property
+    def sufficient(self):
+        return self.characters >= self.min_characters
+
+    def validate(self):
+        """Raise ValueError when the document has no pages or too little text to analyze"""
+        if self.pages == 0:
+            raise ValueError("No content found in the document")
+        if not self.sufficient:
+            raise ValueError("Document contains insufficient content for analysis")
+        return True
@@ -0,0 +1,207 @@
+"""Durable analysis jobs.
+
+A job is one compliance analysis of an indexed document. Its options, status
+and every (APP, requirement) result are written to SQLite as they complete, so
+a browser refresh or dropped websocket only loses the page, not the work: the
+page reattaches to the job by id and polls it. Jobs run on a small pool of
+background threads shared by every session of the server process. Jobs that
+were running when the server stopped are marked interrupted; interrupted and
+failed jobs resume from their saved results.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_PATH = os.getenv("JOBS_PATH", "./analysis_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = 1.0
+ACTIVE_STATUSES = ("queued", "running")
+RESUMABLE_STATUSES = ("interrupted", "failed")
+
+
+class JobStore:
+    """SQLite record of analysis jobs and their per-requirement results"""
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                document_hash TEXT NOT NULL,
+                document_name TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                error TEXT,
+                results TEXT,
+                suggestions TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                app TEXT NOT NULL,
+                requirement TEXT NOT NULL,
+                result TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (job_id, app, requirement)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_document ON jobs (document_hash, created_at)")
+        self._conn.commit()
+
+    def create_job(self, document_hash, document_name, options, total):
+        """Record a new queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, document_hash, document_name, options, status, total, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, document_hash, document_name, json.dumps(options), total, now, now)
+            )
+            self._conn.commit()
+        return job_id
+
+    def get_job(self, job_id):
+        """Job record with options/results decoded and `completed` counted, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, document_hash, document_name, options, status, total, created_at, "
+                "updated_at, error, results, suggestions FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            completed = self._conn.execute(
+                "SELECT COUNT(*) FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        keys = ("job_id", "document_hash", "document_name", "options", "status", "total",
+                "created_at", "updated_at", "error", "results", "suggestions")
+        job = dict(zip(keys, row))
+        for key in ("options", "results", "suggestions"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        job["completed"] = completed
+        return job
+
+    def latest_completed_job(self, document_hash):
+        """Most recent completed job for a document, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE document_hash = ? AND status = 'completed' "
+                "ORDER BY created_at DESC LIMIT 1",
+                (document_hash,)
+            ).fetchone()
+        return self.get_job(row[0]) if row else None
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def save_result(self, job_id, app, requirement, result):
+        """Persist one settled requirement as soon as it is known"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, app, requirement, result, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, app, requirement, json.dumps(result), now)
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (now, job_id))
+            self._conn.commit()
+
+    def load_results(self, job_id):
+        """Saved results as {app: {requirement: result}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT app, requirement, result FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        results = {}
+        for app, requirement, result in rows:
+            results.setdefault(app, {})[requirement] = json.loads(result)
+        return results
+
+    def complete(self, job_id, results, suggestions=None):
+        """Store the final results (with targeted findings merged) and mark the job done"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'completed', results = ?, suggestions = ?, error = NULL, "
+                "updated_at = ? WHERE job_id = ?",
+                (json.dumps(results), json.dumps(suggestions), time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def mark_interrupted(self):
+        """At startup, flag jobs a previous server process never finished"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', updated_at = ? WHERE status IN ('queued', 'running')",
+                (time.time(),)
+            )
+            self._conn.commit()
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return the process-wide job store"""
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+        return _job_store
+
+
+class JobRunner:
+    """
+    Runs jobs on background threads that do not belong to any browser session.
+
+    run_job(job_id, *args) does the work; the runner only tracks status and
+    makes sure a job is never running twice.
+    """
+
+    def __init__(self, store, run_job, workers=JOB_WORKERS):
+        self.store = store
+        self.run_job = run_job
+        self._active = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+
+    def submit(self, job_id, *args):
+        """Queue a new, interrupted or failed job; returns False if it is already queued or running"""
+        with self._lock:
+            if job_id in self._active:
+                return False
+            self._active.add(job_id)
+        self.store.set_status(job_id, "queued")
+        self._executor.submit(self._run, job_id, args)
+        return True
+
+    def is_active(self, job_id):
+        with self._lock:
+            return job_id in self._active
+
+    def _run(self, job_id, args):
+        try:
+            self.store.set_status(job_id, "running")
+            self.run_job(job_id, *args)
+        except Exception as e:
+            self.store.set_status(job_id, "failed", error=str(e))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
@@ -0,0 +1,62 @@
+"""LlamaIndex callback handler that feeds LLM token usage into telemetry"""
+import threading
+
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+from rate_limiter import estimate_tokens
+from telemetry import get_telemetry
+
+
+def response_usage(response):
+    """(prompt_tokens, completion_tokens) reported by the API, or None"""
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Record prompt/completion tokens and cost for every LLM call. Counts come
+    from the API's usage block; models that do not report one are estimated.
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(self, event_type, payload=None, event_id="", parent_id="", **kwargs):
+        if event_type == CBEventType.LLM and payload:
+            serialized = payload.get(EventPayload.SERIALIZED) or {}
+            messages = payload.get(EventPayload.MESSAGES)
+            prompt = "\n".join(str(message.content) for message in messages) if messages \
+                else payload.get(EventPayload.PROMPT, "")
+            with self._lock:
+                self._starts[event_id] = (serialized.get("model", "unknown"), prompt)
+        return event_id
+
+    def on_event_end(self, event_type, payload=None, event_id="", **kwargs):
+        if event_type != CBEventType.LLM:
+            return
+        with self._lock:
+            model, prompt = self._starts.pop(event_id, ("unknown", ""))
+        if not payload:
+            return
+        response = payload.get(EventPayload.RESPONSE) or payload.get(EventPayload.COMPLETION)
+        usage = response_usage(response)
+        if usage is None:
+            text = getattr(getattr(response, "message", None), "content", None) or getattr(response, "text", "")
+            usage = estimate_tokens(prompt), estimate_tokens(text)
+            get_telemetry().count("estimated_token_calls", model=model)
+        get_telemetry().record_tokens("llm", model, *usage)
+
+    def start_trace(self, trace_id=None):
+        pass
+
+    def end_trace(self, trace_id=None, trace_map=None):
+        pass
@@ -0,0 +1,62 @@
+"""Portfolio analysis: many contracts, each distinct piece of evidence judged once.
+
+Contract families (a master agreement and its schedules, vendors on the same
+template) repeat most of their clauses word for word. For each document and
+requirement the evidence is retrieved first, which costs no LLM call. Pairs
+whose retrieved chunks have identical text (the same chunk hashes) would send
+the model the same clauses, so they are grouped and the model is asked once
+per group. The verdict is then copied to every document in the group, so LLM
+work grows with the amount of distinct text rather than the number of
+documents. Groups whose evidence differs only slightly (party names, dates)
+are evaluated after the group they resemble so the semantic verdict cache can
+answer them.
+"""
+from semantic_cache import estimated_similarity
+
+
+def group_by_evidence(retrievals):
+    """
+    Group {(document_hash, app, requirement): (chunk_hashes, retrieved)} into
+    {(app, requirement, chunk_hashes): [(document_hash, retrieved), ...]},
+    keeping document order within each group
+    """
+    groups = {}
+    for (document_hash, app, requirement), (chunk_hashes, retrieved) in retrievals.items():
+        groups.setdefault((app, requirement, tuple(chunk_hashes)), []).append((document_hash, retrieved))
+    return groups
+
+
+def near_duplicate_waves(groups, signatures, threshold):
+    """
+    Split evidence groups into [leaders, followers]. A group is a follower when
+    its MinHash signature is at least `threshold` similar to a leader's for the
+    same requirement; followers are evaluated after the leaders so they find
+    the leaders' verdicts in the semantic cache instead of calling the LLM.
+    """
+    leaders = []
+    followers = []
+    leader_signatures = {}
+    for key in groups:
+        app, requirement, _ = key
+        signature = signatures.get(key)
+        seen = leader_signatures.setdefault((app, requirement), [])
+        if signature is not None and any(
+            estimated_similarity(signature, other) >= threshold for other in seen
+        ):
+            followers.append(key)
+            continue
+        leaders.append(key)
+        if signature is not None:
+            seen.append(signature)
+    return [leaders, followers]
+
+
+def display_names(names):
+    """Column label per document hash; repeated file names get a short hash suffix"""
+    counts = {}
+    for name in names.values():
+        counts[name] = counts.get(name, 0) + 1
+    return {
+        document_hash: name if counts[name] == 1 else f"{name} ({document_hash[:8]})"
+        for document_hash, name in names.items()
+    }
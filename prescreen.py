@@ -0,0 +1,59 @@
+"""Retrieval-only pre-screening of APP requirements.
+
+Before paying for a completion, the requirement's description is used to
+retrieve the top-k chunks of the document. If neither the similarity scores
+nor simple keyword matching find supporting evidence, the requirement is
+recorded as non-compliant straight away.
+"""
+import os
+import re
+
+PRESCREEN_SIMILARITY_THRESHOLD = float(os.getenv("PRESCREEN_SIMILARITY_THRESHOLD", "0.76"))
+PRESCREEN_MIN_KEYWORD_HITS = int(os.getenv("PRESCREEN_MIN_KEYWORD_HITS", "2"))
+
+# Words too generic to count as evidence for any particular requirement
+STOPWORDS = {
+    "and", "for", "the", "with", "from", "into", "that", "this", "their", "them",
+    "process", "management", "option", "options", "requirement", "requirements",
+    "information", "personal", "policy", "systems", "system", "regular", "reasonable",
+    "reasonably", "steps", "provision", "assessment", "compliance", "mechanisms",
+}
+
+
+def keyword_terms(*texts):
+    """Distinct lowercase terms worth matching, taken from descriptions and requirement names"""
+    terms = set()
+    for text in texts:
+        for word in re.split(r"[^a-z]+", text.lower()):
+            if len(word) >= 4 and word not in STOPWORDS:
+                terms.add(word)
+    return terms
+
+
+def score_evidence(nodes, terms):
+    """Best retrieval similarity and number of distinct terms found in the retrieved text"""
+    max_similarity = max((node.score or 0.0 for node in nodes), default=0.0)
+    retrieved_text = " ".join(node.node.get_content().lower() for node in nodes)
+    keyword_hits = sum(1 for term in terms if term in retrieved_text)
+    return max_similarity, keyword_hits
+
+
+def is_unsupported(max_similarity, keyword_hits, similarity_threshold=PRESCREEN_SIMILARITY_THRESHOLD,
+                   min_keyword_hits=PRESCREEN_MIN_KEYWORD_HITS):
+    """Evidence is clearly missing only when both signals are below their thresholds"""
+    return max_similarity < similarity_threshold and keyword_hits < min_keyword_hits
+
+
+def prescreened_result(max_similarity, keyword_hits, similarity_threshold=PRESCREEN_SIMILARITY_THRESHOLD):
+    """Non-compliant result for a requirement with no supporting evidence"""
+    # 50% confidence right at the threshold, rising to 100% as similarity drops to zero
+    margin = max(0.0, similarity_threshold - max_similarity) / similarity_threshold
+    return {
+        "compliance_status": False,
+        "evidence": "No relevant sections found. "
+                    f"(Pre-screened: best retrieval similarity {max_similarity:.2f}, "
+                    f"{keyword_hits} keyword matches)",
+        "recommendations": ["Add contract language that explicitly addresses this requirement"],
+        "confidence_score": int(round(50 + 50 * margin)),
+        "prescreened": True
+    }
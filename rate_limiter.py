@@ -0,0 +1,213 @@
+"""Shared rate limiting for every OpenAI LLM and embedding call.
+
+Each named limiter keeps two token buckets, one for requests per minute and
+one for tokens per minute, and blocks callers until both have capacity. A 429
+response pauses the whole limiter for the Retry-After period (or an
+exponential backoff with jitter when the header is missing) and halves the
+allowed rate, which then recovers gradually as calls succeed.
+"""
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from telemetry import get_telemetry
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        # Roughly four characters per token for English text
+        return len(text) // 4 + 1
+
+
+def is_rate_limit_error(error):
+    """Check whether an exception (or anything it wraps) is an HTTP 429"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "status_code", None) == 429:
+            return True
+        if type(error).__name__ == "RateLimitError":
+            return True
+        # tenacity.RetryError keeps the real exception on its last attempt
+        last_attempt = getattr(error, "last_attempt", None)
+        if last_attempt is not None:
+            try:
+                error = last_attempt.exception()
+                continue
+            except Exception:
+                pass
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def get_retry_after(error):
+    """Return the Retry-After delay in seconds from an API error, if present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        # Retry-After may also be an HTTP date
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be consumed (call refill first)"""
+        # Never ask for more than a full bucket or a large request would wait forever
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Adaptive requests/tokens per minute limiter with backoff on 429s"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=8,
+                 base_delay=1.0, max_delay=60.0, name=None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.rate_factor = 1.0
+        self.blocked_until = 0.0
+        self.rate_limited_count = 0
+        self._lock = threading.Lock()
+
+    def _apply_rate_factor(self):
+        self.request_bucket.rate = self.requests_per_minute * self.rate_factor / 60.0
+        self.token_bucket.rate = self.tokens_per_minute * self.rate_factor / 60.0
+
+    def acquire(self, tokens=0):
+        """Block until one request and `tokens` tokens are available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.request_bucket.refill(now)
+                self.token_bucket.refill(now)
+                wait = max(
+                    self.blocked_until - now,
+                    self.request_bucket.wait_time(1),
+                    self.token_bucket.wait_time(tokens)
+                )
+                if wait <= 0:
+                    self.request_bucket.consume(1)
+                    self.token_bucket.consume(tokens)
+                    return
+            time.sleep(min(wait, self.max_delay))
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def on_rate_limited(self, delay):
+        """Pause every caller for `delay` seconds and halve the allowed rate"""
+        with self._lock:
+            self.rate_limited_count += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.rate_factor = max(0.1, self.rate_factor * 0.5)
+            self._apply_rate_factor()
+
+    def on_success(self):
+        """Recover the allowed rate additively after a successful call"""
+        if self.rate_factor < 1.0:
+            with self._lock:
+                self.rate_factor = min(1.0, self.rate_factor + 0.05)
+                self._apply_rate_factor()
+
+    def call(self, func, *args, estimated_tokens=0, **kwargs):
+        """Call `func` under the limiter, retrying only on rate limit errors"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated_tokens)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                retry_after = get_retry_after(e)
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                self.on_rate_limited(delay)
+                get_telemetry().count("retries", reason="rate_limit", limiter=self.name)
+                continue
+            self.on_success()
+            return result
+
+
+# Defaults match the OpenAI tier 1 limits for gpt-3.5-turbo and text-embedding-ada-002
+RATE_LIMIT_DEFAULTS = {
+    "llm": (3500, 200000),
+    "embedding": (3000, 1000000),
+}
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name):
+    """Return the process-wide limiter for `name` ("llm" or "embedding")"""
+    with _rate_limiters_lock:
+        if name not in _rate_limiters:
+            default_rpm, default_tpm = RATE_LIMIT_DEFAULTS[name]
+            prefix = f"OPENAI_{name.upper()}"
+            _rate_limiters[name] = RateLimiter(
+                requests_per_minute=int(os.getenv(f"{prefix}_RPM", default_rpm)),
+                tokens_per_minute=int(os.getenv(f"{prefix}_TPM", default_tpm)),
+                name=name
+            )
+        return _rate_limiters[name]
+
+
+# LLM queries in flight across every session and job in this process; each run's
+# own MAX_CONCURRENT_QUERIES only bounds that run
+GLOBAL_MAX_CONCURRENT_QUERIES = int(os.getenv("GLOBAL_MAX_CONCURRENT_QUERIES", "16"))
+_query_slots = threading.BoundedSemaphore(GLOBAL_MAX_CONCURRENT_QUERIES)
+
+
+def query_slot():
+    """Process-wide concurrency budget for LLM queries, used as a context manager"""
+    return _query_slots
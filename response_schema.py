@@ -0,0 +1,140 @@
+"""Schema and compiled validator for structured LLM answers.
+
+The LLM runs in JSON mode and is asked for ANALYSIS_RESULT_SCHEMA. The schema
+is compiled once into nested check functions, so validating an answer is a
+handful of isinstance calls rather than a walk over the schema. Anything that
+fails raises ResponseFormatError, which callers treat as "ask again" instead of
+recording a zero-confidence result.
+"""
+import json
+
+ANALYSIS_RESULT_SCHEMA = {
+    "type": "object",
+    "required": ["compliance_status", "evidence", "recommendations", "confidence_score"],
+    "properties": {
+        "compliance_status": {"type": "boolean"},
+        "evidence": {"type": "string", "minLength": 1},
+        "recommendations": {"type": "array", "items": {"type": "string"}},
+        "confidence_score": {"type": "number", "minimum": 0, "maximum": 100}
+    }
+}
+
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+    "null": type(None)
+}
+
+
+class ResponseFormatError(ValueError):
+    """An LLM answer that is not valid JSON or does not match the expected schema"""
+
+
+def compile_validator(schema, path="$"):
+    """
+    Turn a JSON schema (type, required, properties, items, minimum, maximum,
+    minLength) into a function that raises ResponseFormatError on mismatch
+    """
+    checks = []
+
+    if "type" in schema:
+        expected = JSON_TYPES[schema["type"]]
+        type_name = schema["type"]
+
+        def check_type(value):
+            # bool is an int subclass, but true is not a valid number here
+            if not isinstance(value, expected) or (isinstance(value, bool) and type_name != "boolean"):
+                raise ResponseFormatError(f"{path} should be {type_name}, got {type(value).__name__}")
+        checks.append(check_type)
+
+    if "minimum" in schema or "maximum" in schema:
+        minimum = schema.get("minimum", float("-inf"))
+        maximum = schema.get("maximum", float("inf"))
+
+        def check_range(value):
+            if not minimum <= value <= maximum:
+                raise ResponseFormatError(f"{path} should be between {minimum} and {maximum}, got {value}")
+        checks.append(check_range)
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_length(value):
+            if len(value.strip()) < min_length:
+                raise ResponseFormatError(f"{path} should not be empty")
+        checks.append(check_length)
+
+    if "required" in schema:
+        required = schema["required"]
+
+        def check_required(value):
+            missing = [key for key in required if key not in value]
+            if missing:
+                raise ResponseFormatError(f"{path} is missing {', '.join(missing)}")
+        checks.append(check_required)
+
+    if "properties" in schema:
+        property_validators = [
+            (key, compile_validator(subschema, f"{path}.{key}"))
+            for key, subschema in schema["properties"].items()
+        ]
+
+        def check_properties(value):
+            for key, validate in property_validators:
+                if key in value:
+                    validate(value[key])
+        checks.append(check_properties)
+
+    if "items" in schema:
+        validate_item = compile_validator(schema["items"], f"{path}[]")
+
+        def check_items(value):
+            for item in value:
+                validate_item(item)
+        checks.append(check_items)
+
+    def validate(value):
+        for check in checks:
+            check(value)
+        return value
+    return validate
+
+
+validate_analysis_result = compile_validator(ANALYSIS_RESULT_SCHEMA)
+
+
+def load_json_object(response_text):
+    """Parse an answer as JSON, tolerating prose around the object from models without JSON mode"""
+    text = (response_text or "").strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    start_idx = text.find("{")
+    end_idx = text.rfind("}")
+    if start_idx == -1 or end_idx <= start_idx:
+        raise ResponseFormatError("answer contains no JSON object")
+    try:
+        return json.loads(text[start_idx:end_idx + 1])
+    except json.JSONDecodeError as e:
+        raise ResponseFormatError(f"answer is not valid JSON ({e.msg})")
+
+
+def parse_analysis_result(response_text):
+    """Parse, validate and normalize a single requirement answer"""
+    return normalize_analysis_result(load_json_object(response_text))
+
+
+def normalize_analysis_result(value):
+    """Validated requirement result in the shape the UI and reports use"""
+    result = validate_analysis_result(value)
+    return {
+        "compliance_status": result["compliance_status"],
+        "evidence": result["evidence"],
+        "recommendations": result["recommendations"],
+        "confidence_score": int(round(result["confidence_score"]))
+    }
@@ -0,0 +1,123 @@
+"""Columnar view of compliance results.
+
+Results arrive as nested dicts (results[app]["detailed_results"][requirement]).
+They are flattened once into a table with one row per document, APP and
+requirement. Scores, confidences, the risk heatmap and the portfolio matrix
+are then computed with grouped and pivoted column operations instead of
+walking the dicts again for every chart and report.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["document", "app", "requirement", "compliant", "confidence", "scored"]
+
+
+def weighted_score(requirements, compliant, confidence_sum):
+    """
+    Compliance percentage weighted by mean confidence, 0 where nothing was scored.
+    Works on scalars and on whole columns.
+    """
+    requirements = np.asarray(requirements, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = (compliant / requirements * 100) * (confidence_sum / (requirements * 100))
+    return np.where(requirements > 0, score, 0.0)
+
+
+def score_requirements(requirement_results):
+    """Score of one APP from its requirement results; unanswered requirements are left out"""
+    rows = [
+        (bool(r["compliance_status"]), r.get("confidence_score", 0))
+        for r in requirement_results if not r.get("analysis_error")
+    ]
+    if not rows:
+        return 0
+    values = np.array(rows, dtype=float)
+    return float(weighted_score(len(values), values[:, 0].sum(), values[:, 1].sum()))
+
+
+def results_frame(document_results):
+    """Flatten {document: results} into one row per (document, APP, requirement)"""
+    records = [
+        (
+            document, app, requirement,
+            bool(result["compliance_status"]),
+            float(result.get("confidence_score", 0)),
+            not result.get("analysis_error")
+        )
+        for document, results in document_results.items()
+        for app, data in results.items()
+        for requirement, result in data["detailed_results"].items()
+    ]
+    frame = pd.DataFrame.from_records(records, columns=COLUMNS)
+    # Categories keep first-seen order through groupby and pivot
+    for column in ("document", "app", "requirement"):
+        frame[column] = pd.Categorical(frame[column], categories=pd.unique(frame[column]))
+    return frame
+
+
+def app_summary(frame):
+    """
+    Per (document, APP): score, mean confidence (over every requirement, as
+    reported before), requirement count and unscored count
+    """
+    summary = frame.assign(
+        scored_compliant=frame["compliant"] & frame["scored"],
+        scored_confidence=frame["confidence"].where(frame["scored"], 0.0)
+    ).groupby(["document", "app"], observed=True).agg(
+        requirements=("scored", "size"),
+        scored_requirements=("scored", "sum"),
+        compliant=("scored_compliant", "sum"),
+        scored_confidence=("scored_confidence", "sum"),
+        confidence=("confidence", "mean")
+    )
+    summary["unscored"] = summary["requirements"] - summary["scored_requirements"]
+    summary["score"] = weighted_score(
+        summary["scored_requirements"], summary["compliant"], summary["scored_confidence"]
+    )
+    return summary[["score", "confidence", "requirements", "unscored"]]
+
+
+def unscored_requirements(frame):
+    """{(document, APP): [requirement, ...]} for requirements the model could not answer"""
+    rows = frame.loc[~frame["scored"], ["document", "app", "requirement"]].astype(str)
+    return rows.groupby(["document", "app"])["requirement"].apply(list).to_dict()
+
+
+def risk_matrix(frame):
+    """APP x requirement risk (100 - confidence); NaN where an APP has no such requirement"""
+    risk = frame.assign(risk=100 - frame["confidence"])
+    return risk.pivot_table(index="app", columns="requirement", values="risk", aggfunc="mean", observed=True)
+
+
+def requirement_status(frame):
+    """Compliant / Non-compliant / Unscored for every row"""
+    return np.select(
+        [~frame["scored"].to_numpy(), frame["compliant"].to_numpy()],
+        ["Unscored", "Compliant"],
+        "Non-compliant"
+    )
+
+
+def compliance_matrix(frame, labels):
+    """
+    APP/requirement rows against one column per document (labelled by
+    labels[document]): a score row per APP followed by its requirements'
+    statuses. Cells are "-" where a document has no result.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=["APP", "requirement"])
+    statuses = frame.assign(status=requirement_status(frame)).pivot(
+        index=["app", "requirement"], columns="document", values="status"
+    )
+    scores = app_summary(frame)["score"].map("{:.1f}%".format).unstack("document")
+    scores.index = pd.MultiIndex.from_arrays([scores.index, ["score"] * len(scores)], names=["app", "requirement"])
+    matrix = pd.concat([scores, statuses]).astype(object).fillna("-")
+    # Score row first within each APP, then requirements in their original order
+    requirement_order = {requirement: i for i, requirement in enumerate(frame["requirement"].cat.categories)}
+    requirement_order["score"] = -1
+    app_codes = pd.Categorical(matrix.index.get_level_values("app"), categories=frame["app"].cat.categories).codes
+    requirement_codes = matrix.index.get_level_values("requirement").map(requirement_order).to_numpy()
+    matrix = matrix.iloc[np.lexsort((requirement_codes, app_codes))]
+    matrix.columns = [labels[document] for document in matrix.columns]
+    keys = matrix.index.to_frame(index=False).astype(str).rename(columns={"app": "APP"})
+    return pd.concat([keys, matrix.reset_index(drop=True)], axis=1)
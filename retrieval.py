@@ -0,0 +1,83 @@
+"""Node postprocessors that rerank retrieved chunks and trim them to a similarity cutoff and token budget"""
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode
+
+from rate_limiter import estimate_tokens
+from telemetry import span
+from token_budget import RETRIEVAL_MIN_NODES, record_retrieval
+
+
+class ContextBudgetPostprocessor(BaseNodePostprocessor):
+    """
+    Keep the best-scoring chunks above the similarity cutoff until the context
+    token budget is spent. The top RETRIEVAL_MIN_NODES chunks are always kept.
+    With rank_by_score off the incoming order (e.g. from a reranker) is kept and
+    chunks below the cutoff are skipped instead of ending the scan.
+    """
+
+    similarity_cutoff: float = Field(default=0.0)
+    context_tokens: int = Field(default=2048)
+    min_nodes: int = Field(default=RETRIEVAL_MIN_NODES)
+    rank_by_score: bool = Field(default=True)
+
+    @classmethod
+    def class_name(cls):
+        return "ContextBudgetPostprocessor"
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if self.rank_by_score:
+            ranked = sorted(nodes, key=lambda node: node.score or 0.0, reverse=True)
+        else:
+            ranked = nodes
+        kept = []
+        used_tokens = 0
+        for node in ranked:
+            tokens = estimate_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM))
+            if len(kept) >= self.min_nodes:
+                if (node.score or 0.0) < self.similarity_cutoff:
+                    if self.rank_by_score:
+                        break
+                    continue
+                # A smaller chunk further down may still fit
+                if used_tokens + tokens > self.context_tokens:
+                    continue
+            kept.append(node)
+            used_tokens += tokens
+        record_retrieval(len(nodes), len(kept), used_tokens)
+        return kept
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """
+    Reorder retrieved chunks by a local cross-encoder's relevance score for the
+    retrieval text and keep the top_n. Node scores are left as embedding
+    similarities, so the similarity cutoff and pre-screening still apply.
+    """
+
+    model_name: str = Field(description="fastembed cross-encoder model")
+    top_n: int = Field(default=4)
+    _model = PrivateAttr()
+
+    def __init__(self, model_name, top_n=4, **kwargs):
+        try:
+            from fastembed.rerank.cross_encoder import TextCrossEncoder
+        except ImportError as e:
+            raise ImportError("The local reranker needs fastembed: pip install fastembed") from e
+        super().__init__(model_name=model_name, top_n=top_n, **kwargs)
+        self._model = TextCrossEncoder(model_name=model_name)
+
+    @classmethod
+    def class_name(cls):
+        return "CrossEncoderReranker"
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if query_bundle is None or len(nodes) <= 1:
+            return nodes[:self.top_n]
+        # The query string is the whole LLM prompt; rank against what was retrieved for
+        query = query_bundle.embedding_strs[0]
+        texts = [node.node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes]
+        with span("rerank", candidates=len(nodes)):
+            scores = list(self._model.rerank(query, texts))
+        order = sorted(range(len(nodes)), key=lambda i: scores[i], reverse=True)
+        return [nodes[i] for i in order[:self.top_n]]
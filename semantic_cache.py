@@ -0,0 +1,232 @@
+"""Near-duplicate verdict cache keyed by the evidence a requirement retrieved.
+
+Contracts drawn from the same template differ in party names, dates, amounts
+and whitespace, so their retrieved evidence never hashes the same but reads
+almost the same. The evidence text is normalized (case, digits, punctuation),
+cut into word shingles and summarized as a MinHash signature. Signatures are
+indexed with LSH bands, so a lookup only compares against verdicts that share
+at least one band, and a verdict is reused when the estimated Jaccard
+similarity reaches SEMANTIC_CACHE_THRESHOLD. A deterministic sample of hits
+(SEMANTIC_CACHE_REVALIDATE_RATE) is still sent to the LLM to check that reuse
+stays sound; verdicts that disagree are dropped from the cache. Verdicts
+expire after the cache TTL, and the least recently matched ones are evicted
+once the store grows past SEMANTIC_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+from caching import CACHE_PATH, CACHE_TTL_SECONDS
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_REVALIDATE_RATE = float(os.getenv("SEMANTIC_CACHE_REVALIDATE_RATE", "0.05"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+SHINGLE_WORDS = 3
+# 16 bands of 8 rows: pairs at 0.85 similarity become candidates >99% of the time,
+# pairs at 0.5 about 6% of the time
+MINHASH_BANDS = 16
+MINHASH_ROWS = 8
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+
+MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed so signatures stay comparable across processes
+_rng = random.Random(20240601)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+WORD_PATTERN = re.compile(r"[a-z0]+")
+
+
+def normalize_words(text):
+    """Lowercase words with every digit folded to 0, so dates and amounts compare equal"""
+    return WORD_PATTERN.findall(re.sub(r"\d", "0", text.lower()))
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """64-bit hashes of the overlapping word n-grams of text"""
+    words = normalize_words(text)
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams}
+
+
+def minhash_signature(text):
+    """MinHash signature of text, or None when it has no words"""
+    values = shingles(text)
+    if not values:
+        return None
+    return [min((a * value + b) % MERSENNE_PRIME for value in values) for a, b in PERMUTATIONS]
+
+
+def estimated_similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def band_buckets(signature):
+    """One bucket id per LSH band"""
+    return [
+        hashlib.blake2b(json.dumps(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]).encode("utf-8"),
+                        digest_size=8).hexdigest()
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def should_revalidate(document_hash, scope, rate=SEMANTIC_CACHE_REVALIDATE_RATE):
+    """Deterministically pick about `rate` of (document, requirement) pairs for re-checking"""
+    digest = hashlib.sha256(f"{document_hash}:{scope}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < rate
+
+
+class SemanticVerdictCache:
+    """SQLite store of verdicts with their evidence signatures and LSH band index"""
+
+    def __init__(self, path=CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD, ttl_seconds=CACHE_TTL_SECONDS,
+                 max_bytes=SEMANTIC_CACHE_MAX_BYTES):
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_verdicts (
+                verdict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                document_hash TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL DEFAULT 0
+            )
+        """)
+        # Stores created before the size budget lack the LRU columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(semantic_verdicts)")}
+        if "size" not in columns:
+            self._conn.execute("ALTER TABLE semantic_verdicts ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        if "last_accessed" not in columns:
+            self._conn.execute("ALTER TABLE semantic_verdicts ADD COLUMN last_accessed REAL NOT NULL DEFAULT 0")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_bands (
+                scope TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                verdict_id INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_bands_lookup ON semantic_bands (scope, band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_bands_verdict ON semantic_bands (verdict_id)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS semantic_verdicts_accessed ON semantic_verdicts (last_accessed)"
+        )
+        self._conn.commit()
+
+    def find(self, scope, signature, exclude_document=None):
+        """
+        Most similar live verdict for `scope` at or above the threshold, as
+        {"verdict_id", "document_hash", "similarity", "result"}, or None
+        """
+        buckets = band_buckets(signature)
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        with self._lock:
+            candidate_ids = set()
+            for band, bucket in enumerate(buckets):
+                candidate_ids.update(row[0] for row in self._conn.execute(
+                    "SELECT verdict_id FROM semantic_bands WHERE scope = ? AND band = ? AND bucket = ?",
+                    (scope, band, bucket)
+                ))
+            if not candidate_ids:
+                return None
+            placeholders = ",".join("?" * len(candidate_ids))
+            rows = self._conn.execute(
+                f"SELECT verdict_id, document_hash, signature, result FROM semantic_verdicts "
+                f"WHERE verdict_id IN ({placeholders}) AND created_at >= ?",
+                [*candidate_ids, oldest]
+            ).fetchall()
+        best = None
+        for verdict_id, document_hash, stored_signature, result in rows:
+            if document_hash == exclude_document:
+                continue
+            similarity = estimated_similarity(signature, json.loads(stored_signature))
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"verdict_id": verdict_id, "document_hash": document_hash,
+                        "similarity": similarity, "result": json.loads(result)}
+        if best:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE semantic_verdicts SET last_accessed = ? WHERE verdict_id = ?", (now, best["verdict_id"])
+                )
+                self._conn.commit()
+        return best
+
+    def add(self, scope, signature, document_hash, result):
+        """Store a fresh LLM verdict and index its bands"""
+        now = time.time()
+        signature_json = json.dumps(signature)
+        result_json = json.dumps(result)
+        with self._lock:
+            verdict_id = self._conn.execute(
+                "INSERT INTO semantic_verdicts "
+                "(scope, document_hash, signature, result, size, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, document_hash, signature_json, result_json, len(signature_json) + len(result_json), now, now)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO semantic_bands (scope, band, bucket, verdict_id) VALUES (?, ?, ?, ?)",
+                [(scope, band, bucket, verdict_id) for band, bucket in enumerate(band_buckets(signature))]
+            )
+            self._evict(now)
+            self._conn.commit()
+        return verdict_id
+
+    def discard(self, verdict_id):
+        """Drop a verdict that failed re-validation"""
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_bands WHERE verdict_id = ?", (verdict_id,))
+            self._conn.execute("DELETE FROM semantic_verdicts WHERE verdict_id = ?", (verdict_id,))
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = "SELECT verdict_id FROM semantic_verdicts WHERE created_at < ?"
+        self._conn.execute(f"DELETE FROM semantic_bands WHERE verdict_id IN ({expired})", (now - self.ttl_seconds,))
+        self._conn.execute("DELETE FROM semantic_verdicts WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM semantic_verdicts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently matched verdicts until the cache fits its budget again
+        freed = 0
+        evicted = []
+        for verdict_id, size in self._conn.execute(
+            "SELECT verdict_id, size FROM semantic_verdicts ORDER BY last_accessed"
+        ):
+            evicted.append((verdict_id,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM semantic_bands WHERE verdict_id = ?", evicted)
+        self._conn.executemany("DELETE FROM semantic_verdicts WHERE verdict_id = ?", evicted)
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return the process-wide semantic verdict cache"""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticVerdictCache()
+        return _semantic_cache
@@ -0,0 +1,246 @@
+"""Spans, counters and cost accounting for the analysis pipeline.
+
+Stages are wrapped in spans (`with span("llm.completion"):` or `@traced(...)`)
+and notable events are counted (tokens, retries, cache lookups). Every event
+is tagged with the current run id, which is held in a context variable; work
+handed to a thread pool keeps it when submitted through `submit_with_context`. Events go to
+an in-memory ring buffer for the sidebar panel, optionally to a JSON lines
+file, and into cumulative totals rendered in the Prometheus text format.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH", "")
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "0"))
+MAX_TELEMETRY_EVENTS = 20000
+METRIC_PREFIX = "privacylens"
+
+# USD per 1K tokens as (prompt, completion); unknown models are costed at zero
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "text-embedding-ada-002": (0.0001, 0.0),
+    "text-embedding-3-small": (0.00002, 0.0),
+}
+
+_current_run = contextvars.ContextVar("telemetry_run", default=None)
+
+
+def token_cost(model, prompt_tokens, completion_tokens=0):
+    """Estimated USD cost of a call"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class Telemetry:
+    """Thread-safe event recorder with JSON lines and Prometheus exports"""
+
+    def __init__(self, jsonl_path=TELEMETRY_JSONL_PATH, max_events=MAX_TELEMETRY_EVENTS):
+        self.jsonl_path = jsonl_path
+        self._events = deque(maxlen=max_events)
+        self._span_totals = {}
+        self._counter_totals = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, event):
+        event["run_id"] = _current_run.get()
+        event["timestamp"] = time.time()
+        line = json.dumps(event, default=str) if self.jsonl_path else None
+        with self._lock:
+            self._events.append(event)
+            if event["type"] == "span":
+                key = (event["name"], event["status"])
+                count, seconds = self._span_totals.get(key, (0, 0.0))
+                self._span_totals[key] = (count + 1, seconds + event["duration"])
+            else:
+                key = (event["name"], tuple(sorted(event["labels"].items())))
+                self._counter_totals[key] = self._counter_totals.get(key, 0) + event["value"]
+            if line:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def record_span(self, name, duration, status="ok", **attributes):
+        self._emit({"type": "span", "name": name, "duration": duration, "status": status,
+                    "attributes": attributes})
+
+    def count(self, name, value=1, **labels):
+        self._emit({"type": "counter", "name": name, "value": value,
+                    "labels": {key: str(label) for key, label in labels.items()}})
+
+    def record_tokens(self, kind, model, prompt_tokens, completion_tokens=0):
+        """Count tokens and their estimated cost for an LLM or embedding call"""
+        self.count("tokens", prompt_tokens, kind=kind, model=model, direction="prompt")
+        if completion_tokens:
+            self.count("tokens", completion_tokens, kind=kind, model=model, direction="completion")
+        self.count("cost_usd", token_cost(model, prompt_tokens, completion_tokens), kind=kind, model=model)
+
+    def events(self, run_id=None):
+        with self._lock:
+            events = list(self._events)
+        if run_id is None:
+            return events
+        return [event for event in events if event["run_id"] == run_id]
+
+    def recent_runs(self, limit=10):
+        """Run ids seen in the buffer, most recent first"""
+        runs = []
+        for event in reversed(self.events()):
+            if event["run_id"] and event["run_id"] not in runs:
+                runs.append(event["run_id"])
+                if len(runs) == limit:
+                    break
+        return runs
+
+    def run_summary(self, run_id):
+        """Per-stage span totals and counter totals for one run"""
+        stages = {}
+        counters = {}
+        for event in self.events(run_id):
+            if event["type"] == "span":
+                stage = stages.setdefault(event["name"], {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0})
+                stage["count"] += 1
+                stage["seconds"] += event["duration"]
+                stage["max"] = max(stage["max"], event["duration"])
+                stage["errors"] += event["status"] != "ok"
+            else:
+                label = ",".join(f"{key}={value}" for key, value in sorted(event["labels"].items()))
+                name = f"{event['name']}{{{label}}}" if label else event["name"]
+                counters[name] = counters.get(name, 0) + event["value"]
+        return {"stages": stages, "counters": counters}
+
+    def export_jsonl(self, run_id=None):
+        return "".join(json.dumps(event, default=str) + "\n" for event in self.events(run_id))
+
+    def prometheus_text(self):
+        """Cumulative totals in the Prometheus text exposition format"""
+        with self._lock:
+            span_totals = dict(self._span_totals)
+            counter_totals = dict(self._counter_totals)
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for (name, status), (count, seconds) in sorted(span_totals.items()):
+            labels = f'stage="{name}",status="{status}"'
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{{{labels}}} {count}")
+        for metric in sorted({name for name, _ in counter_totals}):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric}_total counter")
+            for (name, labels), value in sorted(counter_totals.items()):
+                if name != metric:
+                    continue
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{METRIC_PREFIX}_{metric}_total{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    """Process-wide telemetry recorder"""
+    return _telemetry
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def run_context(run_id):
+    """Tag every span and counter recorded inside the block (and tasks submitted from it) with run_id"""
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block; exceptions are recorded with status "error" and re-raised"""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _telemetry.record_span(name, time.perf_counter() - start, status, **attributes)
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(name, iterable, **attributes):
+    """Yield from iterable, recording the time spent producing items as one span"""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    items = 0
+    status = "ok"
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            items += 1
+            yield item
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _telemetry.record_span(name, elapsed, status, items=items, **attributes)
+
+
+def submit_with_context(executor, func, *args, **kwargs):
+    """executor.submit that carries the current run id into the worker thread"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = _telemetry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+
+
+def start_metrics_server(port=TELEMETRY_PROMETHEUS_PORT):
+    """Serve /metrics for Prometheus on a daemon thread; does nothing when port is 0 or already serving"""
+    global _metrics_server
+    if not port or _metrics_server is not None:
+        return _metrics_server
+    _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _metrics_server
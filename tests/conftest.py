@@ -0,0 +1,10 @@
+"""Shared test setup: every SQLite store the app opens lives in a throwaway directory"""
+import os
+import tempfile
+
+# Set before any app module is imported, since their paths are read at import time
+_state_dir = tempfile.mkdtemp(prefix="privacylens-tests-")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_state_dir, "llm_cache.sqlite3"))
+os.environ.setdefault("JOBS_PATH", os.path.join(_state_dir, "analysis_jobs.sqlite3"))
+os.environ.setdefault("DOCUMENT_REGISTRY_PATH", os.path.join(_state_dir, "document_registry.sqlite3"))
+os.environ.setdefault("CHROMA_PATH", os.path.join(_state_dir, "chroma_db"))
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("dotenv")
+pytest.importorskip("llama_index.core")
+
+import Home  # noqa: E402
+import caching  # noqa: E402
+import semantic_cache  # noqa: E402
+from llama_index.core.schema import NodeWithScore, TextNode  # noqa: E402
+from results_table import score_requirements  # noqa: E402
+
+
+class FakeQueryEngine:
+    """
+    Query engine stand-in: retrieval returns one chunk naming the requirement,
+    synthesis answers compliant unless the requirement is listed in `failing`
+    """
+
+    def __init__(self, failing=(), delay=0.05):
+        self.failing = set(failing)
+        self.delay = delay
+        self.requirements = {
+            Home.requirement_retrieval_text(app.replace("APP", ""), requirement): requirement
+            for app in Home.APPS for requirement in Home.APPS[app]["requirements"]
+        }
+        self.retrieved = []
+        self.answered = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def retrieve(self, query_bundle):
+        requirement = self.requirements[query_bundle.embedding_strs[0]]
+        with self._lock:
+            self.retrieved.append(requirement)
+        text = f"Clause on {requirement}: {query_bundle.embedding_strs[0]}"
+        node = TextNode(
+            text=text,
+            metadata={"requirement": requirement, "chunk_hash": hashlib.sha256(text.encode()).hexdigest()}
+        )
+        return [NodeWithScore(node=node, score=0.9)]
+
+    def synthesize(self, query_bundle, nodes):
+        requirement = nodes[0].node.metadata["requirement"]
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if requirement in self.failing:
+                raise RuntimeError(f"model endpoint unavailable for {requirement}")
+            with self._lock:
+                self.answered.append(requirement)
+            return SimpleNamespace(response=json.dumps({
+                "compliance_status": True,
+                "evidence": nodes[0].node.get_content(),
+                "recommendations": [],
+                "confidence_score": 80
+            }))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, "_response_cache", caching.ResponseCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(
+        semantic_cache, "_semantic_cache", semantic_cache.SemanticVerdictCache(str(tmp_path / "cache.sqlite3"))
+    )
+
+
+@pytest.fixture
+def document_hash():
+    return uuid.uuid4().hex
+
+
+def test_results_have_the_shape_the_ui_expects(document_hash):
+    engine = FakeQueryEngine()
+    progress = []
+    results = Home.run_compliance_analysis(
+        engine, ["APP1", "APP8"], max_workers=4, document_hash=document_hash,
+        progress_callback=lambda completed, total, label: progress.append((completed, total))
+    )
+    assert list(results) == ["APP1", "APP8"]
+    for app, data in results.items():
+        assert set(data) == {"title", "compliance_score", "detailed_results", "recommendations"}
+        assert data["title"] == Home.APPS[app]["title"]
+        # Requirements come back in APPS order whatever order they completed in
+        assert list(data["detailed_results"]) == Home.APPS[app]["requirements"]
+        assert data["compliance_score"] == pytest.approx(80.0)
+        for result in data["detailed_results"].values():
+            assert result["compliance_status"] is True
+            assert result["evidence_chunks"]
+    total = len(Home.APPS["APP1"]["requirements"]) + len(Home.APPS["APP8"]["requirements"])
+    assert progress == [(completed, total) for completed in range(1, total + 1)]
+    # One retrieval and one completion per requirement
+    assert sorted(engine.retrieved) == sorted(engine.answered)
+    assert len(engine.answered) == total
+
+
+def test_failed_requirements_are_reported_and_left_out_of_the_score(document_hash):
+    failing = Home.APPS["APP1"]["requirements"][0]
+    engine = FakeQueryEngine(failing=[failing], delay=0)
+    results = Home.run_compliance_analysis(engine, ["APP1"], max_workers=2, document_hash=document_hash)
+    detailed = results["APP1"]["detailed_results"]
+    assert "model endpoint unavailable" in detailed[failing]["analysis_error"]
+    assert detailed[failing]["confidence_score"] == 0
+    answered = [result for requirement, result in detailed.items() if requirement != failing]
+    assert all(not result.get("analysis_error") for result in answered)
+    assert results["APP1"]["compliance_score"] == pytest.approx(score_requirements(answered))
+    # Failures are not cached, so a rerun asks again
+    assert not caching.get_response_cache().contains(Home.response_cache_key(document_hash, "1", failing))
+
+
+def test_concurrency_is_bounded_by_max_workers(document_hash):
+    engine = FakeQueryEngine()
+    Home.run_compliance_analysis(engine, ["APP1", "APP3"], max_workers=2, document_hash=document_hash)
+    assert engine.max_in_flight == 2
+
+
+def test_settled_requirements_are_not_evaluated_again(document_hash):
+    settled = Home.APPS["APP1"]["requirements"][:3]
+    initial_results = {
+        "APP1": {
+            requirement: {"compliance_status": False, "evidence": "saved", "recommendations": [], "confidence_score": 50}
+            for requirement in settled
+        }
+    }
+    engine = FakeQueryEngine(delay=0)
+    saved = {}
+    results = Home.run_compliance_analysis(
+        engine, ["APP1"], document_hash=document_hash, initial_results=initial_results,
+        result_callback=lambda app, app_results: saved.update(app_results)
+    )
+    assert not set(settled) & set(engine.retrieved + engine.answered)
+    assert sorted(engine.answered) == sorted(Home.APPS["APP1"]["requirements"][3:])
+    assert [results["APP1"]["detailed_results"][requirement]["evidence"] for requirement in settled] == ["saved"] * 3
+    assert set(saved) == set(Home.APPS["APP1"]["requirements"])
+
+
+def test_cached_results_skip_the_engine(document_hash):
+    Home.run_compliance_analysis(FakeQueryEngine(delay=0), ["APP8"], document_hash=document_hash)
+    engine = FakeQueryEngine(delay=0)
+    results = Home.run_compliance_analysis(engine, ["APP8"], document_hash=document_hash)
+    assert engine.retrieved == [] and engine.answered == []
+    assert list(results["APP8"]["detailed_results"]) == Home.APPS["APP8"]["requirements"]
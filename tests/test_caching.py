@@ -0,0 +1,80 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import caching
+from caching import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = [1000.0]
+    monkeypatch.setattr(caching, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def entry(size):
+    """A value whose JSON payload is exactly `size` bytes"""
+    value = "x" * (size - 2)
+    assert len(json.dumps(value)) == size
+    return value
+
+
+def test_round_trip_and_counters(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("missing") is None
+    cache.set("key", {"compliance_status": True, "evidence": "Clause 4.2"})
+    assert cache.get("key") == {"compliance_status": True, "evidence": "Clause 4.2"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    cache.set("key", "value")
+    clock[0] += 60
+    assert cache.contains("key")
+    assert cache.get("key") == "value"
+    clock[0] += 1
+    assert not cache.contains("key")
+    assert cache.get("key") is None
+    # The expired row is removed on the miss
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_bytes=300)
+    for key in ("a", "b", "c"):
+        cache.set(key, entry(100))
+        clock[0] += 1
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    clock[0] += 1
+    cache.set("d", entry(100))
+    assert cache.contains("a")
+    assert not cache.contains("b")
+    assert cache.contains("c") and cache.contains("d")
+    assert cache.stats()["bytes"] <= 300
+
+
+def test_contains_does_not_refresh_lru_order(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_bytes=200)
+    cache.set("a", entry(100))
+    clock[0] += 1
+    cache.set("b", entry(100))
+    clock[0] += 1
+    assert cache.contains("a")
+    cache.set("c", entry(100))
+    assert not cache.contains("a")
+    assert cache.stats()["hits"] == 0
+
+
+def test_oversized_entry_leaves_the_cache_within_budget(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_bytes=150)
+    cache.set("a", entry(100))
+    clock[0] += 1
+    cache.set("b", entry(200))
+    assert not cache.contains("a")
+    assert cache.stats()["bytes"] <= 150
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from chunking import ClauseAwareSplitter, build_node_parser, is_heading, iter_segments  # noqa: E402
+from rate_limiter import estimate_tokens  # noqa: E402
+
+CONTRACT = """1. DEFINITIONS
+1.1 Personal information means information or an opinion about an identified individual.
+1.2 Sensitive information includes health, biometric and genetic information.
+
+2. DATA SECURITY
+2.1 The Supplier must protect personal information from misuse, interference and loss.
+2.2 The Supplier must notify the Customer of any eligible data breach within 72 hours.
+2.3 The Supplier must destroy or de-identify personal information it no longer needs.
+"""
+CLAUSES = [segment for kind, segment in iter_segments(CONTRACT) if kind == "clause"]
+
+
+def section_of(clause):
+    return "1. DEFINITIONS" if clause.startswith("1.") else "2. DATA SECURITY"
+
+
+def test_headings_and_clauses_are_recognised():
+    assert is_heading("2. DATA SECURITY")
+    assert is_heading("# Definitions")
+    assert not is_heading("2.1 The Supplier must protect personal information.")
+    assert [kind for kind, _ in iter_segments(CONTRACT)] == [
+        "heading", "clause", "clause", "heading", "clause", "clause", "clause"
+    ]
+
+
+@pytest.mark.parametrize("chunk_tokens", [30, 40, 60])
+def test_clauses_stay_whole_within_the_budget(chunk_tokens):
+    chunks = ClauseAwareSplitter(chunk_tokens=chunk_tokens).split_text(CONTRACT)
+    for clause in CLAUSES:
+        assert sum(clause in chunk for chunk in chunks) == 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= chunk_tokens + len(chunk.splitlines())
+
+
+@pytest.mark.parametrize("chunk_tokens", [30, 40, 60])
+def test_every_chunk_carries_its_section_heading(chunk_tokens):
+    for chunk in ClauseAwareSplitter(chunk_tokens=chunk_tokens).split_text(CONTRACT):
+        clauses = [clause for clause in CLAUSES if clause in chunk]
+        assert chunk.startswith(section_of(clauses[0]) + "\n")
+        # A section heading never ends up in the middle of another section's chunk
+        assert {section_of(clause) for clause in clauses} == {section_of(clauses[0])}
+
+
+def test_small_sections_share_a_chunk_only_when_they_are_tiny():
+    chunks = ClauseAwareSplitter(chunk_tokens=1000).split_text(CONTRACT)
+    assert len(chunks) == 1
+    chunks = ClauseAwareSplitter(chunk_tokens=60).split_text(CONTRACT)
+    assert [chunk.splitlines()[0] for chunk in chunks] == ["1. DEFINITIONS", "2. DATA SECURITY"]
+
+
+def test_oversized_clause_is_split_at_sentences_under_its_heading():
+    sentences = [f"The Supplier must keep audit log number {n} for seven years after the contract ends." for n in range(12)]
+    text = "3. RECORDS\n3.1 " + " ".join(sentences)
+    chunks = ClauseAwareSplitter(chunk_tokens=60).split_text(text)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith("3. RECORDS\n")
+    body = " ".join(chunk.split("\n", 1)[1] for chunk in chunks)
+    for sentence in sentences:
+        assert sentence in body
+
+
+def test_trailing_heading_is_not_a_chunk():
+    chunks = ClauseAwareSplitter(chunk_tokens=30).split_text(CONTRACT + "\n3. SCHEDULES\n")
+    assert "3. SCHEDULES" not in chunks
+
+
+def test_sentence_strategy_restores_the_default_splitter():
+    assert type(build_node_parser("sentence")).__name__ == "SentenceSplitter"
+    assert isinstance(build_node_parser("clause", 128), ClauseAwareSplitter)
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from jobs import JobRunner, JobStore, RESUMABLE_STATUSES
+
+REQUIREMENTS = ["notice", "consent", "access", "correction"]
+
+
+def result(requirement):
+    return {"compliance_status": True, "evidence": requirement, "recommendations": [], "confidence_score": 80}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def wait_for(runner, job_id):
+    while runner.is_active(job_id):
+        threading.Event().wait(0.01)
+
+
+def test_results_are_saved_as_they_complete(store):
+    job_id = store.create_job("doc", "contract.pdf", {"selected_apps": ["APP1"]}, total=len(REQUIREMENTS))
+    store.save_result(job_id, "APP1", "notice", result("notice"))
+    store.save_result(job_id, "APP1", "notice", result("notice"))
+    job = store.get_job(job_id)
+    assert (job["status"], job["completed"], job["total"]) == ("queued", 1, 4)
+    assert job["options"] == {"selected_apps": ["APP1"]}
+    assert store.load_results(job_id) == {"APP1": {"notice": result("notice")}}
+
+
+def test_unfinished_jobs_are_marked_interrupted(store):
+    running = store.create_job("doc", "a.pdf", {}, total=1)
+    store.set_status(running, "running")
+    done = store.create_job("doc", "b.pdf", {}, total=1)
+    store.complete(done, {"APP1": {}})
+    store.mark_interrupted()
+    assert store.get_job(running)["status"] == "interrupted"
+    assert store.get_job(done)["status"] == "completed"
+    assert store.latest_completed_job("doc")["job_id"] == done
+
+
+@pytest.mark.parametrize("stopped_as", RESUMABLE_STATUSES)
+def test_stopped_job_resumes_from_saved_results(store, stopped_as):
+    evaluated = []
+    fail_after = [2 if stopped_as == "failed" else None]
+
+    def run_job(job_id):
+        saved = store.load_results(job_id).get("APP1", {})
+        for requirement in REQUIREMENTS:
+            if requirement in saved:
+                continue
+            if fail_after[0] is not None and len(evaluated) == fail_after[0]:
+                raise RuntimeError("model endpoint unavailable")
+            evaluated.append(requirement)
+            store.save_result(job_id, "APP1", requirement, result(requirement))
+        store.complete(job_id, store.load_results(job_id))
+
+    runner = JobRunner(store, run_job, workers=1)
+    job_id = store.create_job("doc", "contract.pdf", {}, total=len(REQUIREMENTS))
+    if stopped_as == "interrupted":
+        # A previous server process saved two results and then stopped
+        for requirement in REQUIREMENTS[:2]:
+            evaluated.append(requirement)
+            store.save_result(job_id, "APP1", requirement, result(requirement))
+        store.set_status(job_id, "running")
+        store.mark_interrupted()
+    else:
+        runner.submit(job_id)
+        wait_for(runner, job_id)
+        assert store.get_job(job_id)["error"] == "model endpoint unavailable"
+        fail_after[0] = None
+    job = store.get_job(job_id)
+    assert (job["status"], job["completed"]) == (stopped_as, 2)
+
+    assert runner.submit(job_id)
+    wait_for(runner, job_id)
+    job = store.get_job(job_id)
+    assert job["status"] == "completed"
+    assert job["error"] is None
+    # Every requirement was evaluated exactly once across both runs
+    assert sorted(evaluated) == sorted(REQUIREMENTS)
+    assert set(job["results"]["APP1"]) == set(REQUIREMENTS)
+
+
+def test_a_job_is_never_queued_twice(store):
+    release = threading.Event()
+    runner = JobRunner(store, lambda job_id: release.wait(5), workers=1)
+    job_id = store.create_job("doc", "contract.pdf", {}, total=1)
+    assert runner.submit(job_id)
+    assert not runner.submit(job_id)
+    release.set()
+    wait_for(runner, job_id)
@@ -0,0 +1,93 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limiter import RateLimiter, TokenBucket, get_retry_after, is_rate_limit_error
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in for openai.RateLimitError: a 429 with the response headers attached"""
+
+    def __init__(self, headers=None):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    bucket.refill(bucket.updated + 2)
+    assert bucket.available == pytest.approx(2.0)
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_token_bucket_never_asks_for_more_than_capacity():
+    bucket = TokenBucket(per_minute=10)
+    # A request larger than the bucket waits for a full bucket, not forever
+    assert bucket.wait_time(1000) == 0.0
+
+
+def test_retry_after_header_forms():
+    assert get_retry_after(FakeRateLimitError({"retry-after": "2"})) == 2.0
+    assert get_retry_after(FakeRateLimitError({"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(FakeRateLimitError()) is None
+
+
+def test_rate_limit_error_is_found_through_wrapping():
+    try:
+        try:
+            raise FakeRateLimitError()
+        except FakeRateLimitError as e:
+            raise RuntimeError("query failed") from e
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped)
+    assert not is_rate_limit_error(ValueError("bad answer"))
+
+
+def test_call_retries_429_after_retry_after():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=1000000, base_delay=5.0, name="test")
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise FakeRateLimitError({"retry-after": "0.2"})
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(calls) == 2
+    # The Retry-After header wins over the (much longer) exponential backoff
+    assert 0.2 <= calls[1] - calls[0] < 2.0
+    assert limiter.rate_limited_count == 1
+    # Halved by the 429, then recovering on the successful retry
+    assert limiter.rate_factor == pytest.approx(0.55)
+
+
+def test_call_gives_up_after_max_retries():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=1000000, max_retries=2, name="test")
+    calls = []
+
+    def always_limited():
+        calls.append(1)
+        raise FakeRateLimitError({"retry-after-ms": "1"})
+
+    with pytest.raises(FakeRateLimitError):
+        limiter.call(always_limited)
+    assert len(calls) == 3
+
+
+def test_call_does_not_retry_other_errors():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=1000000, name="test")
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("not a rate limit")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert len(calls) == 1
+    assert limiter.rate_limited_count == 0
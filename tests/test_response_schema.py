@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from response_schema import (
+    ANALYSIS_RESULT_SCHEMA, ResponseFormatError, compile_validator, load_json_object, parse_analysis_result
+)
+
+VALID = {
+    "compliance_status": True,
+    "evidence": "Clause 7.1 limits direct marketing to consenting customers.",
+    "recommendations": ["Add an opt-out address"],
+    "confidence_score": 82.6
+}
+
+
+@pytest.fixture
+def validate():
+    return compile_validator(ANALYSIS_RESULT_SCHEMA)
+
+
+def test_valid_answer_passes(validate):
+    assert validate(dict(VALID)) == VALID
+
+
+@pytest.mark.parametrize("score", [True, False])
+def test_bool_is_not_a_number(validate, score):
+    with pytest.raises(ResponseFormatError, match="confidence_score should be number"):
+        validate(dict(VALID, confidence_score=score))
+
+
+def test_number_is_not_a_bool(validate):
+    with pytest.raises(ResponseFormatError, match="compliance_status should be boolean"):
+        validate(dict(VALID, compliance_status=1))
+
+
+@pytest.mark.parametrize("evidence", ["", "   \n"])
+def test_empty_evidence_is_rejected(validate, evidence):
+    with pytest.raises(ResponseFormatError, match="evidence should not be empty"):
+        validate(dict(VALID, evidence=evidence))
+
+
+def test_missing_keys_are_listed(validate):
+    answer = dict(VALID)
+    del answer["evidence"], answer["recommendations"]
+    with pytest.raises(ResponseFormatError, match="missing evidence, recommendations"):
+        validate(answer)
+
+
+def test_out_of_range_and_wrong_item_types(validate):
+    with pytest.raises(ResponseFormatError, match="between 0 and 100"):
+        validate(dict(VALID, confidence_score=120))
+    with pytest.raises(ResponseFormatError, match=r"recommendations\[\] should be string"):
+        validate(dict(VALID, recommendations=["ok", 3]))
+
+
+def test_prose_around_json_is_tolerated():
+    assert load_json_object('Here you go:\n{"a": 1}\nThanks') == {"a": 1}
+    with pytest.raises(ResponseFormatError):
+        load_json_object("I could not find any relevant clauses.")
+
+
+def test_parse_rounds_the_confidence_score():
+    assert parse_analysis_result(json.dumps(VALID))["confidence_score"] == 83
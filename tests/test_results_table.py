@@ -0,0 +1,64 @@
+import pytest
+
+from results_table import app_summary, results_frame, score_requirements, unscored_requirements, weighted_score
+
+
+def answer(compliant, confidence):
+    return {"compliance_status": compliant, "evidence": "Clause 3", "recommendations": [], "confidence_score": confidence}
+
+
+def failed(error="timed out"):
+    return {
+        "compliance_status": False,
+        "evidence": f"Analysis incomplete: {error}",
+        "recommendations": ["Manual review required - automated analysis failed"],
+        "confidence_score": 0,
+        "analysis_error": error
+    }
+
+
+def app_results(detailed):
+    return {"title": "Test", "compliance_score": 0, "detailed_results": detailed, "recommendations": []}
+
+
+def test_weighted_score():
+    # Half compliant at a mean confidence of 80%
+    assert float(weighted_score(2, 1, 160)) == pytest.approx(40.0)
+    assert float(weighted_score(0, 0, 0)) == 0.0
+
+
+def test_score_leaves_out_analysis_errors():
+    answered = [answer(True, 90), answer(True, 70)]
+    assert score_requirements(answered + [failed()]) == pytest.approx(score_requirements(answered))
+    assert score_requirements(answered) == pytest.approx(80.0)
+
+
+def test_score_without_any_answer_is_zero():
+    assert score_requirements([failed(), failed("rate limited")]) == 0
+    assert score_requirements([]) == 0
+
+
+def test_app_summary_matches_score_requirements_and_counts_unscored():
+    results = {
+        "APP1": app_results({"a": answer(True, 90), "b": answer(False, 60), "c": failed()}),
+        "APP8": app_results({"d": failed()})
+    }
+    summary = app_summary(results_frame({"doc": results})).droplevel("document")
+    assert summary.loc["APP1", "score"] == pytest.approx(
+        score_requirements([answer(True, 90), answer(False, 60)])
+    )
+    assert summary.loc["APP1", "requirements"] == 3
+    assert summary.loc["APP1", "unscored"] == 1
+    assert summary.loc["APP8", "score"] == 0
+    assert summary.loc["APP8", "unscored"] == 1
+
+
+def test_unscored_requirements_are_listed_per_app():
+    frame = results_frame({"doc": {"APP1": app_results({"a": answer(True, 90), "c": failed()})}})
+    assert unscored_requirements(frame) == {("doc", "APP1"): ["c"]}
+
+
+def test_empty_results_give_an_empty_frame():
+    frame = results_frame({"doc": {}})
+    assert frame.empty
+    assert unscored_requirements(frame) == {}
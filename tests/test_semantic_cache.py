@@ -0,0 +1,104 @@
+import pytest
+
+from semantic_cache import (
+    MINHASH_PERMUTATIONS, SemanticVerdictCache, band_buckets, estimated_similarity, minhash_signature,
+    normalize_words
+)
+
+CLAUSE = (
+    "The Supplier must notify Acme Pty Ltd of any eligible data breach within 72 hours of becoming aware "
+    "of it, and must take all reasonable steps to contain the breach and assess the likely harm to the "
+    "individuals concerned. The Supplier must keep a record of every breach for 7 years from 1 July 2023 "
+    "and provide that record to the Customer on request, at no additional charge to the Customer."
+)
+# Same template in another contract: numbers, dates and capitalisation differ
+VARIANT = (
+    CLAUSE.replace("72", "48").replace("7 years", "5 years").replace("1 July 2023", "3 July 2024")
+    .replace("The Supplier", "the supplier")
+)
+# A different party name changes a few shingles as well
+RENAMED = VARIANT.replace("Acme Pty Ltd", "Globex Pty Ltd")
+UNRELATED = (
+    "Customers may request access to the personal information held about them by writing to the privacy "
+    "officer, who will respond within a reasonable period and may refuse access only where the law allows."
+)
+
+VERDICT = {"compliance_status": True, "evidence": "Clause 9", "recommendations": [], "confidence_score": 90}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticVerdictCache(str(tmp_path / "semantic.sqlite3"), threshold=0.85, ttl_seconds=3600)
+
+
+def test_normalization_folds_case_digits_and_punctuation():
+    assert normalize_words("Within 72 Hours, (see 4.2)") == normalize_words("within 48 hours; see 9.7")
+
+
+def test_signatures():
+    signature = minhash_signature(CLAUSE)
+    assert len(signature) == MINHASH_PERMUTATIONS
+    assert signature == minhash_signature(CLAUSE)
+    assert minhash_signature("  ,;  ") is None
+    assert estimated_similarity(signature, minhash_signature(VARIANT)) == 1.0
+    assert 0.5 < estimated_similarity(signature, minhash_signature(RENAMED)) < 1.0
+    assert estimated_similarity(signature, minhash_signature(UNRELATED)) < 0.3
+
+
+def test_near_duplicate_evidence_finds_the_verdict(cache):
+    verdict_id = cache.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+    match = cache.find("scope", minhash_signature(VARIANT))
+    assert match["verdict_id"] == verdict_id
+    assert match["document_hash"] == "doc-a"
+    assert match["result"] == VERDICT
+    assert match["similarity"] >= 0.85
+
+
+def test_unrelated_evidence_and_other_scopes_miss(cache):
+    cache.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+    assert cache.find("scope", minhash_signature(UNRELATED)) is None
+    assert cache.find("other scope", minhash_signature(CLAUSE)) is None
+
+
+def test_lsh_only_compares_verdicts_sharing_a_band(cache):
+    cache.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+    unrelated_buckets = set(band_buckets(minhash_signature(UNRELATED)))
+    assert not unrelated_buckets & set(band_buckets(minhash_signature(CLAUSE)))
+
+
+def test_threshold_is_respected(tmp_path):
+    similarity = estimated_similarity(minhash_signature(CLAUSE), minhash_signature(RENAMED))
+    for threshold, reused in ((similarity, True), (similarity + 0.01, False)):
+        cache = SemanticVerdictCache(str(tmp_path / f"{threshold}.sqlite3"), threshold=threshold)
+        cache.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+        assert (cache.find("scope", minhash_signature(RENAMED)) is not None) == reused
+    strict = SemanticVerdictCache(str(tmp_path / "strict.sqlite3"), threshold=1.01)
+    strict.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+    # Above 1 even identical evidence is not reused
+    assert strict.find("scope", minhash_signature(CLAUSE)) is None
+
+
+def test_own_document_is_excluded_and_discard_removes(cache):
+    verdict_id = cache.add("scope", minhash_signature(CLAUSE), "doc-a", VERDICT)
+    assert cache.find("scope", minhash_signature(CLAUSE), exclude_document="doc-a") is None
+    cache.discard(verdict_id)
+    assert cache.find("scope", minhash_signature(CLAUSE)) is None
+
+
+def test_least_recently_matched_verdicts_are_evicted(tmp_path):
+    signatures = [minhash_signature(f"{CLAUSE} Schedule {word}") for word in ("alpha", "beta", "gamma")]
+    cache = SemanticVerdictCache(str(tmp_path / "lru.sqlite3"), threshold=0.99, max_bytes=10 ** 9)
+    ids = [cache.add(f"scope {n}", signature, f"doc-{n}", VERDICT) for n, signature in enumerate(signatures)]
+    sizes = [row[0] for row in cache._conn.execute("SELECT size FROM semantic_verdicts ORDER BY verdict_id")]
+    cache._conn.execute("UPDATE semantic_verdicts SET last_accessed = verdict_id")
+    # Matching the first verdict makes the second the least recently used
+    assert cache.find("scope 0", signatures[0])["verdict_id"] == ids[0]
+    # Room for one more verdict the size of the second, but not for all four
+    cache.max_bytes = sum(sizes)
+    new_id = cache.add("scope 3", signatures[1], "doc-3", VERDICT)
+    remaining = {row[0] for row in cache._conn.execute("SELECT verdict_id FROM semantic_verdicts")}
+    assert remaining == {ids[0], ids[2], new_id}
+    orphaned_bands = cache._conn.execute(
+        "SELECT COUNT(*) FROM semantic_bands WHERE verdict_id NOT IN (SELECT verdict_id FROM semantic_verdicts)"
+    ).fetchone()[0]
+    assert orphaned_bands == 0
@@ -0,0 +1,87 @@
+"""Retrieval settings and per-query token accounting.
+
+The retrieval postprocessor records how many chunks and context tokens each
+query kept; rate_limited_query pairs that with the instruction and answer
+sizes into one record per LLM query, so the prompt cost of every requirement
+can be inspected after a run.
+"""
+import os
+import statistics
+import threading
+import time
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_SIMILARITY_CUTOFF = float(os.getenv("RETRIEVAL_SIMILARITY_CUTOFF", "0.72"))
+# Chunks always kept even below the cutoff, so the LLM never answers from nothing
+RETRIEVAL_MIN_NODES = 1
+MAX_BUDGET_RECORDS = 5000
+
+_retrieval_state = threading.local()
+
+
+def record_retrieval(retrieved, kept, context_tokens):
+    """Called by the retrieval postprocessor, in the thread running the query"""
+    _retrieval_state.last = {"retrieved": retrieved, "kept": kept, "context_tokens": context_tokens}
+
+
+def take_retrieval():
+    """Return and clear the retrieval recorded by this thread's last query"""
+    retrieval = getattr(_retrieval_state, "last", None)
+    _retrieval_state.last = None
+    return retrieval or {"retrieved": 0, "kept": 0, "context_tokens": 0}
+
+
+class TokenBudgetLog:
+    """Thread-safe list of per-query token budgets, newest last"""
+
+    def __init__(self, max_records=MAX_BUDGET_RECORDS):
+        self.max_records = max_records
+        self._records = []
+        self._lock = threading.Lock()
+
+    def record(self, label, document_hash, instruction_tokens, retrieval, output_tokens):
+        record = {
+            "label": label or "query",
+            "document_hash": document_hash,
+            "instruction_tokens": instruction_tokens,
+            "context_tokens": retrieval["context_tokens"],
+            "output_tokens": output_tokens,
+            "prompt_tokens": instruction_tokens + retrieval["context_tokens"],
+            "chunks_retrieved": retrieval["retrieved"],
+            "chunks_kept": retrieval["kept"],
+            "recorded_at": time.time()
+        }
+        with self._lock:
+            self._records.append(record)
+            del self._records[:-self.max_records]
+        return record
+
+    def records(self, document_hash=None):
+        with self._lock:
+            records = list(self._records)
+        if document_hash is None:
+            return records
+        return [record for record in records if record["document_hash"] == document_hash]
+
+    def summary(self, document_hash=None):
+        """Mean and maximum prompt size over the recorded queries"""
+        records = self.records(document_hash)
+        if not records:
+            return {"queries": 0, "mean_prompt_tokens": 0.0, "max_prompt_tokens": 0,
+                    "mean_context_tokens": 0.0, "mean_output_tokens": 0.0, "mean_chunks_kept": 0.0}
+        return {
+            "queries": len(records),
+            "mean_prompt_tokens": statistics.mean(record["prompt_tokens"] for record in records),
+            "max_prompt_tokens": max(record["prompt_tokens"] for record in records),
+            "mean_context_tokens": statistics.mean(record["context_tokens"] for record in records),
+            "mean_output_tokens": statistics.mean(record["output_tokens"] for record in records),
+            "mean_chunks_kept": statistics.mean(record["chunks_kept"] for record in records)
+        }
+
+
+_token_budget_log = TokenBudgetLog()
+
+
+def get_token_budget_log():
+    """Process-wide token budget log"""
+    return _token_budget_log